@@ -0,0 +1 @@
+# bench/ — load benchmarks (not run by pytest); see bench/endpoints.py
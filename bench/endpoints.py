@@ -0,0 +1,211 @@
+# bench/endpoints.py
+# End-to-end latency benchmark for the HTTP API.
+#
+# Starts the receiver simulator and fake MPD from tests/, points a temporary
+# zones.yaml at the simulator, serves the real Flask app over HTTP (waitress
+# if installed, like production; else Werkzeug threaded) and hammers it from
+# concurrent clients. Reports p50/p95/p99 latency and throughput per
+# scenario; compare runs before a release goes to the Pi.
+#
+#   python -m bench.endpoints                       # defaults
+#   python -m bench.endpoints -n 500 -c 16 --latency-ms 25 --drop 0.01
+#   python -m bench.endpoints --json > bench_output.txt
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from tests.fake_mpd import FakeMPD             # noqa: E402
+from tests.fake_receiver import FakeReceiver   # noqa: E402
+
+ZONES = {"inside": "1", "front_patio": "2", "back_patio": "3"}
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return None
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+def summarize(name, latencies, errors, wall_s):
+    vals = sorted(latencies)
+    ms = lambda v: None if v is None else round(v * 1000.0, 1)
+    return {
+        "scenario": name,
+        "requests": len(vals) + errors,
+        "errors": errors,
+        "p50_ms": ms(_percentile(vals, 0.50)),
+        "p95_ms": ms(_percentile(vals, 0.95)),
+        "p99_ms": ms(_percentile(vals, 0.99)),
+        "max_ms": ms(vals[-1] if vals else None),
+        "throughput_rps": round((len(vals) + errors) / wall_s, 1) if wall_s else None,
+    }
+
+# ---------- environment ----------
+
+def _write_zones(sim) -> str:
+    fd, path = tempfile.mkstemp(prefix="bench-zones-", suffix=".yaml")
+    with os.fdopen(fd, "w") as f:
+        f.write("receivers:\n")
+        f.write(f"  sim: {{ host: {sim.host}, port: {sim.port} }}\n")
+        f.write("zones:\n")
+        for name, zid in ZONES.items():
+            f.write(f'  {name}: {{ zone_id: "{zid}", sli: "03", receiver: sim }}\n')
+    return path
+
+def _serve(app):
+    """Serve app on a free localhost port in a background thread; returns the port."""
+    try:
+        from waitress.server import create_server
+        logging.getLogger("waitress.queue").setLevel(logging.ERROR)   # "task queue depth" is the point here
+        srv = create_server(app, host="127.0.0.1", port=0, threads=8)
+        threading.Thread(target=srv.run, daemon=True).start()
+        return srv.effective_port
+    except ImportError:
+        from werkzeug.serving import make_server
+        srv = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        return srv.server_port
+
+# ---------- load generation ----------
+
+class _Client(threading.local):
+    conn = None
+
+def _request(local, port, method, path, body=None):
+    if local.conn is None:
+        local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    payload = json.dumps(body).encode() if body is not None else None
+    headers = {"Content-Type": "application/json"} if payload else {}
+    try:
+        local.conn.request(method, path, body=payload, headers=headers)
+        resp = local.conn.getresponse()
+        data = resp.read()
+    except (OSError, http.client.HTTPException):
+        local.conn.close()
+        local.conn = None
+        raise
+    return resp.status, data
+
+def run_scenario(name, port, make_request, n, concurrency, ok_status=(200,)):
+    local = _Client()
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        method, path, body = make_request(i)
+        t0 = time.perf_counter()
+        try:
+            status, _ = _request(local, port, method, path, body)
+            good = status in ok_status
+        except Exception:
+            good = False
+        dt = time.perf_counter() - t0
+        with lock:
+            if good:
+                latencies.append(dt)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n)))
+    return summarize(name, latencies, errors, time.perf_counter() - t0)
+
+def run_announce_jobs(port, n, concurrency):
+    """Submit n announcements and time each from POST to job done."""
+    local = _Client()
+    names = list(ZONES)
+
+    def submit(i):
+        body = {"zone": names[i % len(names)], "volume": 30, "file": f"http://127.0.0.1/clip{i % 4}.mp3"}
+        status, data = _request(local, port, "POST", "/announce", body)
+        return json.loads(data).get("job_id") if status == 202 else None
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        jobs = list(pool.map(submit, range(n)))
+    latencies, errors = [], 0
+    pending = {job_id for job_id in jobs if job_id}
+    errors += sum(1 for job_id in jobs if not job_id)
+    deadline = time.perf_counter() + 120
+    while pending and time.perf_counter() < deadline:
+        for job_id in list(pending):
+            _, data = _request(local, port, "GET", f"/announce/jobs/{job_id}")
+            job = json.loads(data)
+            if job.get("status") in ("done", "failed", "preempted"):
+                pending.discard(job_id)
+                if job["status"] == "failed":
+                    errors += 1
+                else:
+                    latencies.append(job["finished_at"] - job["created_at"])
+        time.sleep(0.02)
+    errors += len(pending)
+    return summarize("announce (submit->done)", latencies, errors, time.perf_counter() - t0)
+
+# ---------- main ----------
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("-n", "--requests", type=int, default=200, help="requests per scenario")
+    ap.add_argument("-c", "--concurrency", type=int, default=8)
+    ap.add_argument("--latency-ms", type=float, default=20.0, help="simulated receiver reply latency")
+    ap.add_argument("--drop", type=float, default=0.0, help="fraction of receiver replies dropped")
+    ap.add_argument("--announcements", type=int, default=12)
+    ap.add_argument("--json", action="store_true", help="print one JSON document instead of a table")
+    args = ap.parse_args(argv)
+
+    sim = FakeReceiver(latency_s=args.latency_ms / 1000.0, drop=args.drop, max_connections=4)
+    mpd = FakeMPD(song_s=0.05)
+    zones_file = _write_zones(sim)
+    os.environ.update({
+        "HOUSEAUDIO_ZONES_FILE": zones_file,
+        "HOUSEAUDIO_SKIP_STARTUP": "1",
+        "HOUSEAUDIO_AUDIO_CACHE": "0",   # fake MPD takes the URL as-is
+        "MPD_HOST": "127.0.0.1",
+        "MPD_PORT": str(mpd.port),
+    })
+    from src.app import app   # after the environment points at the fakes
+
+    port = _serve(app)
+    rng = random.Random(7)
+    results = [
+        run_scenario("GET /zones/debug", port, lambda i: ("GET", "/zones/debug", None),
+                     args.requests, args.concurrency),
+        run_scenario("POST /zones/set", port,
+                     lambda i: ("POST", "/zones/set", {"zone": rng.choice(list(ZONES)), "volume": rng.randint(10, 40)}),
+                     args.requests, args.concurrency),
+        run_scenario("GET /status", port, lambda i: ("GET", "/status", None),
+                     args.requests, args.concurrency),
+        run_announce_jobs(port, args.announcements, args.concurrency),
+    ]
+
+    env = {"receiver_latency_ms": args.latency_ms, "drop": args.drop,
+           "concurrency": args.concurrency, "receiver_commands": len(sim.commands),
+           "receiver_dropped": sim.dropped, "mpd_commands": len(mpd.commands)}
+    if args.json:
+        print(json.dumps({"env": env, "results": results}, indent=2))
+    else:
+        print(" ".join(f"{k}={v}" for k, v in env.items()))
+        cols = ("scenario", "requests", "errors", "p50_ms", "p95_ms", "p99_ms", "max_ms", "throughput_rps")
+        print(f"{cols[0]:<28}" + "".join(f"{c:>15}" for c in cols[1:]))
+        for r in results:
+            print(f"{r['scenario']:<28}" + "".join(f"{str(r[c]):>15}" for c in cols[1:]))
+
+    sim.close()
+    mpd.close()
+    os.unlink(zones_file)
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,47 @@
 Entry point for running the house audio API service on the Pi
 under systemd. This file lets us avoid relying on `flask run`
 and keeps behavior consistent.
+
+Serving mode comes from the environment (see systemd/houseaudio.service):
+  HOUSEAUDIO_SERVER            waitress (default, multi-threaded) | dev (Werkzeug)
+  HOUSEAUDIO_PORT              listen port (5001)
+  HOUSEAUDIO_THREADS           worker threads (8)
+  HOUSEAUDIO_BACKLOG           listen queue depth (64)
+  HOUSEAUDIO_CONNECTION_LIMIT  max open client connections (100)
+
+We deliberately run one process with many threads rather than pre-forking:
+the eISCP connection pool, receiver state cache and announcement queue are
+per-process, and iscp.SessionGate caps receiver sessions process-wide.
 """
 
-from src.app import app
+import os
+
+from src.app import app, start_background
 
 def main():
     # production-ish settings for the Pi
     # - host=0.0.0.0 so other devices on LAN can reach it
     # - debug=False so we don't do autoreload loops under systemd
-    app.run(host="0.0.0.0", port=5001, debug=False)
+    port = int(os.environ.get("HOUSEAUDIO_PORT", "5001"))
+    server = os.environ.get("HOUSEAUDIO_SERVER", "waitress")
+    # probes + receiver listener run in the background; we bind straight away
+    start_background()
+
+    if server == "dev":
+        app.run(host="0.0.0.0", port=port, debug=False, threaded=True)
+        return
+
+    from waitress import serve
+    serve(
+        app,
+        host="0.0.0.0",
+        port=port,
+        threads=int(os.environ.get("HOUSEAUDIO_THREADS", "8")),
+        backlog=int(os.environ.get("HOUSEAUDIO_BACKLOG", "64")),
+        connection_limit=int(os.environ.get("HOUSEAUDIO_CONNECTION_LIMIT", "100")),
+        channel_timeout=30,
+        ident="houseaudio",
+    )
 
 if __name__ == "__main__":
     main()
@@ -1,26 +1,54 @@
 # Flask routes only
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
+from werkzeug.exceptions import HTTPException
+import mimetypes
 import os
 import re
-import socket
+import threading
+import time
 
-from . import mpd_control, playback, iscp
+from . import audio_cache, events, metrics, mpd_client, mpd_control, playback, startup, iscp, iscp_async, jobs, receiver_state, scenes, scheduler, tracing, uploads, zone_locks, zones
 from . import deploy
 from .helpers import announce  # already imported once; no need to import inside routes
 
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = uploads.MAX_BYTES   # 413 before we read an oversized body
 
 # ---- Config / helpers ---------------------------------------------------------
 
-DEFAULT_RECEIVER_IP = os.environ.get("DEFAULT_RECEIVER_IP", "192.168.50.249")
-
 def get_receiver_ip() -> str:
-    # Single source of truth; easy to override later if needed
-    return DEFAULT_RECEIVER_IP
+    # default receiver: first in zones.yaml 'receivers', else DEFAULT_RECEIVER_IP
+    return zones.current().default_receiver.host
 
-def get_client() -> iscp.EISCPClient:
-    return iscp.EISCPClient(get_receiver_ip())
+def get_receiver(zone=None) -> zones.Receiver:
+    """
+    Receiver for zone (a zone name, Zone or Receiver); None means the default.
+    Raises KeyError for an unknown zone name.
+    """
+    cfg = zones.current()
+    if zone is None:
+        return cfg.default_receiver
+    if isinstance(zone, zones.Receiver):
+        return zone
+    if not isinstance(zone, zones.Zone):
+        zone = cfg.zones[zone]
+    return cfg.receiver_for(zone)
+
+_CLIENTS = {}  # (host, port) -> EISCPClient (shares the pooled socket)
+
+def get_client(zone=None) -> iscp.EISCPClient:
+    r = get_receiver(zone)
+    cli = _CLIENTS.get(r.key)
+    if cli is None:
+        cli = _CLIENTS.setdefault(r.key, iscp.EISCPClient(r.host, r.port))
+    return cli
+
+def get_async_client(zone=None) -> iscp_async.AsyncEISCPClient:
+    r = get_receiver(zone)
+    cli = iscp_async.shared_client(r.host, r.port)
+    receiver_state.state_for(cli)   # its frames feed the same state cache
+    return cli
 
 INPUT_CODE_MAP = {
     "00": "TV",
@@ -49,43 +77,441 @@ def parse_input(raw: str):
     code = raw[-2:].upper()
     return INPUT_CODE_MAP.get(code, code)
 
-def _startup_zone_validation():
-    ip = get_receiver_ip()
-    try:
-        with socket.create_connection((ip, 60128), timeout=0.35):
-            print(f"[startup] receiver {ip} reachable on 60128")
-    except Exception as e:
-        print(f"[startup] receiver {ip} NOT reachable (60128) — {e}")
+def query_all_zones():
+    """
+    Fetch power/volume/input for every zone in zones.yaml: one pipelined
+    round trip per receiver, receivers in parallel.
+    Returns {name: {"zone_id", "receiver", "power", "volume", "input"}} raw
+    frames; zones on a receiver that failed get {"zone_id", "receiver", "error"}.
+    """
+    groups = zones.current().by_receiver()
+
+    def one(rname):
+        members = groups[rname]
+        return get_client(next(iter(members.values()))).query_zones({z.zone_id for z in members.values()})
+
+    out = {}
+    for rname, (status, err) in iscp.fan_out(one, groups).items():
+        for name, z in groups[rname].items():
+            if err is not None:
+                out[name] = {"zone_id": z.zone_id, "receiver": rname, "error": str(err)}
+            else:
+                out[name] = {"zone_id": z.zone_id, "receiver": rname, **status[z.zone_id]}
+    return out
+
+def parse_mute(raw: str):
+    if not raw:
+        return None
+    return True if raw.endswith("01") else False if raw.endswith("00") else None
+
+def _zone_ids(receiver: str = None):
+    return {name: z.zone_id for name, z in zones.current().zones.items()
+            if receiver is None or z.receiver == receiver}
+
+def _receiver_zone_states(members):
+    """zone_states() for the zones of one receiver ({name: Zone})."""
+    client = get_client(next(iter(members.values())))
+    state = receiver_state.state_for(client)
+    live_since = client.connection.connected_since
+
+    stale = {}
+    for zid in {z.zone_id for z in members.values()}:
+        fields = state.stale(zid, live_since)
+        if fields:
+            stale[zid] = fields
+
+    error = None
+    if stale:
+        try:
+            client.query_fields(stale)
+        except Exception as e:
+            error = str(e)
+        live_since = client.connection.connected_since
 
-if os.environ.get("HOUSEAUDIO_SKIP_STARTUP") != "1":
-    _startup_zone_validation()
+    results = {}
+    for name, z in members.items():
+        view = state.zone_view(z.zone_id, live_since)
+        results[name] = {
+            "zone_id": z.zone_id,
+            "receiver": z.receiver,
+            "power":  parse_power(view["power"]["raw"]),
+            "volume": parse_volume(view["volume"]["raw"]),
+            "input":  parse_input(view["input"]["raw"]),
+            "mute":   parse_mute(view["mute"]["raw"]),
+            "age_s":  {f: v["age_s"] for f, v in view.items()},
+        }
+        if error and any(not v["fresh"] for v in view.values()):
+            results[name]["error"] = error
+    return results
+
+def zone_states():
+    """
+    Readable per-zone state answered from the live cache. Only fields that
+    are stale (or never seen) are re-queried, one pipelined batch per
+    receiver with all receivers in parallel; the replies land in the cache
+    through the connection listener.
+    """
+    groups = zones.current().by_receiver()
+    results = {}
+    for rname, (res, err) in iscp.fan_out(lambda r: _receiver_zone_states(groups[r]), groups).items():
+        if err is not None:
+            res = {name: {"zone_id": z.zone_id, "receiver": rname, "error": str(err)} for name, z in groups[rname].items()}
+        results.update(res)
+    return results
+
+def receiver_health():
+    """{receiver name: circuit breaker snapshot} — in memory, no receiver I/O."""
+    return {r.name: {"host": r.host, "port": r.port, **iscp.breaker_for(r.host, r.port).snapshot()}
+            for r in zones.current().receivers.values()}
+
+def _unavailable(err: ConnectionError):
+    # receiver asleep / off the LAN: answer fast with 503 instead of hanging
+    return jsonify({"ok": False, "error": str(err), "receivers": receiver_health()}), 503
+
+def _with_lock_wait(resp, held):
+    # how long this request queued behind other work on the same zone(s)
+    resp.headers["X-Zone-Lock-Wait-Ms"] = str(held.wait_ms)
+    return resp
+
+def _run_announce_job(job: jobs.Job):
+    tr = tracing.start("announce job", parent=job.request_trace_id, job_id=job.id, zones=",".join(job.zones))
+    job.trace_id = tr.id if tr else None
+    status = "failed"
+    try:
+        out = announce.play_broadcast_announcement(job.zones, job.params["volume"], job.params["file"], cancel=job.cancel)
+        status = "preempted" if job.cancel.is_set() else "done"
+    finally:
+        uploads.discard(job.params["file"])   # uploaded clips are played once
+        tracing.finish(tr, status)
+    job.lock_wait_ms = (out or {}).get("lock_wait_ms")
+
+def _submit_announce(targets, params, priority):
+    job = ANNOUNCE_JOBS.submit(targets, params, priority=priority)
+    # link the job's trace back to this request's
+    tr = tracing.current()
+    if tr is not None:
+        tracing.annotate(job_id=job.id)
+        if job.request_trace_id is None:   # a merged duplicate keeps the first request
+            job.request_trace_id = tr.id
+    return job
+
+ANNOUNCE_JOBS = jobs.JobQueue(_run_announce_job)
+
+def _start_state_listeners():
+    listeners = []
+    for r in zones.current().receivers.values():
+        listener = receiver_state.ReceiverListener(get_client(r), lambda name=r.name: _zone_ids(name).values())
+        listener.start()
+        listeners.append(listener)
+    return listeners
+
+_BACKGROUND_LOCK = threading.Lock()
+_background_started = False
+
+def _background():
+    cfg = zones.current()
+    receivers = [r.key for r in cfg.receivers.values()]
+    startup.run_checks(startup.default_checks(receivers, mpd_client._endpoint()))
+    _start_state_listeners()
+
+def start_background():
+    """
+    Start the startup checks (zones.yaml, every receiver, MPD — in parallel)
+    and one receiver state listener per receiver. Idempotent and
+    non-blocking; importing the app does no I/O, so run_server calls this
+    and the first request is the fallback.
+    """
+    global _background_started
+    with _BACKGROUND_LOCK:
+        if _background_started or os.environ.get("HOUSEAUDIO_SKIP_STARTUP") == "1":
+            return
+        _background_started = True
+    threading.Thread(target=_background, name="startup", daemon=True).start()
+
+# ---- Change stream ------------------------------------------------------------
+
+STREAM_KEEPALIVE_S = 15.0   # comment line so proxies and waitress see the stream alive
+
+_PARSERS = {"power": parse_power, "volume": parse_volume, "input": parse_input, "mute": parse_mute}
+_STREAM_LOCK = threading.Lock()
+_STREAM_SOURCES = set()   # receiver keys feeding events.HUB, plus "mpd"
+_MPD_LAST = {}
+
+def _publish_zone_change(key, zid, field, frame):
+    cfg = zones.current()
+    names = [name for name, z in cfg.zones.items() if z.zone_id == zid and cfg.receiver_for(z).key == key]
+    if names:
+        value = _PARSERS[field](frame)
+        events.HUB.publish({"zones": {name: {field: value} for name in names}})
+
+def _mpd_view(st):
+    song = st.get("song") or {}
+    return {"state": st.get("state") or "unknown", "volume": st.get("volume"),
+            "song": song.get("Title") or song.get("Name") or song.get("file")}
+
+def _publish_mpd_change():
+    view = _mpd_view(mpd_control.get_status())
+    diff = {k: v for k, v in view.items() if _MPD_LAST.get(k, object()) != v}
+    _MPD_LAST.update(view)
+    if diff:
+        events.HUB.publish({"mpd": diff})
+
+def _start_stream_sources():
+    """
+    Hook every receiver's state cache and one MPD idle connection to
+    events.HUB (once). The receiver listeners already hold the only
+    subscription to each receiver; streams add no receiver traffic.
+    """
+    with _STREAM_LOCK:
+        for r in zones.current().receivers.values():
+            if r.key not in _STREAM_SOURCES:
+                _STREAM_SOURCES.add(r.key)
+                state = receiver_state.state_for(get_client(r))
+                state.watch(lambda zid, field, frame, key=r.key: _publish_zone_change(key, zid, field, frame))
+        if "mpd" not in _STREAM_SOURCES:
+            _STREAM_SOURCES.add("mpd")
+            threading.Thread(target=mpd_control.watch_player, args=(_publish_mpd_change,),
+                             name="mpd-player-watch", daemon=True).start()
+
+def _stream_snapshot():
+    states = {name: {k: v for k, v in st.items() if k != "age_s"} for name, st in zone_states().items()}
+    return {"zones": states, "mpd": _mpd_view(mpd_control.get_status())}
+
+def _stream_events(sub, backlog):
+    try:
+        if backlog is None:
+            yield events.format_sse(sub.start_id, "snapshot", _stream_snapshot())
+        elif backlog:
+            yield events.format_sse(backlog[-1].id, "change", events.merge(backlog))
+        while True:
+            evs, lagged = sub.get(STREAM_KEEPALIVE_S)
+            if lagged:
+                # fell a whole buffer behind; whatever is queued is covered by the snapshot
+                last_id = events.HUB.last_id
+                yield events.format_sse(last_id, "snapshot", _stream_snapshot())
+            elif evs:
+                yield events.format_sse(evs[-1].id, "change", events.merge(evs))
+            else:
+                yield ": keepalive\n\n"
+    finally:
+        sub.close()
 
 # ---- Routes -------------------------------------------------------------------
 
+@app.before_request
+def _lazy_start():
+    g.started = time.monotonic()
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    g.trace = tracing.start(f"{request.method} {route}")
+    if not _background_started:
+        start_background()
+
+@app.teardown_request
+def _end_trace(exc):
+    tr = g.pop("trace", None)
+    if tr is not None:
+        tracing.finish(tr, "exception" if exc is not None else None)
+
+@app.after_request
+def _observe(resp):
+    # route template, not the raw path, so job ids don't explode the label set
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    started = g.get("started")
+    if started is not None:
+        metrics.HTTP_SECONDS.observe(time.monotonic() - started, route, request.method)
+    metrics.HTTP_REQUESTS.inc(route, request.method, str(resp.status_code))
+    tr = g.get("trace")
+    if tr is not None:
+        tr.status = resp.status_code
+        resp.headers["X-Trace-Id"] = tr.id
+    return resp
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    # Prometheus text format; scrape from the LAN
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    # liveness: the process is up and serving; never touches the receiver
+    return jsonify({"ok": True})
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """
+    Readiness from in-memory state only (no receiver or MPD I/O). "startup"
+    carries the background reachability checks; they inform but don't gate.
+    """
+    cfg = zones.current()
+    ready = bool(cfg.zones) and zones.REGISTRY.last_error is None
+    receivers = {}
+    for r in cfg.receivers.values():
+        conn = get_client(r).connection
+        gate = iscp.session_gate(r.host, r.port)
+        receivers[r.name] = {
+            "host": r.host,
+            "port": r.port,
+            "connected": conn.connected_since is not None,
+            "sessions_open": gate.open,
+            "sessions_max": gate.limit,
+            "circuit": iscp.breaker_for(r.host, r.port).snapshot(),
+        }
+    return jsonify({
+        "ok": ready,
+        "zones": len(cfg.zones),
+        "zones_error": zones.REGISTRY.last_error,
+        "startup": startup.report(),
+        "receivers": receivers,
+    }), (200 if ready else 503)
+
 @app.route("/status", methods=["GET"])
 def status():
     st = mpd_control.get_status()
-    return jsonify(st)
+    return jsonify({**st, "zones": zone_states(), "receivers": receiver_health()})
+
+def _announce_params(params):
+    """
+    Validate zone / volume / priority from a JSON body, form or query string.
+    Returns ((targets, volume, priority), None) or (None, error response).
+    """
+    zone_name = params.get("zone")            # name | [names] | "all"
+    volume    = params.get("volume")          # int 0..100
+    if not zone_name:
+        return None, (jsonify({"ok": False, "error": "missing 'zone'"}), 400)
+    if volume is None:
+        return None, (jsonify({"ok": False, "error": "missing 'volume'"}), 400)
+    try:
+        volume = int(volume)
+        priority = jobs.parse_priority(params.get("priority"))
+    except (TypeError, ValueError):
+        return None, (jsonify({"ok": False, "error": "volume must be int 0..100, priority low|normal|high|int"}), 400)
+    # "zone" may be one name, a list of names (repeated in a form/query), or "all" (broadcast)
+    known = list(zones.current().zones)
+    if zone_name == "all":
+        targets = known
+    else:
+        targets = list(dict.fromkeys(zone_name if isinstance(zone_name, list) else [zone_name]))
+    unknown = [z for z in targets if z not in known]
+    if unknown or not targets:
+        return None, (jsonify({"ok": False, "error": f"unknown zone {unknown or zone_name!r}"}), 400)
+    return (targets, volume, priority), None
+
+def _form_params(multidict):
+    params = multidict.to_dict()
+    zone_list = multidict.getlist("zone")
+    if len(zone_list) > 1:
+        params["zone"] = zone_list
+    return params
+
+_AUDIO_EXT = {"audio/wav": ".wav", "audio/x-wav": ".wav", "audio/wave": ".wav", "audio/mpeg": ".mp3",
+              "audio/mp3": ".mp3", "audio/ogg": ".ogg", "audio/flac": ".flac", "audio/aac": ".aac"}
+
+def _upload_suffix(filename=None, mimetype=None):
+    # MPD and ffmpeg pick the decoder from the extension
+    ext = os.path.splitext(filename or "")[1][:8]
+    if not ext and mimetype:
+        ext = _AUDIO_EXT.get(mimetype) or mimetypes.guess_extension(mimetype) or ""
+    return ext
 
 @app.route("/announce", methods=["POST"])
 def announce_route():
-    body = request.get_json(force=True)
-    zone_name = body.get("zone")
-    volume    = body.get("volume")          # int 0..100
-    file_url  = body.get("file") or body.get("url")  # allow legacy key
+    """
+    JSON {"zone", "volume", "file": http(s) URL, "priority"}, or the audio
+    itself: multipart/form-data with an "audio" (or "file") part and the same
+    fields as form fields, or a raw audio/* / application/octet-stream body
+    (chunked is fine) with the fields in the query string. Uploads are
+    streamed to disk and the job is queued once the clip is complete.
+    """
+    mimetype = request.mimetype or ""
+    if mimetype == "multipart/form-data":
+        return _announce_multipart()
+    if mimetype.startswith("audio/") or mimetype == "application/octet-stream":
+        return _announce_raw_body()
 
-    if not zone_name:
-        return jsonify({"ok": False, "error": "missing 'zone'"}), 400
-    if volume is None:
-        return jsonify({"ok": False, "error": "missing 'volume'"}), 400
+    body = request.get_json(force=True)
+    file_url = body.get("file") or body.get("url")  # allow legacy key
+    parsed, err = _announce_params(body)
+    if err:
+        return err
     if not file_url or not str(file_url).lower().startswith(("http://", "https://")):
         return jsonify({"ok": False, "error": "need http(s) 'file' URL"}), 400
+    targets, volume, priority = parsed
+
+    # Returns straight away; poll /announce/jobs/<job_id> for progress
+    job = _submit_announce(targets, {"volume": volume, "file": file_url}, priority=priority)
+    return jsonify({"ok": True, "job_id": job.id, "status": job.status}), 202
 
+def _save_upload(stream_fn, suffix: str):
+    """
+    Copy the body (stream_fn() returns its stream) into a new upload.
+    Returns (upload, None), or (None, error response) with nothing left behind.
+    """
+    upload = uploads.start(suffix)
     try:
-        announce.play_zone_announcement(zone_name, int(volume), file_url)
-        return jsonify({"ok": True})
+        upload.write_from(stream_fn())
+        return upload, None
     except Exception as e:
-        return jsonify({"ok": False, "error": str(e)}), 500
+        uploads.discard(upload.path)
+        if isinstance(e, HTTPException):   # e.g. 413 from MAX_CONTENT_LENGTH
+            return None, (jsonify({"ok": False, "error": e.description}), e.code)
+        return None, (jsonify({"ok": False, "error": str(e)}), 400)
+
+def _announce_multipart():
+    parsed, err = _announce_params(_form_params(request.form))
+    if err:
+        return err
+    part = request.files.get("audio") or request.files.get("file")
+    if part is None:
+        return jsonify({"ok": False, "error": "missing 'audio' file part"}), 400
+    targets, volume, priority = parsed
+    # Werkzeug has already spooled the part (to disk past 500 KB); copy it over in chunks
+    upload, err = _save_upload(lambda: part.stream, _upload_suffix(part.filename, part.mimetype))
+    if err:
+        return err
+    job = _submit_announce(targets, {"volume": volume, "file": upload.path}, priority=priority)
+    return jsonify({"ok": True, "job_id": job.id, "status": job.status, "bytes": upload.size}), 202
+
+def _announce_raw_body():
+    parsed, err = _announce_params(_form_params(request.args))
+    if err:
+        return err
+    targets, volume, priority = parsed
+    # the whole clip is on disk before the job is queued, so a refused or
+    # broken body never touches the receivers
+    upload, err = _save_upload(lambda: request.stream, _upload_suffix(mimetype=request.mimetype))
+    if err:
+        return err
+    job = _submit_announce(targets, {"volume": volume, "file": upload.path}, priority=priority)
+    return jsonify({"ok": True, "job_id": job.id, "status": job.status, "bytes": upload.size}), 202
+
+@app.route("/announce/jobs/<job_id>", methods=["GET"])
+def announce_job(job_id):
+    job = ANNOUNCE_JOBS.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "unknown job"}), 404
+    return jsonify({"ok": True, **job.to_dict()})
+
+@app.route("/announce/jobs", methods=["GET"])
+def announce_jobs():
+    return jsonify({"ok": True, "jobs": ANNOUNCE_JOBS.snapshot()})
+
+@app.route("/announce/cache", methods=["GET"])
+def announce_cache_stats():
+    return jsonify({"ok": True, "enabled": audio_cache.enabled(), **audio_cache.get_cache().stats()})
+
+@app.route("/announce/cache/warm", methods=["POST"])
+def announce_cache_warm():
+    """
+    Pre-fetch clips into the local audio cache.
+    Body (optional): {"urls": [...]}; defaults to zones.yaml 'warm_clips'.
+    """
+    body = request.get_json(force=True, silent=True) or {}
+    urls = body.get("urls") or announce.load_warm_clips()
+    bad = [u for u in urls if not str(u).lower().startswith(("http://", "https://"))]
+    if bad:
+        return jsonify({"ok": False, "error": f"need http(s) URLs: {bad}"}), 400
+    results = audio_cache.get_cache().warm(urls)
+    return jsonify({"ok": all(v == "ok" for v in results.values()), "results": results})
 
 @app.route("/zone", methods=["POST"])
 def zone():
@@ -95,91 +521,197 @@ def zone():
     if power not in ["on", "off"]:
         return jsonify({"ok": False, "error": "need power=on|off"}), 400
 
-    resp = get_client().power(power == "on", zone="1")  # main zone power
+    cli = get_client()
+    with zone_locks.hold(cli.host, ["1"]) as held:
+        try:
+            resp = cli.power(power == "on", zone="1")  # main zone power
+        except ConnectionError as e:
+            return _with_lock_wait(_unavailable(e)[0], held), 503
 
-    return jsonify({
+    return _with_lock_wait(jsonify({
         "ok": bool(resp and resp.startswith("!1PWR")),
         "sent": f"!1PWR{'01' if power == 'on' else '00'}",
         "stdout": resp or "",
-    }), 200
+        "lock_wait_ms": held.wait_ms,
+    }), held), 200
 
 @app.route("/zones/set", methods=["POST"])
-def zones_set():
+async def zones_set():
     """
     Body:
       {
-        "zone_id": "1"|"2"|"3",
+        "zone": "back_patio",        # zones.yaml name (picks receiver + zone_id), or:
+        "zone_id": "1"|"2"|"3",      #   zone id on ...
+        "receiver": "main",          #   ... this zones.yaml receiver (optional, default receiver)
         "power": "on"|"off",         # optional
         "input": "03"|"05"|...,      # optional, hex SLI code (AUX=03, PC=05, NET=2B, NONE=80)
         "volume": 0-100              # optional, percent -> hex (receiver clamps >0x64)
       }
     """
-    cli  = get_client()
     body = request.get_json(force=True)
 
-    zid       = str(body.get("zone_id", "1"))
+    cfg = zones.current()
+    if body.get("zone") is not None:
+        z = cfg.zones.get(body["zone"])
+        if z is None:
+            return jsonify({"ok": False, "error": f"unknown zone {body['zone']!r}"}), 400
+        zid, target = z.zone_id, z
+    else:
+        zid, target = str(body.get("zone_id", "1")), cfg.receivers.get(body.get("receiver") or cfg.default_receiver.name)
+        if target is None:
+            return jsonify({"ok": False, "error": f"unknown receiver {body['receiver']!r}"}), 400
     power     = body.get("power")      # "on"/"off" or None
     input_hex = body.get("input")      # e.g., "03"
     vol_pct   = body.get("volume")     # 0..100 int
 
-    results = {"zone_id": zid}
-
     def pct_to_hex(p):
         p = max(0, min(100, int(p)))
         return f"{p:02X}"  # AVR understands 00..64; >64 will be clamped
 
-    # Apply power first (optional)
-    if power in ("on", "off"):
-        results["power_set"] = cli.power(power == "on", zone=zid) or ""
-
-    # Input select (optional)
-    if input_hex is not None:
-        if not re.fullmatch(r"[0-9A-Fa-f]{2}", str(input_hex)):
-            return jsonify({"ok": False, "error": "input must be 2-digit hex like '03'"}), 400
-        results["input_set"] = cli.input_select(str(input_hex), zone=zid) or ""
-
-    # Volume set (optional)
+    # Validate everything before touching the receiver
+    if input_hex is not None and not re.fullmatch(r"[0-9A-Fa-f]{2}", str(input_hex)):
+        return jsonify({"ok": False, "error": "input must be 2-digit hex like '03'"}), 400
+    hx = None
     if vol_pct is not None:
         try:
             hx = pct_to_hex(vol_pct)
         except Exception:
             return jsonify({"ok": False, "error": "volume must be int 0..100"}), 400
-        results["volume_set"] = cli.volume_hex(hx, zone=zid) or ""
 
-    # Current status snapshot
-    results["status"] = {
-        "power":  cli.power_query(zid)  or "",
-        "input":  cli.input_query(zid)  or "",
-        "volume": cli.volume_query(zid) or "",
-    }
-    return jsonify({"ok": True, **results})
+    cli = get_async_client(target)
+    state = receiver_state.state_for(cli)
+    sets = []
+    if power in ("on", "off"):
+        sets.append((zid, "power", "01" if power == "on" else "00"))
+    if input_hex is not None:
+        sets.append((zid, "input", str(input_hex)))
+    if hx is not None:
+        sets.append((zid, "volume", hx))
+
+    async def enqueue():
+        return scheduler.scheduler_for(cli).enqueue(sets)
+
+    async def settle(waits):
+        results = {"zone_id": zid, "receiver": f"{cli.host}:{cli.port}"}
+        # Through the per-receiver scheduler: superseded values (slider drags)
+        # are coalesced and each *_set is the echo the receiver finally acked
+        acked = await scheduler.scheduler_for(cli).wait(waits) if waits else {}
+        for field, frame in acked.items():
+            results[f"{field}_set"] = frame or ""
+        # Status from the live cache (echoes land there); re-query only stale fields
+        fields = ("power", "volume", "input")
+        stale = state.stale(zid, cli.connected_since, fields)
+        if stale:
+            await cli.query_fields({zid: stale})
+        view = state.zone_view(zid, cli.connected_since, fields)
+        results["status"] = {f: v["raw"] for f, v in view.items()}
+        return results
+
+    # The zone lock only orders this request against announcements and scenes
+    # on the same zone: the SETs take their place in the scheduler's slots
+    # under it, and the echo is awaited after it is released. Whoever takes
+    # the lock next flushes the scheduler before reading the zone, so these
+    # SETs still land first. Same-zone requests overlap, and a burst
+    # coalesces into a few SETs.
+    with zone_locks.hold(cli.host, [zid]) as held:
+        waits = await iscp_async.call(enqueue()) if sets else []
+    try:
+        results = await iscp_async.call(settle(waits))
+    except ConnectionError as e:
+        return _with_lock_wait(_unavailable(e)[0], held), 503
+    return _with_lock_wait(jsonify({"ok": True, **results, "lock_wait_ms": held.wait_ms}), held)
+
+@app.route("/scenes", methods=["GET"])
+def scenes_list():
+    # target state per scene as configured (hex values, like /zones/set takes)
+    return jsonify({name: sc.as_dict() for name, sc in zones.current().scenes.items()})
+
+@app.route("/scenes/<name>", methods=["POST"])
+async def scene_apply(name):
+    """
+    Bring every zone in zones.yaml scene <name> to its target state. Only
+    fields that differ are sent, as one power -> input -> volume -> mute batch
+    per receiver, then verified once. "mismatch" lists fields the receiver
+    did not end up at.
+    """
+    cfg = zones.current()
+    scene = cfg.scenes.get(name)
+    if scene is None:
+        return jsonify({"ok": False, "error": f"unknown scene {name!r}"}), 404
+    keys = [(cfg.receiver_for(cfg.zones[z]).host, cfg.zones[z].zone_id) for z in scene.targets]
+    with zone_locks.hold_keys(keys) as held:
+        out = await iscp_async.call(scenes.apply(scene, cfg))
+    if out["errors"] and not out["zones"]:
+        resp, code = _unavailable(ConnectionError("; ".join(f"{r}: {e}" for r, e in out["errors"].items())))
+        return _with_lock_wait(resp, held), code
+    ok = not out["errors"] and not any(z["mismatch"] for z in out["zones"].values())
+    return _with_lock_wait(jsonify({"ok": ok, "scene": name, **out, "lock_wait_ms": held.wait_ms}), held)
+
+@app.route("/debug/traces", methods=["GET"])
+def debug_traces():
+    """
+    Recent request / announcement-job traces, newest first, plus the ones
+    still running. ?min_ms= keeps only slow ones, ?name= filters by route
+    ("POST /announce", "announce job"), ?limit= (default 50).
+    """
+    try:
+        min_ms = float(request.args.get("min_ms", 0))
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return jsonify({"ok": False, "error": "min_ms and limit must be numbers"}), 400
+    recent = tracing.recent(limit=limit, min_ms=min_ms, name=request.args.get("name"))
+    return jsonify({
+        "enabled": tracing.ENABLED,
+        "active": [tr.summary() for tr in tracing.active()],
+        "recent": [tr.summary() for tr in recent],
+    })
+
+@app.route("/debug/traces/<trace_id>", methods=["GET"])
+def debug_trace(trace_id):
+    # one trace's span timeline (and profile, if it was sampled)
+    tr = tracing.get(trace_id)
+    if tr is None:
+        return jsonify({"ok": False, "error": "unknown or expired trace"}), 404
+    return jsonify(tr.to_dict())
+
+@app.route("/zones/latency", methods=["GET"])
+def zones_latency():
+    """
+    Reply latency per receiver and command family (p50/p95/p99/max, timeouts)
+    and the response window currently derived from it.
+    """
+    return jsonify({r.name: {"host": r.host, "port": r.port, "families": iscp.latency_for(r.host, r.port).snapshot()}
+                    for r in zones.current().receivers.values()})
+
+@app.route("/zones/stream", methods=["GET"])
+def zones_stream():
+    """
+    Server-Sent Events: a "snapshot" of every zone and the MPD player, then a
+    "change" event with a compact diff whenever power, volume, input, mute or
+    the player changes. Reconnect with Last-Event-ID to get only what was missed.
+    """
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_id = int(last_id) if last_id not in (None, "") else None
+    except ValueError:
+        last_id = None
+    _start_stream_sources()
+    try:
+        sub, backlog = events.HUB.subscribe(last_id)
+    except events.HubFull as e:
+        return jsonify({"ok": False, "error": str(e)}), 503
+    resp = Response(_stream_events(sub, backlog), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
 
 @app.route("/zones/debug", methods=["GET"])
 def zones_debug():
     """
-    Return current input, volume, and power status for each zone in a readable form.
+    Return current input, volume, power and mute status for each zone in a readable form,
+    answered from the live state cache; "age_s" tells how old each field is.
     """
-    client = get_client()
-    zones_cfg = announce.load_zones() or {}
-    results = {}
-
-    for name, cfg in zones_cfg.items():
-        zid = str(cfg.get("zone_id", "1"))
-        try:
-            pwr_raw = client.power_query(zid)
-            vol_raw = client.volume_query(zid)
-            inp_raw = client.input_query(zid)
-
-            results[name] = {
-                "zone_id": zid,
-                "power":  parse_power(pwr_raw),
-                "volume": parse_volume(vol_raw),
-                "input":  parse_input(inp_raw),
-            }
-        except Exception as e:
-            results[name] = {"zone_id": zid, "error": str(e)}
-
-    return jsonify(results)
+    return jsonify(zone_states())
 
 if __name__ == "__main__":
     # local dev runner
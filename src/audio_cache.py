@@ -0,0 +1,238 @@
+# src/audio_cache.py
+# Local cache for announcement audio.
+#
+# Clips are stored on disk by content hash (sha256), with an index mapping
+# each URL to its blob, ETag and last use. A cache hit plays from the local
+# file; known URLs are revalidated with If-None-Match at most every
+# revalidate_s, and when the upstream host is slow or down a cached copy is
+# used anyway. The total size is kept under max_bytes by evicting the least
+# recently used blobs.
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+from typing import Dict, Iterable, Optional
+
+DEFAULT_DIR = os.environ.get("HOUSEAUDIO_CACHE_DIR", os.path.expanduser("~/.cache/houseaudio/audio"))
+DEFAULT_MAX_BYTES = int(os.environ.get("HOUSEAUDIO_CACHE_MAX_MB", "200")) * 1024 * 1024
+DEFAULT_REVALIDATE_S = float(os.environ.get("HOUSEAUDIO_CACHE_REVALIDATE_S", "3600"))
+FETCH_TIMEOUT_S = 5.0
+CHUNK = 64 * 1024
+
+class AudioCache:
+    def __init__(self, root: str = DEFAULT_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 revalidate_s: float = DEFAULT_REVALIDATE_S):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.revalidate_s = revalidate_s
+        self._objects = os.path.join(root, "objects")
+        self._index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        os.makedirs(self._objects, exist_ok=True)
+        self._index: Dict[str, dict] = self._load_index()
+
+    # -- index --
+
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            with open(self._index_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self) -> None:
+        # caller holds _lock; write-then-rename so a crash never leaves half an index
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, self._index_path)
+
+    def _blob_path(self, entry: dict) -> str:
+        return os.path.join(self._objects, entry["hash"] + entry.get("ext", ""))
+
+    # -- lookups --
+
+    def lookup(self, url: str) -> Optional[str]:
+        """Local path for url if cached (no network), else None."""
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is None or not os.path.exists(self._blob_path(entry)):
+                return None
+            entry["last_used"] = time.time()
+            return self._blob_path(entry)
+
+    def fetch(self, url: str) -> str:
+        """
+        Local path for url, downloading (or revalidating) it if needed.
+        Raises if it isn't cached and can't be fetched.
+        """
+        with self._lock:
+            ulock = self._url_locks.setdefault(url, threading.Lock())
+        with ulock:   # two requests for the same clip download it once
+            try:
+                return self._fetch_locked(url)
+            finally:
+                with self._lock:   # later fetches find the index entry first
+                    if self._url_locks.get(url) is ulock:
+                        del self._url_locks[url]
+
+    def _fetch_locked(self, url: str) -> str:
+        # caller holds url's lock
+        with self._lock:
+            entry = dict(self._index.get(url) or {})
+        have = bool(entry) and os.path.exists(self._blob_path(entry))
+        if have and time.time() - entry.get("checked_at", 0) < self.revalidate_s:
+            return self._touch(url)
+
+        import urllib.error, urllib.request   # deferred: only needed on a miss/revalidate
+        req = urllib.request.Request(url)
+        if have and entry.get("etag"):
+            req.add_header("If-None-Match", entry["etag"])
+        try:
+            with urllib.request.urlopen(req, timeout=FETCH_TIMEOUT_S) as resp:
+                return self._store(url, resp)
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and have:
+                return self._touch(url, checked=True)
+            if have:
+                return self._touch(url)
+            raise
+        except (OSError, ValueError):
+            if have:   # upstream slow/down: a known clip is better than silence
+                return self._touch(url)
+            raise
+
+    def _touch(self, url: str, checked: bool = False) -> str:
+        with self._lock:
+            entry = self._index[url]
+            entry["last_used"] = time.time()
+            if checked:
+                entry["checked_at"] = time.time()
+                self._save_index()
+            return self._blob_path(entry)
+
+    def _store(self, url: str, resp) -> str:
+        ext = os.path.splitext(urllib.parse.urlparse(url).path)[1][:8]
+        h = hashlib.sha256()
+        size = 0
+        too_big = ValueError(f"{url} is larger than the audio cache ({self.max_bytes} bytes)")
+        if int(resp.headers.get("Content-Length") or 0) > self.max_bytes:
+            raise too_big
+        fd, tmp = tempfile.mkstemp(dir=self._objects, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = resp.read(CHUNK)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:   # no Content-Length, or it lied
+                        raise too_big
+                    h.update(chunk)
+                    f.write(chunk)
+            entry = {
+                "hash": h.hexdigest(),
+                "ext": ext,
+                "size": size,
+                "etag": resp.headers.get("ETag"),
+                "checked_at": time.time(),
+                "last_used": time.time(),
+            }
+            os.replace(tmp, self._blob_path(entry))   # identical content lands on the same blob
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        with self._lock:
+            self._index[url] = entry
+            self._evict_locked(keep=entry["hash"])
+            self._save_index()
+            return self._blob_path(entry)
+
+    # -- eviction / maintenance --
+
+    def _evict_locked(self, keep: Optional[str] = None) -> None:
+        blobs: Dict[str, dict] = {}   # hash -> {"size", "last_used", "urls"}
+        for url, e in self._index.items():
+            b = blobs.setdefault(e["hash"], {"size": e["size"], "last_used": 0.0, "urls": [], "path": self._blob_path(e)})
+            b["last_used"] = max(b["last_used"], e.get("last_used", 0.0))
+            b["urls"].append(url)
+        total = sum(b["size"] for b in blobs.values())
+        for digest, b in sorted(blobs.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            for url in b["urls"]:
+                del self._index[url]
+            try:
+                os.unlink(b["path"])
+            except OSError:
+                pass
+            total -= b["size"]
+
+    def warm(self, urls: Iterable[str]) -> Dict[str, str]:
+        """Pre-fetch urls; returns {url: "ok" | error text}."""
+        out = {}
+        for url in urls:
+            try:
+                self.fetch(url)
+                out[url] = "ok"
+            except Exception as e:
+                out[url] = str(e)
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            hashes = {e["hash"]: e["size"] for e in self._index.values()}
+            return {"urls": len(self._index), "blobs": len(hashes),
+                    "bytes": sum(hashes.values()), "max_bytes": self.max_bytes}
+
+# ---------- shared cache ----------
+
+_CACHE: Optional[AudioCache] = None
+_CACHE_LOCK = threading.Lock()
+
+def enabled() -> bool:
+    return os.environ.get("HOUSEAUDIO_AUDIO_CACHE", "1") != "0"
+
+def get_cache() -> AudioCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = AudioCache()
+        return _CACHE
+
+def mpd_uri(path: str) -> str:
+    """
+    How MPD should address a cached file: relative to its music_directory when
+    the cache lives inside it (MPD_MUSIC_DIR), else a file:// URI (MPD only
+    accepts those from clients on its local Unix socket).
+    """
+    music_dir = os.environ.get("MPD_MUSIC_DIR")
+    if music_dir:
+        rel = os.path.relpath(os.path.abspath(path), os.path.abspath(music_dir))
+        if not rel.startswith(".."):
+            return rel
+    return "file://" + os.path.abspath(path)
+
+def resolve(url: str) -> str:
+    """Local path for a remote clip, or the URL itself if caching is off or the fetch fails."""
+    if not enabled() or not url.lower().startswith(("http://", "https://")):
+        return url
+    try:
+        return get_cache().fetch(url)
+    except Exception as e:
+        print(f"[audio_cache] fetch failed for {url}: {e}")
+        return url
+
+def resolve_for_mpd(url: str) -> str:
+    if os.path.isabs(url):   # already local (an uploaded clip)
+        return mpd_uri(url)
+    local = resolve(url)
+    return url if local == url else mpd_uri(local)
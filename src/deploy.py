@@ -7,6 +7,8 @@ import hmac
 import hashlib
 import subprocess
 
+from . import tracing
+
 def verify_signature(secret: str, body: bytes, sent_sig: str) -> bool:
     """
     Check HMAC signature. sent_sig should look like 'sha256=<hex>'
@@ -21,13 +23,14 @@ def verify_signature(secret: str, body: bytes, sent_sig: str) -> bool:
     return hmac.compare_digest(mac, sent_hash)
 
 def run_cmd(cmd):
-    proc = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
-    out, err = proc.communicate()
+    with tracing.span("subprocess", cmd=" ".join(cmd[:2])):
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        out, err = proc.communicate()
     return proc.returncode, out.strip(), err.strip()
 
 def do_deploy():
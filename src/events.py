@@ -0,0 +1,142 @@
+# src/events.py
+# Change feed behind GET /zones/stream.
+#
+# Publishers (the receiver state cache, the MPD player watcher) hand
+# publish() a small diff like {"zones": {"inside": {"volume": 40}}}. Every
+# event gets a sequence id and stays in a short replay ring, so a client that
+# reconnects with Last-Event-ID gets just what it missed. Each subscriber has
+# its own bounded queue: publishing never blocks, and a subscriber that falls
+# a whole buffer behind is marked lagged and resynced with a fresh snapshot
+# instead of the backlog.
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+STREAM_BUFFER = int(os.environ.get("HOUSEAUDIO_STREAM_BUFFER", "256"))        # events per client
+REPLAY_EVENTS = int(os.environ.get("HOUSEAUDIO_STREAM_REPLAY", "1024"))        # kept for Last-Event-ID
+MAX_SUBSCRIBERS = int(os.environ.get("HOUSEAUDIO_STREAM_MAX_CLIENTS", "4"))   # each holds a server thread
+
+class HubFull(Exception):
+    pass
+
+class Event:
+    __slots__ = ("id", "data")
+
+    def __init__(self, id: int, data: dict):
+        self.id = id
+        self.data = data
+
+class Subscriber:
+    def __init__(self, hub: "EventHub", start_id: int, maxlen: int):
+        self.hub = hub
+        self.start_id = start_id   # last event id already covered when it subscribed
+        self.maxlen = maxlen
+        self.dropped = 0           # events discarded because the client fell behind
+        self._cond = threading.Condition()
+        self._queue: Deque[Event] = deque()
+        self._lagged = False
+        self._closed = False
+
+    def push(self, ev: Event) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._queue) >= self.maxlen:
+                # too far behind: the backlog is worthless, resync instead
+                self.dropped += len(self._queue) + 1
+                self._queue.clear()
+                self._lagged = True
+            else:
+                self._queue.append(ev)
+            self._cond.notify()
+
+    def get(self, timeout: float) -> Tuple[List[Event], bool]:
+        """Wait up to timeout for events. Returns (events, lagged)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue or self._lagged or self._closed, timeout)
+            events, lagged = list(self._queue), self._lagged
+            self._queue.clear()
+            self._lagged = False
+            return events, lagged
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.hub.unsubscribe(self)
+
+class EventHub:
+    def __init__(self, buffer: int = STREAM_BUFFER, replay: int = REPLAY_EVENTS,
+                 max_subscribers: int = MAX_SUBSCRIBERS):
+        self.buffer = buffer
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._ring: Deque[Event] = deque(maxlen=replay)
+        self._subs: List[Subscriber] = []
+
+    @property
+    def last_id(self) -> int:
+        with self._lock:
+            return self._seq
+
+    @property
+    def subscribers(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+    def publish(self, data: dict) -> int:
+        with self._lock:
+            self._seq += 1
+            ev = Event(self._seq, data)
+            self._ring.append(ev)
+            subs = list(self._subs)
+        for sub in subs:
+            sub.push(ev)
+        return ev.id
+
+    def subscribe(self, last_id: Optional[int] = None) -> Tuple[Subscriber, Optional[List[Event]]]:
+        """
+        Register a subscriber. Returns (subscriber, backlog): the events after
+        last_id still in the replay ring, or None when the client needs a full
+        snapshot (new client, or last_id is older than the ring / from a
+        previous run). Raises HubFull past max_subscribers.
+        """
+        with self._lock:
+            if len(self._subs) >= self.max_subscribers:
+                raise HubFull(f"{len(self._subs)} streams already open")
+            sub = Subscriber(self, self._seq, self.buffer)
+            self._subs.append(sub)
+            if last_id is None or last_id > self._seq:
+                return sub, None
+            if last_id == self._seq:
+                return sub, []
+            if not self._ring or self._ring[0].id > last_id + 1:
+                return sub, None
+            return sub, [ev for ev in self._ring if ev.id > last_id]
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._lock:
+            if sub in self._subs:
+                self._subs.remove(sub)
+
+def merge(events: List[Event]) -> dict:
+    """Fold several diffs into one (later values win)."""
+    out: dict = {}
+    for ev in events:
+        for section, items in ev.data.items():
+            dst = out.setdefault(section, {})
+            for key, value in items.items():
+                if isinstance(value, dict) and isinstance(dst.get(key), dict):
+                    dst[key].update(value)
+                else:
+                    dst[key] = dict(value) if isinstance(value, dict) else value
+    return out
+
+def format_sse(event_id: int, name: str, data: dict) -> str:
+    return f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+HUB = EventHub()
@@ -1,72 +1,185 @@
 # src/helpers/announce.py
-import subprocess, time, os, yaml
-from .. import iscp
-
-CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "zones.yaml")
+import os, time, threading
+from contextlib import contextmanager
+from .. import audio_cache, iscp, metrics, mpd_control, tracing, zone_locks, zones
 
 def load_zones():
-    try:
-        with open(CONFIG_PATH, "r") as f:
-            data = yaml.safe_load(f) or {}
-        return data.get("zones", {})
-    except Exception as e:
-        print(f"[announce] zones load error: {e}")
-        return {}
+    """zones.yaml 'zones' as plain dicts (compat; new code should use zones.current())."""
+    return {name: z.as_dict() for name, z in zones.current().zones.items()}
+
+def load_warm_clips():
+    """Clip URLs to pre-fetch into the audio cache (zones.yaml 'warm_clips')."""
+    return list(zones.current().warm_clips)
+
+# One MPD feeds every zone, so only one announcement may own the player at a time
+PLAYER_LOCK = threading.Lock()
+
+# Upper bound on waiting for the receiver to confirm one step (echo or re-query)
+ACK_TIMEOUT_S = float(os.environ.get("HOUSEAUDIO_ANNOUNCE_ACK_TIMEOUT_MS", "2000")) / 1000.0
+ACK_RETRY_S = 0.05
 
 def _hex_from_percent(p): p = max(0, min(100, int(p))); return f"{p:02X}"
-def _mpc(*args): return subprocess.run(["mpc", *args], check=False)
-
-def _mpc_status_text():
-    p = subprocess.Popen(["mpc", "status"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    out, _ = p.communicate()
-    return out or ""
-
-def _wait_mpc_stop(max_s=60):
-    end = time.time() + max_s
-    while time.time() < end:
-        if "[playing]" not in _mpc_status_text():
-            return
-        time.sleep(0.2)
-
-def play_zone_announcement(zone_name: str, volume_pct: int, file_url: str):
-    zones = load_zones()
-    if zone_name not in zones:
-        raise ValueError(f"unknown zone '{zone_name}'")
-    cfg = zones[zone_name] or {}
-    zone_id = str(cfg.get("zone_id", "1"))
-    ann_sli = str(cfg.get("sli", "2B")).upper()
-
-    # single-receiver deployment: IP from env or hardcoded in systemd
-    ip = os.environ.get("DEFAULT_RECEIVER_IP", "192.168.50.249")
-    cli = iscp.EISCPClient(ip)
-
-    # Ensure power for this zone
-    cli.power(True, zone=zone_id); time.sleep(0.1)
-
-    # Snapshot this zone's input & volume
-    prev_in  = cli.input_query(zone_id) or ""
-    prev_v   = cli.volume_query(zone_id) or ""
-    prev_hex = prev_v[-2:] if len(prev_v) >= 2 else "32"
-    was_on_ann_input = prev_in.endswith(ann_sli)
-
-    # Switch only this zone to the announcement input and set volume
-    cli.input_select(ann_sli, zone=zone_id); time.sleep(0.08)
-    cli.volume_hex(_hex_from_percent(volume_pct), zone=zone_id); time.sleep(0.05)
-
-    muted = False
-    if was_on_ann_input:
-        cli.mute(True, zone=zone_id); muted = True; time.sleep(0.05)
-
-    # Play the URL (Pi/MPD is the shared source)
-    _mpc("clear"); _mpc("add", file_url); _mpc("play")
-    _wait_mpc_stop(max_s=120)
-
-    if muted:
-        cli.mute(False, zone=zone_id); time.sleep(0.05)
-
-    # Restore this zone's previous input & volume
-    prev_sli = prev_in[-2:].upper() if len(prev_in) >= 2 else None
-    if prev_sli and all(c in "0123456789ABCDEF" for c in prev_sli):
-        cli.input_select(prev_sli, zone=zone_id); time.sleep(0.05)
-    if prev_hex and all(c in "0123456789ABCDEF" for c in prev_hex.upper()):
-        cli.volume_hex(prev_hex.upper(), zone=zone_id)
+
+def _is_hex2(v): return bool(v) and len(v) == 2 and all(c in "0123456789ABCDEF" for c in v.upper())
+
+def play_zone_announcement(zone_name: str, volume_pct: int, file_url: str, cancel: threading.Event = None):
+    return play_broadcast_announcement([zone_name], volume_pct, file_url, cancel=cancel)
+
+def _value(frame):
+    return frame[5:].upper() if frame and len(frame) > 5 else None
+
+def _set_confirmed(cli, sets, timeout_s: float = None):
+    """
+    Send sets [(zone, field, hex)] as one batch and return once the receiver
+    has confirmed every value: normally its echo; anything whose echo went
+    missing (or differs) is re-queried until timeout_s. Returns the
+    (zone, field) pairs never confirmed — logged, not raised, so the clip
+    still plays.
+    """
+    if not sets:
+        return []
+    timeout_s = ACK_TIMEOUT_S if timeout_s is None else timeout_s
+    deadline = time.monotonic() + timeout_s
+    want = {(str(z), f): str(v).upper() for z, f, v in sets}
+    echoes = cli.set_fields(sets)
+    pending = {(str(z), f) for (z, f, _), frame in zip(sets, echoes) if _value(frame) != want[(str(z), f)]}
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        wanted = {}
+        for z, f in sorted(pending):
+            wanted.setdefault(z, []).append(f)
+        got = cli.query_fields(wanted, window_s=min(remaining, iscp.WINDOW_MAX_S))
+        pending = {(z, f) for z, f in pending if _value(got.get(z, {}).get(f)) != want[(z, f)]}
+        if pending:
+            tracing.sleep(max(0.0, min(ACK_RETRY_S, deadline - time.monotonic())), reason="ack retry")
+    if pending:
+        print(f"[announce] receiver {cli.host} did not confirm {sorted(pending)} within {timeout_s:.1f}s")
+    return sorted(pending)
+
+def _prepare_receiver(cli, targets, vol_hex):
+    """
+    Power, snapshot, switch and level the target zones ({zone_id: sli}) on one
+    receiver. Each step waits for the receiver to confirm it, so MPD starts
+    only once the inputs have really switched. Returns (prev, muted) for
+    _restore_receiver.
+    """
+    ids = list(targets)
+    # Ensure power for every target zone
+    _set_confirmed(cli, [(z, "power", "01") for z in ids])
+
+    # SETs queued before we took the zone locks (e.g. /zones/set) reach the
+    # receiver first, so the snapshot sees them and the restore keeps them
+    cli.flush()
+
+    # Snapshot every zone's input & volume in one round trip
+    snap = cli.query_fields({z: ("input", "volume") for z in ids})
+    prev = {}
+    for z in ids:
+        prev_in, prev_v = snap[z]["input"], snap[z]["volume"]
+        prev[z] = {
+            "sli": prev_in[-2:].upper() if len(prev_in) >= 2 else None,
+            "vol": prev_v[-2:].upper() if len(prev_v) >= 2 else "32",
+            "was_on_ann_input": prev_in.endswith(targets[z]),
+        }
+
+    # Switch all target zones to their announcement input, set volume, mute as needed: one batch
+    muted = [z for z in ids if prev[z]["was_on_ann_input"]]
+    _set_confirmed(cli, [(z, "input", targets[z]) for z in ids] + [(z, "volume", vol_hex) for z in ids]
+                   + [(z, "mute", "01") for z in muted])
+    return prev, muted
+
+def _restore_receiver(cli, prev, muted):
+    # Previous input & volume for every zone, then unmute, in one batch
+    restore = [(z, "input", p["sli"]) for z, p in prev.items() if _is_hex2(p["sli"])]
+    restore += [(z, "volume", p["vol"]) for z, p in prev.items() if _is_hex2(p["vol"])]
+    restore += [(z, "mute", "00") for z in muted]
+    _set_confirmed(cli, restore)
+
+def _phase(name: str, since: float) -> float:
+    """Record one announcement phase in /metrics and the trace; returns now for the next phase."""
+    now = time.monotonic()
+    metrics.ANNOUNCE_SECONDS.observe(now - since, name)
+    tracing.record(f"announce.{name}", time.perf_counter() - (now - since))
+    return now
+
+def _play_clip(play_uri: str, file_url: str, cancel: threading.Event = None):
+    """
+    Start the clip in MPD and wait for it to end. If MPD refuses the cached
+    copy (a file:// URI from a TCP client, say) the original URL is tried.
+    Returns None once it played, else MPD's error.
+    """
+    uris = [play_uri] if play_uri == file_url or os.path.isabs(file_url) else [play_uri, file_url]
+    err = ""
+    for uri in uris:
+        rc, _, err = mpd_control.play_now(uri)
+        if rc == 0:
+            mpd_control.wait_until_stopped(max_s=120, cancel=cancel)
+            return None
+        print(f"[announce] mpd refused {uri}: {err}")
+    return err or "play failed"
+
+@contextmanager
+def _hold_player(held):
+    # PLAYER_LOCK after the zone locks (always this order); its wait counts as lock wait
+    t0 = time.monotonic()
+    with tracing.span("player_lock"), PLAYER_LOCK:
+        held.wait_s += time.monotonic() - t0
+        yield
+
+def play_broadcast_announcement(zone_names, volume_pct: int, file_url: str, cancel: threading.Event = None):
+    """
+    Play one clip in several zones at once. Every receiver step (power,
+    snapshot, switch + volume, restore) is a single pipelined batch per
+    receiver covering all its target zones, receivers are driven in
+    parallel, and MPD plays the clip once. Returns {"lock_wait_ms"}.
+    """
+    cfg = zones.current()
+    groups = {}   # Receiver -> {zone_id: announcement SLI} (first name wins if two share an id)
+    for name in zone_names:
+        zone = cfg.zones.get(name)
+        if zone is None:
+            raise ValueError(f"unknown zone '{name}'")
+        groups.setdefault(cfg.receiver_for(zone), {}).setdefault(zone.zone_id, zone.sli)
+
+    t_start = time.monotonic()
+    # Fetch (or hit) the local copy before any zone is switched over
+    play_uri = audio_cache.resolve_for_mpd(file_url)
+    t = _phase("fetch", t_start)
+
+    clients = {r: iscp.EISCPClient(r.host, r.port) for r in groups}
+    vol_hex = _hex_from_percent(volume_pct)
+
+    # Hold only our own zones: other zones stay controllable during the clip.
+    # The player is shared by every zone, so it is held from the first input
+    # switch to the restore: another announcement's zones must not be on the
+    # announcement input while this clip plays.
+    with zone_locks.hold_keys((r.host, zid) for r, t in groups.items() for zid in t) as held, \
+            _hold_player(held):
+        metrics.ANNOUNCE_SECONDS.observe(held.wait_s, "lock_wait")
+        t = time.monotonic()
+        prepared = {}
+        for r, (res, err) in iscp.fan_out(lambda r: _prepare_receiver(clients[r], groups[r], vol_hex), groups).items():
+            if err is not None:
+                print(f"[announce] receiver {r.name} ({r.host}) setup failed: {err}")
+            else:
+                prepared[r] = res
+        t = _phase("prepare", t)
+
+        # Play the URL once (Pi/MPD is the shared source)
+        play_error = None
+        if prepared and not (cancel and cancel.is_set()):
+            play_error = _play_clip(play_uri, file_url, cancel)
+        t = _phase("play", t)
+
+        for r, (_, err) in iscp.fan_out(lambda r: _restore_receiver(clients[r], *prepared[r]), prepared).items():
+            if err is not None:
+                print(f"[announce] receiver {r.name} ({r.host}) restore failed: {err}")
+        _phase("restore", t)
+        _phase("total", t_start)
+        if not prepared:
+            raise ConnectionError("no receiver could be prepared for the announcement")
+        if play_error is not None:
+            raise RuntimeError(f"mpd could not play {file_url}: {play_error}")
+    return {"lock_wait_ms": held.wait_ms}
@@ -1,18 +1,31 @@
 # src/iscp.py
+import contextvars
+import os
+import re
 import socket
 import struct
-from typing import Optional, Tuple
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Callable, Deque, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from . import metrics, tracing
 
 ISCP_MAGIC = b"ISCP"
 ISCP_VER   = 1
 CR         = b"\r"
 EM         = b"\x1a"   # Integra often appends 0x1A (EM) before CRLF
+_HEX2      = re.compile(r"[0-9A-Fa-f]{2}")
 
 DEFAULT_TIMEOUT = 2.0
 DEFAULT_PORT = 60128
 
 # ---------- low-level eISCP framing ----------
 
+@lru_cache(maxsize=256)   # QSTN and common SET packets are framed once
 def _build_eiscp(bare_cmd: str) -> bytes:
     """
     Wrap bare ASCII command (e.g., 'PWRQSTN', 'ZPWQSTN', 'PWR01') into eISCP.
@@ -27,36 +40,57 @@ def _build_eiscp(bare_cmd: str) -> bytes:
     header += bytes([ISCP_VER, 0x00, 0x00, 0x00])   # version + reserved
     return header + payload
 
-def _read_one_frame(sock: socket.socket, timeout: float = 2.0) -> Optional[str]:
+RECV_BUFSIZE = 4096         # one recv_into drains a whole post-power-on burst
+MAX_FRAME_SIZE = 64 * 1024  # anything bigger is a corrupt header, not a frame
+
+class FrameDecoder:
     """
-    Read a single eISCP frame and return the ASCII payload without trailing 0x1A/CR/LF.
-    Returns None on EOF or invalid header.
+    Incremental eISCP decoder. Feed it whatever recv() returned; it returns
+    every complete frame payload (ASCII, trailing EM/CR/LF stripped) and
+    keeps partial frames for the next call. After garbage or a bogus header
+    it resynchronises on the next 'ISCP' magic.
     """
-    sock.settimeout(timeout)
 
-    # Read 16-byte header (allow partial reads)
-    hdr = b""
-    while len(hdr) < 16:
-        chunk = sock.recv(16 - len(hdr))
-        if not chunk:
-            return None
-        hdr += chunk
-
-    if hdr[:4] != ISCP_MAGIC:
-        return None
+    def __init__(self):
+        self._buf = bytearray()
 
-    data_len = int.from_bytes(hdr[8:12], "big")
+    def __len__(self) -> int:
+        return len(self._buf)
 
-    # Read payload (allow partial reads)
-    data = b""
-    while len(data) < data_len:
-        chunk = sock.recv(data_len - len(data))
-        if not chunk:
-            break
-        data += chunk
+    def feed(self, chunk) -> List[str]:
+        buf = self._buf
+        buf += chunk
+        frames = []
+        pos = 0
+        while True:
+            start = buf.find(ISCP_MAGIC, pos)
+            if start < 0:
+                # keep a tail that might be the first bytes of the next magic
+                pos = max(pos, len(buf) - (len(ISCP_MAGIC) - 1))
+                break
+            if len(buf) - start < 16:
+                pos = start
+                break
+            hdr_len = int.from_bytes(buf[start + 4:start + 8], "big")
+            data_len = int.from_bytes(buf[start + 8:start + 12], "big")
+            if hdr_len != 16 or buf[start + 12] != ISCP_VER or data_len > MAX_FRAME_SIZE:
+                pos = start + 1   # not a real header; look for the next magic
+                continue
+            end = start + hdr_len + data_len
+            if len(buf) < end:
+                pos = start
+                break
+            frame = _clean_payload(buf[start + hdr_len:end])
+            if frame:
+                frames.append(frame)
+            pos = end
+        if pos:
+            del buf[:pos]
+        return frames
 
-    # Strip trailing EM(0x1A), CR, LF if present
-    data = data.rstrip(b"\r\n")
+def _clean_payload(data: bytes) -> Optional[str]:
+    """Strip trailing EM(0x1A), CR, LF from a frame payload and decode it."""
+    data = bytes(data).rstrip(b"\r\n")
     if data.endswith(EM):
         data = data[:-1]
     data = data.rstrip(b"\r\n")
@@ -66,69 +100,571 @@ def _read_one_frame(sock: socket.socket, timeout: float = 2.0) -> Optional[str]:
     except Exception:
         return None
 
-def _transact_one(host: str, port: int, bare_cmd: str, expect_prefix: str, window_s: float = 1.0, timeout: float = DEFAULT_TIMEOUT) -> Optional[str]:
+# ---------- persistent connection manager ----------
+
+def _enable_keepalive(sock: socket.socket) -> None:
     """
-    Open a connection, send one command (QSTN or SET), and return the first frame
-    that starts with expect_prefix (e.g., '!1ZPW', '!1VL3'). Ignores unrelated frames.
+    Turn on TCP keepalive so a receiver that silently drops off the LAN is
+    noticed by the reader thread instead of leaving a dead socket in the pool.
     """
-    pkt = _build_eiscp(bare_cmd)
-    with socket.create_connection((host, port), timeout=timeout) as s:
-        s.sendall(pkt)
-        # Read for a short window — ignoring unsolicited frames
-        s.settimeout(0.2)
-        import time
-        deadline = time.time() + window_s
-        while time.time() < deadline:
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    # Linux-only knobs; other platforms keep their defaults
+    for opt, val in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+        if hasattr(socket, opt):
             try:
-                frame = _read_one_frame(s, timeout=0.2)
-                if not frame:
-                    continue
-                if frame.startswith(expect_prefix):
-                    return frame
-            except socket.timeout:
-                continue
-            except Exception:
-                break
-    return None
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, opt), val)
+            except OSError:
+                pass
 
-# ---------- zone-aware helpers ----------
+# ---------- session arbitration ----------
 
-def _cmds(zone: str):
+# Receivers only accept a handful of eISCP clients. Each persistent socket
+# (pooled sync, shared async) holds one slot for as long as it is open.
+MAX_SESSIONS = int(os.environ.get("HOUSEAUDIO_MAX_EISCP_SESSIONS", "2"))
+
+class SessionGate:
+    """Process-wide cap on simultaneous eISCP sessions to one receiver."""
+
+    def __init__(self, limit: int = MAX_SESSIONS):
+        self.limit = limit
+        self._sem = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.open = 0
+
+    def acquire(self, timeout: float) -> None:
+        if not self._sem.acquire(timeout=timeout):
+            raise ConnectionError(f"all {self.limit} eISCP sessions to this receiver are in use")
+        with self._lock:
+            self.open += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self.open -= 1
+        self._sem.release()
+
+_GATES: Dict[Tuple[str, int], SessionGate] = {}
+_GATES_LOCK = threading.Lock()
+
+def session_gate(host: str, port: int = DEFAULT_PORT) -> SessionGate:
+    key = (host, int(port))
+    with _GATES_LOCK:
+        gate = _GATES.get(key)
+        if gate is None:
+            gate = _GATES[key] = SessionGate()
+        return gate
+
+# ---------- circuit breaker ----------
+
+# A receiver in deep standby doesn't answer connects at all. After
+# BREAKER_THRESHOLD consecutive connect failures its circuit opens and every
+# call fails at once with ReceiverUnavailable instead of sitting in the
+# connect timeout. When the cooldown is up one caller (often the state
+# listener's periodic reconnect) is let through as a half-open probe: success
+# closes the circuit, failure re-opens it with a doubled cooldown.
+BREAKER_THRESHOLD = int(os.environ.get("HOUSEAUDIO_BREAKER_THRESHOLD", "2"))
+BREAKER_COOLDOWN_MIN = 1.0     # first open period (s)
+BREAKER_COOLDOWN_MAX = float(os.environ.get("HOUSEAUDIO_BREAKER_COOLDOWN_MAX_S", "30"))
+
+class ReceiverUnavailable(ConnectionError):
+    """The receiver's circuit is open; the call failed without touching the network."""
+
+class CircuitBreaker:
+    def __init__(self, name: str, threshold: int = BREAKER_THRESHOLD):
+        self.name = name
+        self.threshold = threshold
+        self.state = "closed"          # closed | open | half_open
+        self.failures = 0              # consecutive connect failures
+        self.trips = 0                 # times the circuit has opened
+        self.last_error: Optional[str] = None
+        self._cooldown = BREAKER_COOLDOWN_MIN
+        self._open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        """Raise ReceiverUnavailable unless a connect attempt may go ahead now."""
+        with self._lock:
+            if self.state == "closed":
+                return
+            now = time.monotonic()
+            if self.state == "open" and now >= self._open_until:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True   # this caller is the probe
+                return
+            wait = max(0.0, self._open_until - now)
+            metrics.EISCP_REJECTED.inc(self.name)
+            raise ReceiverUnavailable(
+                f"receiver {self.name} unavailable (circuit {self.state}, retry in {wait:.1f}s): {self.last_error}"
+            )
+
+    def ready(self) -> bool:
+        """Would allow() let a connect attempt through now? (Claims nothing.)"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                return time.monotonic() >= self._open_until
+            return not self._probing
+
+    def success(self) -> None:
+        metrics.EISCP_CONNECTS.inc(self.name, "ok")
+        with self._lock:
+            if self.state != "closed":
+                print(f"[iscp] receiver {self.name} reachable again, circuit closed")
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+            self._cooldown = BREAKER_COOLDOWN_MIN
+
+    def failure(self, err: BaseException) -> None:
+        metrics.EISCP_CONNECTS.inc(self.name, "error")
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(err) or type(err).__name__
+            if self.state == "half_open":
+                self._cooldown = min(BREAKER_COOLDOWN_MAX, self._cooldown * 2)
+            elif self.failures < self.threshold:
+                return
+            else:
+                self.trips += 1
+                print(f"[iscp] receiver {self.name} unreachable ({self.last_error}), circuit open")
+            self.state = "open"
+            self._probing = False
+            self._open_until = time.monotonic() + self._cooldown
+
+    def cancel(self) -> None:
+        """The probe gave up before connecting (no verdict); let the next caller probe."""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry = max(0.0, self._open_until - time.monotonic()) if self.state == "open" else 0.0
+            return {"state": self.state, "failures": self.failures, "trips": self.trips,
+                    "retry_in_s": round(retry, 2), "last_error": self.last_error}
+
+_BREAKERS: Dict[Tuple[str, int], CircuitBreaker] = {}
+
+def breaker_for(host: str, port: int = DEFAULT_PORT) -> CircuitBreaker:
+    """Shared by every sync and async connection to (host, port)."""
+    key = (host, int(port))
+    with _GATES_LOCK:
+        br = _BREAKERS.get(key)
+        if br is None:
+            br = _BREAKERS[key] = CircuitBreaker(f"{host}:{port}")
+        return br
+
+# ---------- adaptive response windows ----------
+
+# Most replies land in 20-40 ms, so a fixed 1 s window makes every missing
+# reply cost a full second. Each receiver keeps recent reply latencies per
+# command family and a transaction waits p99 x WINDOW_FACTOR, clamped to
+# [WINDOW_MIN_S, WINDOW_MAX_S]. Until enough samples exist, and right after a
+# family timed out (the estimate may be too tight), it waits WINDOW_MAX_S.
+WINDOW_MIN_S = float(os.environ.get("HOUSEAUDIO_WINDOW_MIN_MS", "150")) / 1000.0
+WINDOW_MAX_S = float(os.environ.get("HOUSEAUDIO_WINDOW_MAX_MS", "1000")) / 1000.0
+WINDOW_FACTOR = float(os.environ.get("HOUSEAUDIO_WINDOW_FACTOR", "3"))
+LATENCY_SAMPLES = 256          # per family
+LATENCY_MIN_SAMPLES = 20
+
+def _percentile(sorted_vals: Sequence[float], q: float) -> float:
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+class _FamilyLatency:
+    __slots__ = ("samples", "count", "timeouts", "missed_in_row", "_window", "_dirty")
+
+    def __init__(self):
+        self.samples: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.count = 0
+        self.timeouts = 0
+        self.missed_in_row = 0
+        self._window = WINDOW_MAX_S
+        self._dirty = False
+
+    def window(self) -> float:
+        if self.missed_in_row or len(self.samples) < LATENCY_MIN_SAMPLES:
+            return WINDOW_MAX_S
+        if self._dirty:
+            p99 = _percentile(sorted(self.samples), 0.99)
+            self._window = min(WINDOW_MAX_S, max(WINDOW_MIN_S, p99 * WINDOW_FACTOR))
+            self._dirty = False
+        return self._window
+
+class LatencyTracker:
+    """Reply latency per command family ('ZVL', 'PWR', ...) for one receiver."""
+
+    def __init__(self, name: str = ""):
+        self.name = name   # "host:port", the metrics label
+        self._lock = threading.Lock()
+        self._families: Dict[str, _FamilyLatency] = {}
+
+    def _fam(self, family: str) -> _FamilyLatency:
+        fam = self._families.get(family)
+        if fam is None:
+            fam = self._families[family] = _FamilyLatency()
+        return fam
+
+    def record(self, family: str, latency_s: Optional[float]) -> None:
+        """latency_s None means no reply arrived within the window."""
+        zone = _FAMILY_ZONE.get(family, "")
+        if latency_s is None:
+            metrics.EISCP_TIMEOUTS.inc(self.name, family, zone)
+        else:
+            metrics.EISCP_SECONDS.observe(latency_s, self.name, family, zone)
+        with self._lock:
+            fam = self._fam(family)
+            if latency_s is None:
+                fam.timeouts += 1
+                fam.missed_in_row += 1
+            else:
+                fam.samples.append(latency_s)
+                fam.count += 1
+                fam.missed_in_row = 0
+                fam._dirty = True
+
+    def window(self, families: Iterable[str]) -> float:
+        with self._lock:
+            return max((self._fam(f).window() for f in families), default=WINDOW_MAX_S)
+
+    def snapshot(self) -> Dict[str, dict]:
+        out = {}
+        with self._lock:
+            for name, fam in sorted(self._families.items()):
+                vals = sorted(fam.samples)
+                ms = (lambda q: round(_percentile(vals, q) * 1000.0, 1)) if vals else (lambda q: None)
+                out[name] = {"count": fam.count, "timeouts": fam.timeouts,
+                             "p50_ms": ms(0.5), "p95_ms": ms(0.95), "p99_ms": ms(0.99),
+                             "max_ms": round(vals[-1] * 1000.0, 1) if vals else None,
+                             "window_ms": round(fam.window() * 1000.0, 1)}
+        return out
+
+_LATENCY: Dict[Tuple[str, int], LatencyTracker] = {}
+
+def latency_for(host: str, port: int = DEFAULT_PORT) -> LatencyTracker:
+    """Shared by every sync and async connection to (host, port)."""
+    key = (host, int(port))
+    with _GATES_LOCK:
+        tr = _LATENCY.get(key)
+        if tr is None:
+            tr = _LATENCY[key] = LatencyTracker(f"{host}:{port}")
+        return tr
+
+def _family(prefix: str) -> str:
+    return prefix[2:5] if prefix.startswith("!1") else prefix[:3]
+
+def _set_value(bare_cmd: str) -> Optional[str]:
+    """The value a SET writes ('ZVL25' -> '25'); None for queries and steps like 'MVLUP'."""
+    arg = bare_cmd[3:]
+    return arg.upper() if _HEX2.fullmatch(arg) else None
+
+def _accepts(want: Optional[str], prefix: str, frame: str) -> bool:
     """
-    Map logical zone to command families:
-      Zone 1 (main):  PWR/MVL/SLI/AMT + QSTN forms
-      Zone 2:         ZPW/ZVL/SLZ/ZMT + QSTN forms
-      Zone 3:         PW3/VL3/SL3/MT3 + QSTN forms
+    Is frame the reply to a command expecting prefix? A SET's echo carries
+    the value it wrote: a frame with another value is a late echo of an
+    earlier SET whose caller already timed out, or a front-panel change, and
+    must not count as this SET's ack. N/A (rejected) is still the answer.
+    """
+    if not frame.startswith(prefix):
+        return False
+    if want is None:
+        return True
+    got = frame[len(prefix):].upper()
+    return got == want or got == "N/A"
+
+class _Waiter:
+    __slots__ = ("prefix", "want", "event", "frame", "arrived")
+
+    def __init__(self, prefix: str, want: Optional[str] = None):
+        self.prefix = prefix
+        self.want = want
+        self.event = threading.Event()
+        self.frame: Optional[str] = None
+        self.arrived = 0.0
+
+class ReceiverConnection:
     """
-    z = str(zone)
-    if z == "1":
-        return {
-            "PWR": "PWR",  "PWRQ": "PWRQSTN",
-            "MVL": "MVL",  "MVLQ": "MVLQSTN",
-            "SLI": "SLI",  "SLIQ": "SLIQSTN",
-            "AMT": "AMT",
-        }
-    if z == "2":
-        return {
-            "PWR": "ZPW",  "PWRQ": "ZPWQSTN",
-            "MVL": "ZVL",  "MVLQ": "ZVLQSTN",
-            "SLI": "SLZ",  "SLIQ": "SLZQSTN",
-            "AMT": "ZMT",
-        }
-    if z == "3":
-        return {
-            "PWR": "PW3",  "PWRQ": "PW3QSTN",
-            "MVL": "VL3",  "MVLQ": "VL3QSTN",
-            "SLI": "SL3",  "SLIQ": "SL3QSTN",
-            "AMT": "MT3",
-        }
-    # fallback to main
-    return {
+    One long-lived eISCP socket per receiver.
+
+    A reader thread decodes every incoming frame and hands it to the oldest
+    caller waiting on that command family (e.g. '!1ZVL'); a SET only takes an
+    echo of the value it wrote (see _accepts). Every frame, matched
+    or not, is also passed to registered listeners (see receiver_state). If
+    the socket dies it is reopened on the next send; repeated connect
+    failures open the receiver's circuit breaker so callers fail fast.
+    """
+
+    def __init__(self, host: str, port: int = DEFAULT_PORT, timeout: float = DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._gate = session_gate(host, port)
+        self._conn_lock = threading.Lock()   # socket lifecycle + writes
+        self._lock = threading.Lock()        # waiter table
+        self._waiters: Dict[str, Deque[_Waiter]] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self.connected_since: Optional[float] = None   # monotonic time of the current connect
+        self.breaker = breaker_for(host, port)
+        self.latency = latency_for(host, port)
+
+    # -- socket lifecycle (call with _conn_lock held) --
+
+    def _connect_locked(self) -> socket.socket:
+        if self._sock is not None:
+            return self._sock
+        self.breaker.allow()   # fails fast while the receiver is known to be down
+        with tracing.span("eiscp.connect", receiver=self.breaker.name):
+            try:
+                self._gate.acquire(self.timeout)
+            except ConnectionError:
+                self.breaker.cancel()
+                raise
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            except OSError as e:
+                self._gate.release()
+                self.breaker.failure(e)
+                raise
+        self.breaker.success()
+        _enable_keepalive(sock)
+        sock.settimeout(None)
+        self._sock = sock
+        self.connected_since = time.monotonic()
+        threading.Thread(
+            target=self._reader, args=(sock,), name=f"eiscp-reader-{self.host}", daemon=True
+        ).start()
+        return sock
+
+    def _drop_locked(self, sock: socket.socket) -> None:
+        if self._sock is sock:
+            self._sock = None
+            self.connected_since = None
+            self._gate.release()
+        try:
+            sock.close()
+        except Exception:
+            pass
+
+    def _send(self, pkt: bytes) -> None:
+        with self._conn_lock:
+            sock = self._connect_locked()
+            try:
+                sock.sendall(pkt)
+            except OSError:
+                # stale keepalive socket (receiver closed it) — reopen once and retry
+                self._drop_locked(sock)
+                self._connect_locked().sendall(pkt)
+
+    def ensure_connected(self) -> None:
+        """Open the socket now if it isn't already (raises on connect failure)."""
+        with self._conn_lock:
+            self._connect_locked()
+
+    def close(self) -> None:
+        with self._conn_lock:
+            if self._sock is not None:
+                sock = self._sock
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except Exception:
+                    pass
+                self._drop_locked(sock)
+
+    # -- reader / response matching --
+
+    def _reader(self, sock: socket.socket) -> None:
+        decoder = FrameDecoder()
+        view = memoryview(bytearray(RECV_BUFSIZE))   # reused for every recv
+        try:
+            while True:
+                n = sock.recv_into(view)
+                if not n:
+                    break
+                for frame in decoder.feed(view[:n]):
+                    self._dispatch(frame)
+        except Exception:
+            pass
+        finally:
+            with self._conn_lock:
+                self._drop_locked(sock)
+
+    def add_listener(self, cb: Callable[[str], None]) -> None:
+        """Call cb(frame) for every frame received on this connection."""
+        with self._lock:
+            if cb not in self._listeners:
+                self._listeners.append(cb)
+
+    def remove_listener(self, cb: Callable[[str], None]) -> None:
+        with self._lock:
+            if cb in self._listeners:
+                self._listeners.remove(cb)
+
+    def _dispatch(self, frame: str) -> None:
+        with self._lock:
+            listeners = list(self._listeners)
+            for prefix, queue in self._waiters.items():
+                w = next((w for w in queue if _accepts(w.want, prefix, frame)), None)
+                if w is not None:
+                    queue.remove(w)
+                    w.frame = frame
+                    w.arrived = time.monotonic()
+                    w.event.set()
+                    break
+            else:
+                metrics.EISCP_UNMATCHED.inc(self.breaker.name)
+        for cb in listeners:
+            try:
+                cb(frame)
+            except Exception as e:
+                print(f"[iscp] listener error: {e}")
+
+    def _register(self, prefix: str, want: Optional[str] = None) -> _Waiter:
+        w = _Waiter(prefix, want)
+        with self._lock:
+            self._waiters.setdefault(prefix, deque()).append(w)
+        return w
+
+    def _unregister(self, w: _Waiter) -> None:
+        with self._lock:
+            queue = self._waiters.get(w.prefix)
+            if queue is None:
+                return
+            try:
+                queue.remove(w)
+            except ValueError:
+                pass
+            if not queue:
+                del self._waiters[w.prefix]
+
+    def transact(self, bare_cmd: str, expect_prefix: str, window_s: Optional[float] = None) -> Optional[str]:
+        """
+        Send one command (QSTN or SET) and return the first frame that starts
+        with expect_prefix (e.g., '!1ZPW', '!1VL3'), or None after window_s
+        (default: adaptive, from this receiver's measured latency).
+        """
+        return self.transact_many([(bare_cmd, expect_prefix)], window_s=window_s)[0]
+
+    def transact_many(self, cmds: Sequence[Tuple[str, str]], window_s: Optional[float] = None) -> List[Optional[str]]:
+        """
+        Pipeline several (bare_cmd, expect_prefix) pairs: all packets go out in
+        one write and the replies are collected against a single deadline.
+        Returns the matching frames in request order (None where nothing came).
+        """
+        if not cmds:
+            return []
+        families = [_family(prefix) for _, prefix in cmds]
+        if window_s is None:
+            window_s = self.latency.window(families)
+        # register before sending so a fast reply can't slip past us
+        waiters = [self._register(prefix, _set_value(cmd)) for cmd, prefix in cmds]
+        try:
+            with tracing.span("eiscp", receiver=self.breaker.name, families=",".join(families),
+                              window_ms=round(window_s * 1000)) as sp:
+                self._send(b"".join(_build_eiscp(cmd) for cmd, _ in cmds))
+                sent = time.monotonic()
+                deadline = sent + window_s
+                for w in waiters:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    w.event.wait(remaining)
+                for fam, w in zip(families, waiters):
+                    self.latency.record(fam, w.arrived - sent if w.frame is not None else None)
+                if sp is not None:
+                    sp.attrs["timeouts"] = sum(1 for w in waiters if w.frame is None)
+            return [w.frame for w in waiters]
+        finally:
+            for w in waiters:
+                self._unregister(w)
+
+_POOL: Dict[Tuple[str, int], ReceiverConnection] = {}
+_POOL_LOCK = threading.Lock()
+
+def get_connection(host: str, port: int = DEFAULT_PORT, timeout: float = DEFAULT_TIMEOUT) -> ReceiverConnection:
+    """Return the shared connection for (host, port), creating it on first use."""
+    key = (host, int(port))
+    with _POOL_LOCK:
+        conn = _POOL.get(key)
+        if conn is None:
+            conn = _POOL[key] = ReceiverConnection(host, int(port), timeout=timeout)
+        return conn
+
+def close_all() -> None:
+    """Close and forget every pooled connection (tests, shutdown)."""
+    with _POOL_LOCK:
+        conns = list(_POOL.values())
+        _POOL.clear()
+    for conn in conns:
+        conn.close()
+
+# ---------- multi-receiver fan-out ----------
+
+_FANOUT: Optional[ThreadPoolExecutor] = None
+
+def fan_out(fn: Callable, items: Iterable) -> Dict:
+    """
+    Run fn(item) for every item concurrently (one call per receiver, typically)
+    so total latency tracks the slowest receiver, not the sum.
+    Returns {item: (result, None)} or {item: (None, exception)}.
+    """
+    global _FANOUT
+    items = list(items)
+    if len(items) == 1:   # nothing to overlap; skip the pool hop
+        try:
+            return {items[0]: (fn(items[0]), None)}
+        except Exception as e:
+            return {items[0]: (None, e)}
+    with _POOL_LOCK:
+        if _FANOUT is None:
+            _FANOUT = ThreadPoolExecutor(max_workers=8, thread_name_prefix="eiscp-fanout")
+    # each call carries the caller's context (the active trace) into the pool thread
+    futs = {item: _FANOUT.submit(contextvars.copy_context().run, fn, item) for item in items}
+    out = {}
+    for item, fut in futs.items():
+        try:
+            out[item] = (fut.result(), None)
+        except Exception as e:
+            out[item] = (None, e)
+    return out
+
+# ---------- zone-aware helpers ----------
+
+_ZONE_CMDS = {
+    # Zone 1 (main):  PWR/MVL/SLI/AMT + QSTN forms
+    "1": MappingProxyType({
         "PWR": "PWR",  "PWRQ": "PWRQSTN",
         "MVL": "MVL",  "MVLQ": "MVLQSTN",
         "SLI": "SLI",  "SLIQ": "SLIQSTN",
-        "AMT": "AMT",
-    }
+        "AMT": "AMT",  "AMTQ": "AMTQSTN",
+    }),
+    # Zone 2:         ZPW/ZVL/SLZ/ZMT + QSTN forms
+    "2": MappingProxyType({
+        "PWR": "ZPW",  "PWRQ": "ZPWQSTN",
+        "MVL": "ZVL",  "MVLQ": "ZVLQSTN",
+        "SLI": "SLZ",  "SLIQ": "SLZQSTN",
+        "AMT": "ZMT",  "AMTQ": "ZMTQSTN",
+    }),
+    # Zone 3:         PW3/VL3/SL3/MT3 + QSTN forms
+    "3": MappingProxyType({
+        "PWR": "PW3",  "PWRQ": "PW3QSTN",
+        "MVL": "VL3",  "MVLQ": "VL3QSTN",
+        "SLI": "SL3",  "SLIQ": "SL3QSTN",
+        "AMT": "MT3",  "AMTQ": "MT3QSTN",
+    }),
+}
+ZONE_IDS = tuple(_ZONE_CMDS)
+_FAMILY_ZONE = {c[k]: z for z, c in _ZONE_CMDS.items() for k in ("PWR", "MVL", "SLI", "AMT")}
+
+def _cmds(zone: str):
+    """
+    Map logical zone to its (precomputed, read-only) command families.
+    Unknown zones fall back to main.
+    """
+    return _ZONE_CMDS.get(str(zone), _ZONE_CMDS["1"])
+
+# status field -> command family key in _cmds()
+STATUS_FIELDS = {"power": "PWR", "volume": "MVL", "input": "SLI", "mute": "AMT"}
 
 # ---------- public class (matches your existing app usage) ----------
 
@@ -137,6 +673,15 @@ class EISCPClient:
         self.host = host
         self.port = port
         self.timeout = timeout
+        # clients are cheap; the socket underneath is shared per receiver
+        self._conn = get_connection(host, port, timeout=timeout)
+
+    @property
+    def connection(self) -> ReceiverConnection:
+        return self._conn
+
+    def _transact(self, bare_cmd: str, expect_prefix: str, window_s: Optional[float] = None) -> Optional[str]:
+        return self._conn.transact(bare_cmd, expect_prefix, window_s=window_s)
 
     # Back-compat for tests / callers that used cli.transact("!1XXX..")
     def transact(self, ascii_cmd: str) -> Optional[str]:
@@ -147,45 +692,90 @@ class EISCPClient:
         # Best-effort: expect the first 4 letters of the command family
         family = bare[:3] if bare[:3] in ("PWR","ZPW","PW3","MVL","ZVL","VL3","SLI","SLZ","SL3","AMT","ZMT","MT3") else bare[:3]
         expect = "!1" + family
-        return _transact_one(self.host, self.port, bare, expect_prefix=expect, timeout=self.timeout)
+        return self._transact(bare, expect_prefix=expect)
 
-    # Explicit helpers
+    # Explicit helpers (SETs go through the receiver's scheduler, see set_fields)
     def power(self, on: bool, zone: str = "1"):
-        c = _cmds(zone)
-        return _transact_one(self.host, self.port, f"{c['PWR']}{'01' if on else '00'}", expect_prefix=f"!1{c['PWR']}", timeout=self.timeout)
+        return self.set_fields([(zone, "power", "01" if on else "00")])[0]
 
     def power_query(self, zone: str = "1"):
         c = _cmds(zone)
-        return _transact_one(self.host, self.port, c['PWRQ'], expect_prefix=f"!1{c['PWR']}", timeout=self.timeout)
+        return self._transact(c['PWRQ'], expect_prefix=f"!1{c['PWR']}")
 
     def volume_hex(self, hex_00_64: str, zone: str = "1"):
-        c = _cmds(zone)
-        return _transact_one(self.host, self.port, f"{c['MVL']}{hex_00_64.upper()}", expect_prefix=f"!1{c['MVL']}", timeout=self.timeout)
+        return self.set_fields([(zone, "volume", hex_00_64)])[0]
 
     def volume_query(self, zone: str = "1"):
         c = _cmds(zone)
-        return _transact_one(self.host, self.port, c['MVLQ'], expect_prefix=f"!1{c['MVL']}", timeout=self.timeout)
+        return self._transact(c['MVLQ'], expect_prefix=f"!1{c['MVL']}")
 
     def mute(self, on: bool, zone: str = "1"):
-        c = _cmds(zone)
-        return _transact_one(self.host, self.port, f"{c['AMT']}{'01' if on else '00'}", expect_prefix=f"!1{c['AMT']}", timeout=self.timeout)
+        return self.set_fields([(zone, "mute", "01" if on else "00")])[0]
 
     def input_select(self, sli_code_hex: str, zone: str = "1"):
-        c = _cmds(zone)
-        return _transact_one(self.host, self.port, f"{c['SLI']}{sli_code_hex.upper()}", expect_prefix=f"!1{c['SLI']}", timeout=self.timeout)
+        return self.set_fields([(zone, "input", sli_code_hex)])[0]
 
     def input_query(self, zone: str = "1"):
         c = _cmds(zone)
-        return _transact_one(self.host, self.port, c['SLIQ'], expect_prefix=f"!1{c['SLI']}", timeout=self.timeout)
+        return self._transact(c['SLIQ'], expect_prefix=f"!1{c['SLI']}")
+
+    # Pipelined helpers
+    def transact_many(self, cmds: Sequence[Tuple[str, str]], window_s: Optional[float] = None) -> List[Optional[str]]:
+        return self._conn.transact_many(cmds, window_s=window_s)
+
+    def query_fields(self, wanted: Mapping[str, Iterable[str]], window_s: Optional[float] = None):
+        """
+        Query arbitrary status fields ("power", "volume", "input", "mute") for
+        several zones in one pipelined round trip, e.g. {"1": ["power"], "3": ["volume", "mute"]}.
+        Returns {zone: {field: raw frame or ""}}.
+        """
+        plan = []
+        for z, fields in wanted.items():
+            c = _cmds(z)
+            for f in fields:
+                key = STATUS_FIELDS[f]
+                plan.append((str(z), f, c[key + "Q"], f"!1{c[key]}"))
+        frames = self.transact_many([(cmd, prefix) for _, _, cmd, prefix in plan], window_s=window_s)
+        out: Dict[str, Dict[str, str]] = {}
+        for (z, f, _, _), frame in zip(plan, frames):
+            out.setdefault(z, {})[f] = frame or ""
+        return out
+
+    def set_fields(self, sets: Sequence[Tuple[str, str, str]]) -> List[Optional[str]]:
+        """
+        SETs given as (zone, field, hex_value), e.g. ("2", "input", "03").
+        They go through the receiver's CommandScheduler, like /zones/set:
+        min spacing applies, a newer value queued for the same zone and field
+        replaces an unsent one, and fields go out power -> input -> volume ->
+        mute. Returns the echo frame that settled each SET (None where
+        nothing came), which may carry a later caller's value.
+        """
+        from . import iscp_async, scheduler   # both build on this module
+
+        async def submit():
+            sched = scheduler.scheduler_for(iscp_async.shared_client(self.host, self.port))
+            return [await fut for _, fut in sched.enqueue(sets)]
+        return iscp_async.run(submit())
+
+    def flush(self) -> None:
+        """Wait until every SET already queued for this receiver has been sent and answered."""
+        from . import iscp_async, scheduler
+
+        async def flush():
+            await scheduler.scheduler_for(iscp_async.shared_client(self.host, self.port)).flush()
+        iscp_async.run(flush())
+
+    def query_zones(self, zones: Iterable[str], window_s: Optional[float] = None, fields: Sequence[str] = ("power", "volume", "input")):
+        """
+        Query power, volume, input for several zones in one pipelined round trip.
+        Returns {zone: {"power": "...", "volume": "...", "input": "..."}} raw frames (or "" if none).
+        """
+        wanted = {z: fields for z in dict.fromkeys(str(z) for z in zones)}
+        return self.query_fields(wanted, window_s=window_s)
 
-    def query_zone_status(self, zone: str, window_s: float = 1.0):
+    def query_zone_status(self, zone: str, window_s: Optional[float] = None):
         """
-        Query power, volume, input sequentially (one command at a time) reusing the same logic.
+        Query power, volume, input for one zone in a single pipelined batch.
         Returns {"power": "...", "volume": "...", "input": "..."} raw frames (or "" if none).
         """
-        got = {
-            "power":  self.power_query(zone)  or "",
-            "volume": self.volume_query(zone) or "",
-            "input":  self.input_query(zone)  or "",
-        }
-        return got
+        return self.query_zones([zone], window_s=window_s)[str(zone)]
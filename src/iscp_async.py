@@ -0,0 +1,284 @@
+# src/iscp_async.py
+# asyncio flavour of the eISCP client.
+#
+# Same method set as iscp.EISCPClient, built on asyncio streams: one
+# persistent connection per client, a reader task that routes frames to the
+# coroutine waiting on that command family, and pipelined batches. Waits for
+# different zones (or receivers) overlap instead of queueing behind each other.
+#
+# Flask runs every async view on its own short-lived event loop, so the app
+# keeps its clients on one shared background "receiver loop" (shared_client /
+# call / run below); the connection then outlives the request.
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from . import metrics, tracing
+from .iscp import (
+    DEFAULT_PORT, DEFAULT_TIMEOUT, RECV_BUFSIZE, STATUS_FIELDS, FrameDecoder, _accepts,
+    _build_eiscp, _cmds, _enable_keepalive, _family, _set_value, breaker_for, latency_for, session_gate,
+)
+
+class AsyncEISCPClient:
+    def __init__(self, host: str, port: int = DEFAULT_PORT, timeout: float = DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connected_since: Optional[float] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._gate = session_gate(host, port)
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._waiters: Dict[str, Deque[Tuple[asyncio.Future, Optional[str]]]] = {}   # (future, SET value)
+        self._listeners: List[Callable[[str], None]] = []
+        self.breaker = breaker_for(host, port)   # shared with the sync connection
+        self.latency = latency_for(host, port)   # likewise
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # -- connection lifecycle --
+
+    async def _ensure_connected(self) -> asyncio.StreamWriter:
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return self._writer
+            self.breaker.allow()   # fails fast while the receiver is known to be down
+            # the gate is a threading primitive shared with sync connections; wait off-loop
+            with tracing.span("eiscp.connect", receiver=self.breaker.name):
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, self._gate.acquire, self.timeout)
+                except BaseException:
+                    self.breaker.cancel()
+                    raise
+                try:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port), timeout=self.timeout
+                    )
+                except (OSError, asyncio.TimeoutError) as e:
+                    self._gate.release()
+                    self.breaker.failure(e)
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise ConnectionError(f"eISCP {self.host}:{self.port} connect timed out") from e
+                    raise
+            self.breaker.success()
+            sock = writer.get_extra_info("socket")
+            if sock is not None:
+                _enable_keepalive(sock)
+            self._writer = writer
+            self.connected_since = time.monotonic()
+            self._reader_task = asyncio.get_running_loop().create_task(self._read_loop(reader, writer))
+            return writer
+
+    def _drop(self, writer: asyncio.StreamWriter) -> None:
+        if self._writer is writer:
+            self._writer = None
+            self.connected_since = None
+            self._gate.release()
+        writer.close()
+
+    async def close(self) -> None:
+        writer = self._writer
+        if writer is not None:
+            self._drop(writer)
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+
+    # -- reader / response matching --
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        decoder = FrameDecoder()
+        try:
+            while True:
+                chunk = await reader.read(RECV_BUFSIZE)
+                if not chunk:
+                    break
+                for frame in decoder.feed(chunk):
+                    self._dispatch(frame)
+        except (OSError, asyncio.CancelledError):
+            pass
+        finally:
+            self._drop(writer)
+
+    def add_listener(self, cb: Callable[[str], None]) -> None:
+        """Call cb(frame) for every frame received on this connection."""
+        if cb not in self._listeners:
+            self._listeners.append(cb)
+
+    def remove_listener(self, cb: Callable[[str], None]) -> None:
+        if cb in self._listeners:
+            self._listeners.remove(cb)
+
+    def _dispatch(self, frame: str) -> None:
+        for prefix, queue in self._waiters.items():
+            while queue and queue[0][0].done():   # timed-out waiters
+                queue.popleft()
+            entry = next((e for e in queue if not e[0].done() and _accepts(e[1], prefix, frame)), None)
+            if entry is not None:
+                queue.remove(entry)
+                entry[0].set_result((frame, time.monotonic()))
+                break
+        else:
+            metrics.EISCP_UNMATCHED.inc(self.breaker.name)
+        for cb in list(self._listeners):
+            try:
+                cb(frame)
+            except Exception as e:
+                print(f"[iscp_async] listener error: {e}")
+
+    async def transact_many(self, cmds: Sequence[Tuple[str, str]], window_s: Optional[float] = None) -> List[Optional[str]]:
+        """
+        Pipeline (bare_cmd, expect_prefix) pairs in one write and collect the
+        matching frames against a single deadline (None where nothing came).
+        """
+        if not cmds:
+            return []
+        families = [_family(prefix) for _, prefix in cmds]
+        if window_s is None:
+            window_s = self.latency.window(families)
+        loop = asyncio.get_running_loop()
+        futs, entries = [], []
+        for cmd, prefix in cmds:
+            fut = loop.create_future()   # resolves to (frame, arrival time)
+            entry = (fut, _set_value(cmd))
+            self._waiters.setdefault(prefix, deque()).append(entry)
+            futs.append(fut)
+            entries.append(entry)
+        try:
+            with tracing.span("eiscp", receiver=self.breaker.name, families=",".join(families),
+                              window_ms=round(window_s * 1000)) as sp:
+                writer = await self._ensure_connected()
+                writer.write(b"".join(_build_eiscp(cmd) for cmd, _ in cmds))
+                sent = time.monotonic()
+                await writer.drain()
+                await asyncio.wait(futs, timeout=window_s)
+                got = [f.result() if f.done() and not f.cancelled() else None for f in futs]
+                for fam, hit in zip(families, got):
+                    self.latency.record(fam, hit[1] - sent if hit else None)
+                if sp is not None:
+                    sp.attrs["timeouts"] = sum(1 for hit in got if hit is None)
+            return [hit[0] if hit else None for hit in got]
+        finally:
+            for (_, prefix), entry in zip(cmds, entries):
+                if not entry[0].done():
+                    entry[0].cancel()
+                queue = self._waiters.get(prefix)
+                if queue is not None:
+                    try:
+                        queue.remove(entry)
+                    except ValueError:
+                        pass
+                    if not queue:
+                        del self._waiters[prefix]
+
+    async def _transact(self, bare_cmd: str, expect_prefix: str, window_s: Optional[float] = None) -> Optional[str]:
+        return (await self.transact_many([(bare_cmd, expect_prefix)], window_s=window_s))[0]
+
+    # Back-compat with EISCPClient.transact("!1XXX..")
+    async def transact(self, ascii_cmd: str) -> Optional[str]:
+        bare = ascii_cmd[2:] if ascii_cmd.startswith("!1") else ascii_cmd
+        return await self._transact(bare, expect_prefix="!1" + bare[:3])
+
+    # Explicit helpers
+    async def power(self, on: bool, zone: str = "1"):
+        c = _cmds(zone)
+        return await self._transact(f"{c['PWR']}{'01' if on else '00'}", expect_prefix=f"!1{c['PWR']}")
+
+    async def power_query(self, zone: str = "1"):
+        c = _cmds(zone)
+        return await self._transact(c['PWRQ'], expect_prefix=f"!1{c['PWR']}")
+
+    async def volume_hex(self, hex_00_64: str, zone: str = "1"):
+        c = _cmds(zone)
+        return await self._transact(f"{c['MVL']}{hex_00_64.upper()}", expect_prefix=f"!1{c['MVL']}")
+
+    async def volume_query(self, zone: str = "1"):
+        c = _cmds(zone)
+        return await self._transact(c['MVLQ'], expect_prefix=f"!1{c['MVL']}")
+
+    async def mute(self, on: bool, zone: str = "1"):
+        c = _cmds(zone)
+        return await self._transact(f"{c['AMT']}{'01' if on else '00'}", expect_prefix=f"!1{c['AMT']}")
+
+    async def input_select(self, sli_code_hex: str, zone: str = "1"):
+        c = _cmds(zone)
+        return await self._transact(f"{c['SLI']}{sli_code_hex.upper()}", expect_prefix=f"!1{c['SLI']}")
+
+    async def input_query(self, zone: str = "1"):
+        c = _cmds(zone)
+        return await self._transact(c['SLIQ'], expect_prefix=f"!1{c['SLI']}")
+
+    async def query_fields(self, wanted: Mapping[str, Iterable[str]], window_s: Optional[float] = None):
+        """Async twin of EISCPClient.query_fields."""
+        plan = []
+        for z, fields in wanted.items():
+            c = _cmds(z)
+            for f in fields:
+                key = STATUS_FIELDS[f]
+                plan.append((str(z), f, c[key + "Q"], f"!1{c[key]}"))
+        frames = await self.transact_many([(cmd, prefix) for _, _, cmd, prefix in plan], window_s=window_s)
+        out: Dict[str, Dict[str, str]] = {}
+        for (z, f, _, _), frame in zip(plan, frames):
+            out.setdefault(z, {})[f] = frame or ""
+        return out
+
+    async def query_zones(self, zones: Iterable[str], window_s: Optional[float] = None, fields: Sequence[str] = ("power", "volume", "input")):
+        wanted = {z: fields for z in dict.fromkeys(str(z) for z in zones)}
+        return await self.query_fields(wanted, window_s=window_s)
+
+    async def query_zone_status(self, zone: str, window_s: Optional[float] = None):
+        """
+        Query power, volume, input for one zone in a single pipelined batch.
+        Returns {"power": "...", "volume": "...", "input": "..."} raw frames (or "" if none).
+        """
+        return (await self.query_zones([zone], window_s=window_s))[str(zone)]
+
+# ---------- shared receiver loop (for sync code and Flask async views) ----------
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+_SHARED: Dict[Tuple[str, int], AsyncEISCPClient] = {}
+
+def _shared_loop() -> asyncio.AbstractEventLoop:
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="eiscp-async-loop", daemon=True).start()
+            _LOOP = loop
+        return _LOOP
+
+def shared_client(host: str, port: int = DEFAULT_PORT) -> AsyncEISCPClient:
+    """AsyncEISCPClient bound to the shared receiver loop (one per receiver)."""
+    key = (host, int(port))
+    with _LOOP_LOCK:
+        cli = _SHARED.get(key)
+        if cli is None:
+            cli = _SHARED[key] = AsyncEISCPClient(host, int(port))
+        return cli
+
+def _traced(coro):
+    # carry the caller's trace onto the receiver loop's task
+    tr = tracing.current()
+    return coro if tr is None else tracing.within(tr, coro)
+
+async def call(coro):
+    """Await a shared_client() coroutine from any event loop (e.g. a Flask async view)."""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_traced(coro), _shared_loop()))
+
+def run(coro, timeout: Optional[float] = None):
+    """Blocking bridge for sync code."""
+    return asyncio.run_coroutine_threadsafe(_traced(coro), _shared_loop()).result(timeout)
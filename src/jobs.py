@@ -0,0 +1,157 @@
+# src/jobs.py
+# Announcement job queue.
+#
+# POST /announce submits a Job and returns its id straight away. One
+# dispatcher thread starts jobs on worker threads so that:
+#   - jobs touching the same zone run strictly one after another,
+#   - higher priority runs first (FIFO within a priority),
+#   - an identical job already waiting is merged instead of queued twice,
+#   - a new job can pre-empt a running lower-priority one (doorbell beats a
+#     reminder): the running job's cancel event is set and it winds down.
+
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Sequence
+
+PRIORITIES = {"low": 10, "normal": 50, "high": 90}
+PREEMPT_MARGIN = 20   # a job pre-empts running work at least this much lower
+
+def parse_priority(value) -> int:
+    """'low' | 'normal' | 'high' | int -> int. Raises ValueError otherwise."""
+    if value is None:
+        return PRIORITIES["normal"]
+    if isinstance(value, str) and value.lower() in PRIORITIES:
+        return PRIORITIES[value.lower()]
+    return int(value)
+
+class Job:
+    def __init__(self, zones: Sequence[str], params: dict, priority: int, seq: int, key: Hashable = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.zones = tuple(zones)
+        self.params = dict(params)
+        self.priority = priority
+        self.seq = seq
+        self.key = key
+        self.status = "queued"       # queued | running | done | failed | preempted
+        self.error: Optional[str] = None
+        self.merged = 0              # duplicates folded into this job
+        self.lock_wait_ms: Optional[float] = None   # time spent queueing for zone locks
+        self.trace_id: Optional[str] = None         # this run's trace in /debug/traces
+        self.request_trace_id: Optional[str] = None # trace of the request that queued it
+        self.cancel = threading.Event()
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "zones": list(self.zones),
+            "priority": self.priority,
+            "merged": self.merged,
+            "lock_wait_ms": self.lock_wait_ms,
+            "trace_id": self.trace_id,
+            "request_trace_id": self.request_trace_id,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            **self.params,
+        }
+
+class JobQueue:
+    def __init__(self, runner: Callable[[Job], None], history: int = 200):
+        self._runner = runner
+        self._history = history
+        self._cv = threading.Condition()
+        self._seq = itertools.count()
+        self._queued: List[Job] = []
+        self._running: Dict[str, Job] = {}
+        self._busy_zones = set()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, zones: Sequence[str], params: dict, priority: int = PRIORITIES["normal"], key: Hashable = None) -> Job:
+        """
+        Queue a job (or merge it into an identical queued one, same key) and
+        return it. key defaults to (zones, params).
+        """
+        if key is None:
+            key = (tuple(zones), tuple(sorted(params.items())))
+        with self._cv:
+            self._ensure_started()
+            for job in self._queued:
+                if job.key == key:
+                    job.merged += 1
+                    job.priority = max(job.priority, priority)
+                    return job
+            job = Job(zones, params, priority, next(self._seq), key)
+            self._queued.append(job)
+            self._remember(job)
+            # everything shares the one MPD player, so pre-emption isn't zone-limited
+            for running in self._running.values():
+                if priority - running.priority >= PREEMPT_MARGIN:
+                    running.cancel.set()
+            self._cv.notify_all()
+            return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cv:
+            return self._jobs.get(job_id)
+
+    def snapshot(self) -> List[dict]:
+        with self._cv:
+            return [j.to_dict() for j in self._jobs.values()]
+
+    # -- internals --
+
+    def _remember(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        while len(self._jobs) > self._history:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status in ("queued", "running"):
+                break
+            self._jobs.popitem(last=False)
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._dispatch, name="announce-dispatch", daemon=True)
+            self._thread.start()
+
+    def _next_runnable(self) -> Optional[Job]:
+        for job in sorted(self._queued, key=lambda j: (-j.priority, j.seq)):
+            if not self._busy_zones.intersection(job.zones):
+                return job
+        return None
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cv:
+                job = self._next_runnable()
+                while job is None:
+                    self._cv.wait()
+                    job = self._next_runnable()
+                self._queued.remove(job)
+                self._busy_zones.update(job.zones)
+                self._running[job.id] = job
+                job.status = "running"
+                job.started_at = time.time()
+            threading.Thread(target=self._work, args=(job,), name=f"announce-{job.id}", daemon=True).start()
+
+    def _work(self, job: Job) -> None:
+        try:
+            self._runner(job)
+            job.status = "preempted" if job.cancel.is_set() else "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            with self._cv:
+                self._running.pop(job.id, None)
+                self._busy_zones.difference_update(job.zones)
+                self._cv.notify_all()
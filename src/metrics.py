@@ -0,0 +1,120 @@
+# src/metrics.py
+# Minimal Prometheus-style metrics, rendered by GET /metrics.
+#
+# Counters and fixed-bucket histograms keyed by label values. Recording is a
+# dict lookup, a bisect and a few adds under one lock per metric — cheap
+# enough to leave on permanently on the Pi, and no extra dependency.
+
+import bisect
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+# seconds; eISCP replies sit in the low buckets, announcements in the high ones
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, v in sorted(self._values.items()):
+                out.append(f"{self.name}{_labels(self.labelnames, labels)} {v:g}")
+        return out
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple, list] = {}   # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labels) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def count(self, *labels) -> int:
+        with self._lock:
+            s = self._series.get(labels)
+            return s[-1] if s else 0
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, s in series:
+            cumulative = 0
+            for le, n in zip(self.buckets, s):
+                cumulative += n
+                bound = 'le="%g"' % le
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, bound)} {cumulative}")
+            inf = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, inf)} {s[-1]}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {s[-2]:.6f}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, labels)} {s[-1]}")
+        return out
+
+_REGISTRY: List = []
+
+def counter(name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+    m = Counter(name, help, labels)
+    _REGISTRY.append(m)
+    return m
+
+def histogram(name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    m = Histogram(name, help, labels, buckets)
+    _REGISTRY.append(m)
+    return m
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _REGISTRY:
+        lines += m.render()
+    return "\n".join(lines) + "\n"
+
+# ---------- the service's metrics ----------
+
+EISCP_SECONDS = histogram("houseaudio_eiscp_reply_seconds", "eISCP command to matching reply",
+                          ("receiver", "family", "zone"))
+EISCP_TIMEOUTS = counter("houseaudio_eiscp_timeouts_total", "eISCP commands with no reply inside the window",
+                         ("receiver", "family", "zone"))
+EISCP_UNMATCHED = counter("houseaudio_eiscp_unmatched_frames_total",
+                          "frames no caller was waiting for (pushed changes, late replies, chatter)", ("receiver",))
+EISCP_CONNECTS = counter("houseaudio_eiscp_connects_total", "eISCP connection attempts (first connect and reconnects)",
+                         ("receiver", "result"))
+EISCP_REJECTED = counter("houseaudio_eiscp_circuit_rejections_total", "calls failed fast by an open circuit",
+                         ("receiver",))
+MPD_SECONDS = histogram("houseaudio_mpd_command_seconds", "MPD command round trip", ("command",))
+MPD_ERRORS = counter("houseaudio_mpd_errors_total", "MPD commands that failed", ("command",))
+ANNOUNCE_SECONDS = histogram("houseaudio_announce_phase_seconds",
+                             "announcement duration by phase (fetch, lock_wait, prepare, play, restore, total)",
+                             ("phase",))
+HTTP_SECONDS = histogram("houseaudio_http_request_seconds", "HTTP request latency", ("route", "method"))
+HTTP_REQUESTS = counter("houseaudio_http_requests_total", "HTTP requests", ("route", "method", "status"))
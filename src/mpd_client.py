@@ -0,0 +1,198 @@
+# src/mpd_client.py
+# Native MPD protocol client (replaces forking `mpc` for every call).
+#
+# Keeps one TCP or Unix-socket connection per MPD, speaks the line protocol
+# directly, supports command lists for batched clear/add/play, and uses
+# `idle player` to learn when playback stops instead of polling status.
+
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from . import metrics, tracing
+
+DEFAULT_HOST = "localhost"
+DEFAULT_PORT = 6600
+
+class MPDError(Exception):
+    """MPD answered ACK, or the connection failed."""
+
+def _quote(arg) -> str:
+    s = str(arg)
+    return '"' + s.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def _pairs_to_dict(pairs: List[Tuple[str, str]]) -> Dict[str, str]:
+    return {k: v for k, v in pairs}
+
+class MPDClient:
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.version: Optional[str] = None
+        self._sock: Optional[socket.socket] = None
+        self._rbuf = bytearray()
+        self._lock = threading.Lock()
+
+    # -- connection --
+
+    def _connect(self) -> None:
+        if self.host.startswith("/"):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.host)
+        else:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock = sock
+        self._rbuf.clear()
+        greeting = self._readline()
+        if not greeting.startswith("OK MPD "):
+            self.close()
+            raise MPDError(f"unexpected MPD greeting: {greeting!r}")
+        self.version = greeting[7:]
+
+    def close(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except Exception:
+                pass
+        self._sock = None
+
+    def _readline(self) -> str:
+        while True:
+            i = self._rbuf.find(b"\n")
+            if i >= 0:
+                line = bytes(self._rbuf[:i])
+                del self._rbuf[:i + 1]
+                return line.decode("utf-8", errors="replace")
+            chunk = self._sock.recv(4096)
+            if not chunk:
+                raise MPDError("connection closed by MPD")
+            self._rbuf += chunk
+
+    def _read_response(self) -> List[Tuple[str, str]]:
+        pairs = []
+        while True:
+            line = self._readline()
+            if line == "OK":
+                return pairs
+            if line.startswith("ACK "):
+                raise MPDError(line)
+            if line == "list_OK":
+                continue
+            key, _, val = line.partition(": ")
+            pairs.append((key, val))
+
+    def _execute(self, payload: str) -> List[Tuple[str, str]]:
+        name = payload.split(None, 1)[0] if payload.strip() else ""
+        if name == "command_list_begin":
+            name = "command_list"
+        t0 = time.monotonic()
+        try:
+            with tracing.span("mpd", command=name):
+                return self._execute_locked(payload)
+        except MPDError:
+            metrics.MPD_ERRORS.inc(name)
+            raise
+        finally:
+            metrics.MPD_SECONDS.observe(time.monotonic() - t0, name)
+
+    def _execute_locked(self, payload: str) -> List[Tuple[str, str]]:
+        with self._lock:
+            for attempt in (0, 1):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    self._sock.settimeout(self.timeout)
+                    self._sock.sendall(payload.encode("utf-8"))
+                    return self._read_response()
+                except (OSError, MPDError) as e:
+                    # MPD drops idle clients after connection_timeout; reconnect once
+                    if isinstance(e, MPDError) and str(e).startswith("ACK "):
+                        raise
+                    self.close()
+                    if attempt:
+                        raise MPDError(str(e)) from e
+        return []
+
+    # -- commands --
+
+    def command(self, name: str, *args) -> List[Tuple[str, str]]:
+        line = " ".join([name, *(_quote(a) for a in args)])
+        return self._execute(line + "\n")
+
+    def command_list(self, cmds: Sequence[Sequence]) -> List[Tuple[str, str]]:
+        """Send several commands in one command_list round trip."""
+        lines = ["command_list_begin"]
+        for name, *args in cmds:
+            lines.append(" ".join([name, *(_quote(a) for a in args)]))
+        lines.append("command_list_end")
+        return self._execute("\n".join(lines) + "\n")
+
+    def status(self) -> Dict[str, str]:
+        return _pairs_to_dict(self.command("status"))
+
+    def currentsong(self) -> Dict[str, str]:
+        return _pairs_to_dict(self.command("currentsong"))
+
+    def idle(self, *subsystems: str, timeout: Optional[float] = None) -> List[str]:
+        """
+        Block until one of subsystems changes (or timeout). Returns the changed
+        subsystem names, [] on timeout. Use a dedicated client for this; the
+        connection is unusable for other commands while idling.
+        """
+        with self._lock, tracing.span("mpd.idle", subsystems=",".join(subsystems)):
+            if self._sock is None:
+                self._connect()
+            self._sock.sendall((" ".join(["idle", *subsystems]) + "\n").encode("utf-8"))
+            self._sock.settimeout(timeout)
+            try:
+                pairs = self._read_response()
+            except socket.timeout:
+                # cancel the idle; MPD answers with whatever changed (usually nothing) + OK
+                self._sock.settimeout(self.timeout)
+                self._sock.sendall(b"noidle\n")
+                pairs = self._read_response()
+            finally:
+                if self._sock is not None:
+                    self._sock.settimeout(self.timeout)
+            return [v for k, v in pairs if k == "changed"]
+
+    def wait_until_stopped(self, max_s: float = 60.0) -> bool:
+        """
+        Wait (on this connection) until MPD's player leaves the 'play' state.
+        Returns False if it was still playing after max_s. To give up early,
+        stop playback from another connection: that wakes the idle.
+        """
+        deadline = time.monotonic() + max_s
+        while True:
+            if self.status().get("state") != "play":
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.idle("player", timeout=remaining)
+
+# ---------- shared connections ----------
+
+def _endpoint() -> Tuple[str, int]:
+    return os.environ.get("MPD_HOST", DEFAULT_HOST), int(os.environ.get("MPD_PORT", DEFAULT_PORT))
+
+_CLIENTS: Dict[Tuple[str, int], MPDClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def get_client() -> MPDClient:
+    """Shared command connection to the MPD named by MPD_HOST/MPD_PORT."""
+    key = _endpoint()
+    with _CLIENTS_LOCK:
+        cli = _CLIENTS.get(key)
+        if cli is None:
+            cli = _CLIENTS[key] = MPDClient(*key)
+        return cli
+
+def new_client() -> MPDClient:
+    """Fresh connection (for idle waits, which tie up the socket)."""
+    return MPDClient(*_endpoint())
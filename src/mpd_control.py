@@ -1,46 +1,121 @@
 # This file provides MPD control (pause/resume/status logic)
 #
 # What it does in production:
-# - run mpc pause
-# - run mpc play
-# - parse mpc status
+# - talks to MPD over its own protocol (see mpd_client) instead of forking mpc
+# - pause / play / status on a shared connection
+# - batched clear+add+play for announcements, idle-based wait for the end
 
-import subprocess
+import threading
+import time
 
-def run_cmd(cmd):
+from . import mpd_client
+
+CANCEL_CHECK_S = 0.25   # how soon a set cancel event is noticed (in-process only)
+
+def _run(fn, *args):
     """
-    Run a shell command, capture stdout/stderr, return (rc, out, err).
+    Run an MPD call and return (rc, out, err) like the old mpc wrapper did.
     """
-    proc = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
-    out, err = proc.communicate()
-    return proc.returncode, out.strip(), err.strip()
+    try:
+        pairs = fn(*args)
+        return 0, "\n".join(f"{k}: {v}" for k, v in pairs), ""
+    except Exception as e:
+        return 1, "", str(e)
 
 def pause_mpd():
     """
     Dispatch a 'pause' command to MPD
     """
-    return run_cmd(["mpc", "pause"])
+    return _run(mpd_client.get_client().command, "pause", "1")
 
 def resume_mpd():
     """
     Dispatch a 'resume' command to MPD
     """
-    return run_cmd(["mpc", "play"])
+    return _run(mpd_client.get_client().command, "play")
+
+def play_now(uri: str):
+    """
+    Replace the queue with uri and start it (clear/add/play in one command list)
+    """
+    return _run(mpd_client.get_client().command_list, [("clear",), ("add", uri), ("play",)])
+
+def stop_mpd():
+    """
+    Dispatch a 'stop' command to MPD
+    """
+    return _run(mpd_client.get_client().command, "stop")
+
+def _stop_on_cancel(cancel, done) -> None:
+    # Checks two in-process events; nothing goes to MPD until cancel is set.
+    # The stop fires MPD's player event, which wakes the idling waiter.
+    while not done.is_set():
+        if cancel.wait(CANCEL_CHECK_S):
+            if not done.is_set():
+                stop_mpd()
+            return
+
+def wait_until_stopped(max_s: float = 60.0, cancel=None) -> bool:
+    """
+    Block until MPD stops playing, woken by `idle player` rather than polling.
+    Uses its own connection so other requests can keep talking to MPD.
+    If the cancel event gets set, playback is stopped and False returned.
+    """
+    cli = mpd_client.new_client()
+    done = threading.Event()
+    if cancel is not None:
+        threading.Thread(target=_stop_on_cancel, args=(cancel, done), name="mpd-cancel", daemon=True).start()
+    try:
+        stopped = cli.wait_until_stopped(max_s)
+        return stopped and not (cancel is not None and cancel.is_set())
+    finally:
+        done.set()
+        cli.close()
+
+def watch_player(on_change, stop=None, idle_s: float = 30.0):
+    """
+    Call on_change() every time MPD's player changes state (play/pause/stop,
+    new song). Blocks; run it in a thread. One dedicated idle connection.
+    """
+    cli = mpd_client.new_client()
+    while not (stop is not None and stop.is_set()):
+        try:
+            if cli.idle("player", timeout=idle_s):
+                on_change()
+        except Exception as e:
+            print(f"[mpd] player watch error: {e}")
+            cli.close()
+            time.sleep(5)
+            on_change()   # anything may have changed while we were away
+    cli.close()
 
 def get_status():
     """
     Gets the status of MPD
     """
-    rc, out, err = run_cmd(["mpc", "status"])
+    try:
+        cli = mpd_client.get_client()
+        st = cli.status()
+        song = cli.currentsong() if st.get("songid") else {}
+    except Exception as e:
+        return {"rc": 1, "raw": "", "err": str(e), "is_playing": False, "is_paused": False}
+
+    def _num(key, cast=float):
+        try:
+            return cast(st[key])
+        except (KeyError, ValueError):
+            return None
+
+    state = st.get("state", "")
     return {
-        "rc": rc,
-        "raw": out,
-        "err": err,
-        "is_playing": "[playing]" in out,
-        "is_paused": "[paused]" in out,
+        "rc": 0,
+        "raw": "\n".join(f"{k}: {v}" for k, v in st.items()),
+        "err": "",
+        "is_playing": state == "play",
+        "is_paused": state == "pause",
+        "state": state,
+        "volume": _num("volume", int),
+        "elapsed": _num("elapsed"),
+        "duration": _num("duration"),
+        "song": {k: song[k] for k in ("file", "Title", "Artist", "Name") if k in song},
     }
@@ -1,12 +1,312 @@
-# Playback (play_audio_file, etc.)
-# invokes ffplay to play the temp WAV/mp3 you POSTed to /announce
+# src/playback.py
+# Local playback on the Pi's own audio output (play_audio_file, PlaybackEngine).
+#
+# play_audio_file used to fork ffplay per clip, so process start, decoder
+# setup and opening the audio device all came before the first sample. The
+# PlaybackEngine keeps one long-lived PCM sink process (aplay by default)
+# with the device open, decodes each clip once with ffmpeg into raw PCM
+# (kept on disk next to the audio cache and memory-mapped, so a restart does
+# not re-decode and the bytes sit in the page cache rather than the heap),
+# and plays queued clips by writing that PCM straight into the sink. Callers
+# get a Clip whose `done` event fires when the clip has finished.
+#
+# With HOUSEAUDIO_PLAYBACK_ENGINE=0, or without the sink binary / ffmpeg,
+# play_audio_file falls back to one ffplay per clip.
 
+import hashlib
+import mmap
+import os
+import queue
+import shlex
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from . import audio_cache, tracing
+
+RATE, CHANNELS, SAMPLE_BYTES = 44100, 2, 2
+BYTES_PER_S = RATE * CHANNELS * SAMPLE_BYTES
+CHUNK_BYTES = (RATE // 50) * CHANNELS * SAMPLE_BYTES   # 20 ms, whole frames
+LEAD_S = 0.1   # how far ahead of real time we fill the sink; bounds cancel and completion error
+SINK_CMD = shlex.split(os.environ.get("HOUSEAUDIO_PCM_SINK", f"aplay -q -t raw -f S16_LE -r {RATE} -c {CHANNELS} -"))
+PCM_DIR = os.environ.get("HOUSEAUDIO_PCM_DIR", os.path.join(audio_cache.DEFAULT_DIR, "pcm"))
+PCM_MAX_BYTES = int(os.environ.get("HOUSEAUDIO_PCM_MAX_MB", "100")) * 1024 * 1024
+
+def ffmpeg_decode(src: str, dst: str) -> None:
+    """Decode src to raw s16le stereo PCM at RATE in dst."""
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", src,
+           "-f", "s16le", "-ac", str(CHANNELS), "-ar", str(RATE), dst]
+    with tracing.span("subprocess", cmd="ffmpeg decode"):
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode {src}: {proc.stderr.strip()}")
+
+# ---------- decoded clip cache ----------
+
+class PcmCache:
+    """Source file -> memory-mapped raw PCM, decoded once per file version."""
+
+    def __init__(self, root: str = PCM_DIR, max_bytes: int = PCM_MAX_BYTES,
+                 decoder: Callable[[str, str], None] = ffmpeg_decode):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.decoder = decoder
+        self.decoded = 0   # decodes actually run
+        self._lock = threading.Lock()
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def _key(self, path: str) -> str:
+        st = os.stat(path)
+        return hashlib.sha1(f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()
+
+    def get(self, path: str):
+        """Raw PCM for path (an mmap, or b"" for an empty clip). Decodes on first use."""
+        key = self._key(path)
+        with self._lock:
+            hit = self._maps.get(key)
+            if hit is not None:
+                return hit
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:   # one decode per clip, other clips don't wait
+            with self._lock:
+                if key in self._maps:
+                    return self._maps[key]
+            pcm_path = os.path.join(self.root, key + ".s16")
+            if not os.path.exists(pcm_path):
+                os.makedirs(self.root, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+                os.close(fd)
+                try:
+                    self.decoder(path, tmp)
+                    os.replace(tmp, pcm_path)
+                finally:
+                    if os.path.exists(tmp):
+                        os.unlink(tmp)
+                self.decoded += 1
+                self._prune(keep=pcm_path)
+            if os.path.getsize(pcm_path) == 0:
+                return b""
+            with open(pcm_path, "rb") as f:
+                pcm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            with self._lock:
+                self._maps[key] = pcm
+                self._key_locks.pop(key, None)   # later gets hit _maps first
+            return pcm
+
+    def _evict(self, key: str) -> None:
+        with self._lock:
+            pcm = self._maps.pop(key, None)
+            self._key_locks.pop(key, None)
+        if pcm is not None:
+            try:
+                pcm.close()   # frees the unlinked file's blocks
+            except BufferError:
+                pass          # still playing; freed when the player lets go of it
+
+    def _prune(self, keep: str) -> None:
+        # oldest decoded files beyond max_bytes go, and their mappings with them
+        try:
+            files = [os.path.join(self.root, n) for n in os.listdir(self.root) if n.endswith(".s16")]
+            files = sorted(files, key=lambda p: os.stat(p).st_mtime)
+            total = sum(os.path.getsize(p) for p in files)
+        except OSError:
+            return
+        for p in files:
+            if total <= self.max_bytes:
+                break
+            if p == keep:
+                continue
+            try:
+                total -= os.path.getsize(p)
+                os.unlink(p)
+            except OSError:
+                continue
+            self._evict(os.path.basename(p)[:-len(".s16")])
+
+# ---------- engine ----------
+
+class Clip:
+    """One queued playback. `done` is set when it finished, failed or was cancelled."""
+
+    def __init__(self, path: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.path = path
+        self.done = threading.Event()
+        self.returncode: Optional[int] = None
+        self.error = ""
+        self.queued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+        self._trace = tracing.current()   # spans land in the trace that queued the clip
+        self._callbacks: List[Callable[["Clip"], None]] = []
+        self._lock = threading.Lock()
+
+    def add_done_callback(self, cb: Callable[["Clip"], None]) -> None:
+        with self._lock:
+            if not self.done.is_set():
+                self._callbacks.append(cb)
+                return
+        cb(self)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.done.wait(timeout)
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def _finish(self, returncode: int, error: str = "") -> None:
+        with self._lock:
+            self.returncode, self.error = returncode, error
+            self.finished_at = time.monotonic()
+            self.done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for cb in callbacks:
+            try:
+                cb(self)
+            except Exception as e:
+                print(f"[playback] completion callback error: {e}")
+
+class PlaybackEngine:
+    """
+    One sink process kept open, clips played one after another from an
+    in-process queue. play() returns at once; wait on the Clip or add a
+    done callback.
+    """
+
+    def __init__(self, sink_cmd: Optional[List[str]] = None, cache: Optional[PcmCache] = None):
+        self.sink_cmd = list(sink_cmd or SINK_CMD)
+        self.cache = cache or PcmCache()
+        self._queue: "queue.Queue[Clip]" = queue.Queue()
+        self._sink: Optional[subprocess.Popen] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="playback-engine", daemon=True)
+                self._thread.start()
+
+    def play(self, path: str) -> Clip:
+        clip = Clip(path)
+        self.start()
+        self._queue.put(clip)
+        return clip
+
+    def warm(self, path: str) -> None:
+        """Decode path now so its first play starts straight away."""
+        self.cache.get(audio_cache.resolve(path))
+
+    def close(self) -> None:
+        sink, self._sink = self._sink, None
+        if sink is not None:
+            try:
+                sink.stdin.close()
+            except OSError:
+                pass
+            sink.wait(timeout=5)
+
+    def _reap_sink(self) -> None:
+        # a sink that crashed (device unplugged, aplay killed): collect it, start afresh next time
+        sink, self._sink = self._sink, None
+        if sink is None:
+            return
+        try:
+            sink.stdin.close()
+        except OSError:
+            pass
+        try:
+            rc = sink.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            sink.kill()
+            rc = sink.wait()
+        print(f"[playback] audio sink exited (rc={rc})")
+
+    def _ensure_sink(self) -> subprocess.Popen:
+        if self._sink is not None and self._sink.poll() is not None:
+            self._reap_sink()
+        if self._sink is None:
+            with tracing.span("subprocess", cmd=f"{self.sink_cmd[0]} (sink start)"):
+                self._sink = subprocess.Popen(self.sink_cmd, stdin=subprocess.PIPE,
+                                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return self._sink
+
+    def _run(self) -> None:
+        while True:
+            clip = self._queue.get()
+            try:
+                with tracing.use(clip._trace), tracing.span("playback", clip=clip.id):
+                    self._play(clip)
+            except Exception as e:
+                print(f"[playback] {clip.path}: {e}")
+                clip._finish(1, str(e))
+
+    def _play(self, clip: Clip) -> None:
+        if clip._cancel.is_set():
+            clip._finish(1, "cancelled")
+            return
+        pcm = memoryview(self.cache.get(audio_cache.resolve(clip.path)))
+        sink = self._ensure_sink()
+        clip.started_at = t0 = time.monotonic()
+        duration = len(pcm) / BYTES_PER_S
+        try:
+            for off in range(0, len(pcm), CHUNK_BYTES):
+                if clip._cancel.is_set():
+                    break
+                if sink.poll() is not None:
+                    raise BrokenPipeError(f"exit code {sink.returncode}")
+                sink.stdin.write(pcm[off:off + CHUNK_BYTES])
+                # stay at most LEAD_S ahead of the device so cancel and completion are prompt
+                ahead = (off + CHUNK_BYTES) / BYTES_PER_S - (time.monotonic() - t0)
+                if ahead > LEAD_S:
+                    time.sleep(ahead - LEAD_S)
+            sink.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self._reap_sink()
+            clip._finish(1, f"audio sink exited: {e}")
+            return
+        finally:
+            pcm.release()
+        if clip._cancel.is_set():
+            clip._finish(1, "cancelled")
+            return
+        # the last LEAD_S of audio is still in the device buffer
+        clip._cancel.wait(max(0.0, duration - (time.monotonic() - t0)))
+        clip._finish(0)
+
+_ENGINE: Optional[PlaybackEngine] = None
+_ENGINE_LOCK = threading.Lock()
+
+def engine_available() -> bool:
+    if os.environ.get("HOUSEAUDIO_PLAYBACK_ENGINE", "1") == "0":
+        return False
+    return bool(SINK_CMD) and shutil.which(SINK_CMD[0]) is not None and shutil.which("ffmpeg") is not None
+
+def get_engine() -> PlaybackEngine:
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
+            _ENGINE = PlaybackEngine()
+        return _ENGINE
 
 def play_audio_file(path):
     """
-    Play an audio file synchronously using ffplay (no GUI).
+    Play an audio file synchronously to the local output.
+    http(s) URLs are played from the local audio cache when possible.
+    Returns (rc, out, err). Use get_engine().play() to not block.
     """
+    if engine_available():
+        clip = get_engine().play(path)
+        clip.wait()
+        return clip.returncode, "", clip.error
+
+    path = audio_cache.resolve(path)
     cmd = [
         "ffplay",
         "-nodisp",
@@ -14,11 +314,12 @@ def play_audio_file(path):
         "-loglevel", "quiet",
         path,
     ]
-    proc = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
-    out, err = proc.communicate()
+    with tracing.span("subprocess", cmd="ffplay"):
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        out, err = proc.communicate()
     return proc.returncode, out.strip(), err.strip()
@@ -0,0 +1,168 @@
+# src/receiver_state.py
+# Live receiver state cache.
+#
+# Every frame the receiver sends — replies to our own queries and the
+# unsolicited ones it pushes when someone uses the remote or front panel —
+# is decoded into a per-zone model (power, volume, input, mute) with a
+# timestamp on each field. Routes answer from here and only go back to the
+# receiver for fields that are stale.
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import iscp
+
+FIELDS = tuple(iscp.STATUS_FIELDS)   # ("power", "volume", "input", "mute")
+
+# A field is always fresh if it arrived on the current, still-open connection
+# (the receiver pushes every change to us). Otherwise it is trusted for this long.
+DEFAULT_MAX_AGE_S = float(os.environ.get("HOUSEAUDIO_STATE_MAX_AGE_S", "30"))
+
+def _family_table() -> Dict[str, Tuple[str, str]]:
+    """3-letter command family (e.g. 'ZVL') -> (zone, field)."""
+    table = {}
+    for z in ("1", "2", "3"):
+        c = iscp._cmds(z)
+        for field, key in iscp.STATUS_FIELDS.items():
+            table[c[key]] = (z, field)
+    return table
+
+FAMILY_TABLE = _family_table()
+
+def decode_frame(frame: str) -> Optional[Tuple[str, str]]:
+    """
+    Return (zone, field) for a status frame like '!1ZVL28', or None for
+    anything we don't track (NLS text, N/A replies, echoes of QSTN).
+    """
+    if not frame or not frame.startswith("!1") or len(frame) < 6:
+        return None
+    hit = FAMILY_TABLE.get(frame[2:5])
+    if hit is None or frame[5:] in ("N/A", "QSTN"):
+        return None
+    return hit
+
+class ReceiverState:
+    """
+    Per-receiver, per-zone field cache. Values are the raw frames ('!1ZPW01')
+    so callers can keep using the existing parse_* helpers.
+    """
+
+    def __init__(self, max_age_s: float = DEFAULT_MAX_AGE_S):
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self._fields: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._watchers: List[Callable[[str, str, str], None]] = []
+
+    def watch(self, cb: Callable[[str, str, str], None]) -> None:
+        """Call cb(zone, field, frame) whenever a field's value changes (not on refreshes)."""
+        with self._lock:
+            if cb not in self._watchers:
+                self._watchers.append(cb)
+
+    def apply_frame(self, frame: str) -> bool:
+        hit = decode_frame(frame)
+        if hit is None:
+            return False
+        with self._lock:
+            prev = self._fields.get(hit)
+            self._fields[hit] = (frame, time.monotonic())
+            watchers = list(self._watchers) if prev is None or prev[0] != frame else []
+        for cb in watchers:
+            try:
+                cb(hit[0], hit[1], frame)
+            except Exception as e:
+                print(f"[state] watcher error: {e}")
+        return True
+
+    def get(self, zone: str, field: str) -> Optional[Tuple[str, float]]:
+        """(raw frame, monotonic timestamp) or None."""
+        with self._lock:
+            return self._fields.get((str(zone), field))
+
+    def _is_fresh(self, ts: float, now: float, live_since: Optional[float]) -> bool:
+        if live_since is not None and ts >= live_since:
+            return True
+        return now - ts <= self.max_age_s
+
+    def zone_view(self, zone: str, live_since: Optional[float] = None, fields: Iterable[str] = FIELDS):
+        """
+        {field: {"raw": frame or "", "age_s": float or None, "fresh": bool}}.
+        live_since is when the current subscription connection came up (None if down).
+        """
+        now = time.monotonic()
+        out = {}
+        for f in fields:
+            hit = self.get(zone, f)
+            if hit is None:
+                out[f] = {"raw": "", "age_s": None, "fresh": False}
+                continue
+            raw, ts = hit
+            out[f] = {"raw": raw, "age_s": round(now - ts, 3), "fresh": self._is_fresh(ts, now, live_since)}
+        return out
+
+    def stale(self, zone: str, live_since: Optional[float] = None, fields: Iterable[str] = FIELDS) -> List[str]:
+        return [f for f, v in self.zone_view(zone, live_since, fields).items() if not v["fresh"]]
+
+# One cache per receiver, fed by every connection we hold to it (the pooled
+# sync socket and the shared async one).
+_STATES: Dict[Tuple[str, int], ReceiverState] = {}
+_STATES_LOCK = threading.Lock()
+
+def state_for(client) -> ReceiverState:
+    """Cache for client's receiver; attaches it as a frame listener on first use."""
+    conn = getattr(client, "connection", client)   # AsyncEISCPClient is its own connection
+    with _STATES_LOCK:
+        st = _STATES.get((client.host, int(client.port)))
+        if st is None:
+            st = _STATES[(client.host, int(client.port))] = ReceiverState()
+        conn.add_listener(st.apply_frame)   # idempotent
+        return st
+
+class ReceiverListener:
+    """
+    Background thread that keeps the subscription connection open and
+    re-primes the cache with a full query after every (re)connect, so
+    nothing pushed while we were disconnected is missed.
+    """
+
+    def __init__(self, client: iscp.EISCPClient, zones: Callable[[], Iterable[str]], interval_s: float = 5.0):
+        self.client = client
+        self.state = state_for(client)
+        self._zones = zones
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"eiscp-listener-{self.client.host}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        conn = self.client.connection
+        primed_for = None
+        down = False   # log transitions only: a receiver in standby stays down for hours
+        while not self._stop.is_set():
+            if conn.breaker.ready():   # while the circuit is open, don't even try
+                try:
+                    conn.ensure_connected()
+                    since = conn.connected_since
+                    if since is not None and since != primed_for:
+                        zones = list(self._zones())
+                        if zones:
+                            self.client.query_zones(zones, fields=FIELDS)
+                        primed_for = since
+                    if down:
+                        print(f"[state] receiver {self.client.host} subscription back up")
+                        down = False
+                except Exception as e:
+                    if not down:
+                        print(f"[state] receiver {self.client.host} subscription down — {e}")
+                        down = True
+            self._stop.wait(self.interval_s)
@@ -0,0 +1,97 @@
+# src/scenes.py
+# Apply a named scene from zones.yaml as a diff.
+#
+# For every receiver a scene touches: read the target zones' current power /
+# input / volume / mute from the live state cache (re-querying only stale
+# fields, in one batch), drop every SET that would not change anything, and
+# hand the rest to the receiver's CommandScheduler as one batch across zones.
+# The scheduler sends power for all zones first, then input, then volume,
+# then mute. One QSTN pass over what was sent verifies the result at the
+# end. Receivers run concurrently on the shared receiver loop.
+
+import asyncio
+from typing import Dict, List, Mapping, Tuple
+
+from . import iscp_async, receiver_state, scheduler, zones
+
+def diff(targets: Mapping[str, Mapping[str, str]], current: Mapping[str, Mapping[str, str]]) -> List[Tuple[str, str, str]]:
+    """
+    targets {zone_id: {field: hex}} against current {zone_id: {field: raw
+    frame or ""}} -> the (zone_id, field, hex) SETs that change something.
+    A zone being switched off gets only its power command.
+    """
+    sets = []
+    for zid, fields in targets.items():
+        off = fields.get("power") == "00"
+        for field, value in fields.items():
+            if off and field != "power":
+                continue
+            if current.get(zid, {}).get(field, "")[5:].upper() != value:
+                sets.append((zid, field, value))
+    return sets
+
+async def _apply_receiver(cli: iscp_async.AsyncEISCPClient, targets: Dict[str, Dict[str, str]]) -> dict:
+    # let SETs queued before we took the zone locks land, so the diff sees them
+    await scheduler.scheduler_for(cli).flush()
+    state = receiver_state.state_for(cli)
+    stale = {}
+    for zid, fields in targets.items():
+        missing = state.stale(zid, cli.connected_since, fields)
+        if missing:
+            stale[zid] = missing
+    if stale:
+        await cli.query_fields(stale)
+    current = {zid: {f: v["raw"] for f, v in state.zone_view(zid, cli.connected_since, fields).items()}
+               for zid, fields in targets.items()}
+
+    sets = diff(targets, current)
+    verified: Dict[str, Dict[str, str]] = {}
+    if sets:
+        await scheduler.scheduler_for(cli).apply(sets)
+        sent: Dict[str, List[str]] = {}
+        for zid, field, _ in sets:
+            sent.setdefault(zid, []).append(field)
+        verified = await cli.query_fields(sent)
+    return {"sets": sets, "verified": verified}
+
+async def apply(scene: zones.Scene, cfg: zones.ZoneConfig) -> dict:
+    """
+    Apply scene (on the shared receiver loop; see iscp_async.call).
+    Returns {"sent", "skipped", "zones": {name: {"set", "unchanged", "mismatch"}},
+    "errors": {receiver name: message}}.
+    """
+    groups: Dict[zones.Receiver, Dict[str, Dict[str, str]]] = {}
+    for name, fields in scene.targets.items():
+        z = cfg.zones[name]
+        merged = groups.setdefault(cfg.receiver_for(z), {}).setdefault(z.zone_id, {})
+        for field, value in fields.items():
+            merged.setdefault(field, value)   # two names for one zone: first wins
+
+    receivers = list(groups)
+    outcomes = await asyncio.gather(
+        *(_apply_receiver(iscp_async.shared_client(r.host, r.port), groups[r]) for r in receivers),
+        return_exceptions=True,
+    )
+
+    out = {"sent": 0, "skipped": 0, "zones": {}, "errors": {}}
+    for r, res in zip(receivers, outcomes):
+        if isinstance(res, BaseException):
+            out["errors"][r.name] = str(res) or type(res).__name__
+            continue
+        by_zone: Dict[str, Dict[str, str]] = {}
+        for zid, field, value in res["sets"]:
+            by_zone.setdefault(zid, {})[field] = value
+        out["sent"] += len(res["sets"])
+        for name, fields in scene.targets.items():
+            z = cfg.zones[name]
+            if cfg.receiver_for(z) != r:
+                continue
+            sent = by_zone.get(z.zone_id, {})
+            seen = res["verified"].get(z.zone_id, {})
+            out["zones"][name] = {
+                "set": dict(sent),
+                "unchanged": [f for f in fields if f not in sent],
+                "mismatch": [f for f, v in sent.items() if seen.get(f, "")[5:].upper() != v],
+            }
+            out["skipped"] += len(fields) - len(sent)
+    return out
@@ -0,0 +1,147 @@
+# src/scheduler.py
+# Per-receiver SET scheduler with last-write-wins coalescing.
+#
+# A volume slider fires dozens of /zones/set calls a second. Instead of
+# sending every one, SETs are parked in one slot per (zone, field); a newer
+# value for the same slot replaces the pending one. A single drain task per
+# receiver sends whatever is pending (power, then input, then volume, then
+# mute), never closer together than min_spacing_s, and every caller whose
+# value was folded into a send gets that send's echo — i.e. the state the
+# receiver actually acknowledged, which may be a later caller's value.
+#
+# Runs on the shared receiver loop (iscp_async); submit via iscp_async.call.
+# The sync EISCPClient.set_fields (announcements, /zone) queues here too, so
+# every SET to a receiver shares its spacing and slots.
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from . import tracing
+from .iscp import STATUS_FIELDS, _cmds
+from .iscp_async import AsyncEISCPClient
+
+MIN_SPACING_S = float(os.environ.get("HOUSEAUDIO_EISCP_MIN_SPACING_MS", "50")) / 1000.0
+FIELD_ORDER = ("power", "input", "volume", "mute")   # power first so the zone is up for the rest
+
+class _Slot:
+    __slots__ = ("value", "futures", "merged")
+
+    def __init__(self, value: str):
+        self.value = value
+        self.futures: List[asyncio.Future] = []
+        self.merged = 0   # earlier values this slot replaced
+
+class CommandScheduler:
+    def __init__(self, client: AsyncEISCPClient, min_spacing_s: float = MIN_SPACING_S,
+                 window_s: Optional[float] = None):
+        self.client = client
+        self.min_spacing_s = min_spacing_s
+        self.window_s = window_s   # None: the client's adaptive window
+        self._pending: Dict[Tuple[str, str], _Slot] = {}
+        self._drain_task: Optional[asyncio.Task] = None
+        self._last_send = 0.0
+        self.sent = 0        # SET commands actually written
+        self.coalesced = 0   # SETs dropped because a newer value superseded them
+
+    async def submit(self, zone: str, field: str, value: str) -> Optional[str]:
+        """Queue one SET and return the echo frame that settled it (None if none came)."""
+        return (await self.apply([(zone, field, value)]))[field]
+
+    async def apply(self, sets: Sequence[Tuple[str, str, str]]) -> Dict[str, Optional[str]]:
+        """
+        Queue several (zone, field, hex_value) SETs and wait for all of them.
+        Returns {field: echo frame or None}.
+        """
+        return await self.wait(self.enqueue(sets))
+
+    def enqueue(self, sets: Sequence[Tuple[str, str, str]]) -> List[Tuple[str, asyncio.Future]]:
+        """
+        Queue SETs without waiting (call on the receiver loop). Lets a caller
+        fix its place in line under a lock and wait for the echo after
+        releasing it. Pass the result to wait().
+        """
+        loop = asyncio.get_running_loop()
+        waits = []
+        for zone, field, value in sets:
+            if field not in STATUS_FIELDS:
+                raise ValueError(f"unknown field {field!r}")
+            key = (str(zone), field)
+            slot = self._pending.get(key)
+            if slot is None:
+                slot = self._pending[key] = _Slot(str(value).upper())
+            elif slot.value != str(value).upper():
+                slot.value = str(value).upper()
+                slot.merged += 1
+                self.coalesced += 1
+            fut = loop.create_future()
+            slot.futures.append(fut)
+            waits.append((field, fut))
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = loop.create_task(self._drain())
+        return waits
+
+    async def wait(self, waits: List[Tuple[str, asyncio.Future]]) -> Dict[str, Optional[str]]:
+        with tracing.span("scheduler", sets=len(waits)):
+            return {field: await fut for field, fut in waits}
+
+    async def flush(self) -> None:
+        """Return once everything queued so far has been sent and answered."""
+        while self._drain_task is not None and not self._drain_task.done():
+            await asyncio.shield(self._drain_task)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "sent": self.sent, "coalesced": self.coalesced,
+                "min_spacing_s": self.min_spacing_s}
+
+    # -- drain loop --
+
+    def _take_next_group(self) -> List[Tuple[Tuple[str, str], _Slot]]:
+        # the highest-ordered field with anything pending, across all zones
+        for field in FIELD_ORDER:
+            group = [(k, s) for k, s in self._pending.items() if k[1] == field]
+            if group:
+                for k, _ in group:
+                    del self._pending[k]
+                return group
+        return []
+
+    async def _drain(self) -> None:
+        while self._pending:
+            wait = self._last_send + self.min_spacing_s - time.monotonic()
+            if wait > 0:
+                # newer values keep landing in the slots while we wait
+                with tracing.span("sleep", reason="min spacing", planned_ms=round(wait * 1000, 1)):
+                    await asyncio.sleep(wait)
+            group = self._take_next_group()
+            cmds = []
+            for (zone, field), slot in group:
+                fam = _cmds(zone)[STATUS_FIELDS[field]]
+                cmds.append((f"{fam}{slot.value}", f"!1{fam}"))
+            self._last_send = time.monotonic()
+            self.sent += len(cmds)
+            try:
+                frames = await self.client.transact_many(cmds, window_s=self.window_s)
+            except Exception as e:
+                for _, slot in group:
+                    for fut in slot.futures:
+                        if not fut.done():
+                            fut.set_exception(e)
+                continue
+            for (_, slot), frame in zip(group, frames):
+                for fut in slot.futures:
+                    if not fut.done():
+                        fut.set_result(frame)
+
+# ---------- one scheduler per receiver ----------
+
+_SCHEDULERS: Dict[Tuple[str, int], CommandScheduler] = {}
+
+def scheduler_for(client: AsyncEISCPClient) -> CommandScheduler:
+    """Scheduler in front of client's receiver (call on the client's loop)."""
+    key = (client.host, int(client.port))
+    sched = _SCHEDULERS.get(key)
+    if sched is None:
+        sched = _SCHEDULERS[key] = CommandScheduler(client)
+    return sched
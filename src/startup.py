@@ -0,0 +1,82 @@
+# src/startup.py
+# Background startup checks and the readiness report.
+#
+# Importing the app does no network I/O. start() kicks off one thread per
+# check — zones.yaml, every receiver, MPD — so they run in parallel and a
+# receiver that is asleep costs its own timeout, not everyone's. Results are
+# kept for /readyz; nothing blocks on them.
+
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+PROBE_TIMEOUT_S = 1.0
+
+_LOCK = threading.Lock()
+_RESULTS: Dict[str, dict] = {}
+_started_at: Optional[float] = None
+
+def probe_receiver(host: str, port: int) -> str:
+    # opens the pooled connection, so the probe counts against the receiver's
+    # session cap (and goes through its breaker) like any other session,
+    # and the first request finds the socket already up
+    from . import iscp
+    iscp.get_connection(host, port).ensure_connected()
+    return f"{host}:{port} reachable"
+
+def probe_mpd(host: str, port: int, timeout: float = PROBE_TIMEOUT_S) -> str:
+    from . import mpd_client
+    cli = mpd_client.MPDClient(host, port, timeout=timeout)
+    try:
+        cli._connect()
+        return f"MPD {cli.version}"
+    finally:
+        cli.close()
+
+def _run_check(name: str, fn: Callable[[], str]) -> None:
+    t0 = time.monotonic()
+    try:
+        detail, ok = fn(), True
+    except Exception as e:
+        detail, ok = str(e) or type(e).__name__, False
+    res = {"ok": ok, "detail": detail, "latency_ms": round((time.monotonic() - t0) * 1000.0, 1),
+           "checked_at": time.time()}
+    with _LOCK:
+        _RESULTS[name] = res
+    print(f"[startup] {name}: {'ok' if ok else 'FAILED'} — {detail}")
+
+def run_checks(checks: Dict[str, Callable[[], str]]) -> None:
+    """Run every check on its own thread; returns immediately."""
+    global _started_at
+    with _LOCK:
+        _started_at = time.time()
+        for name in checks:
+            _RESULTS[name] = {"ok": None, "detail": "pending"}
+    for name, fn in checks.items():
+        threading.Thread(target=_run_check, args=(name, fn), name=f"startup-{name}", daemon=True).start()
+
+def default_checks(receivers: Iterable[Tuple[str, int]], mpd: Tuple[str, int]) -> Dict[str, Callable[[], str]]:
+    from . import zones
+
+    def zones_check():
+        cfg = zones.REGISTRY.load()
+        return f"{len(cfg.zones)} zones"
+
+    checks = {"zones": zones_check}
+    for host, port in receivers:
+        checks[f"receiver:{host}"] = lambda h=host, p=port: probe_receiver(h, p)
+    checks["mpd"] = lambda: probe_mpd(*mpd)
+    return checks
+
+def report() -> dict:
+    """{"started_at", "done", "ok", "checks": {name: {...}}}; ok is None until every check finished."""
+    with _LOCK:
+        checks = {k: dict(v) for k, v in _RESULTS.items()}
+        started = _started_at
+    done = bool(checks) and all(c["ok"] is not None for c in checks.values())
+    return {
+        "started_at": started,
+        "done": done,
+        "ok": all(c["ok"] for c in checks.values()) if done else None,
+        "checks": checks,
+    }
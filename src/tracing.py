@@ -0,0 +1,232 @@
+# src/tracing.py
+# Request-level tracing: where did the time go?
+#
+# A Trace is started per HTTP request and per announcement job. Code on the
+# way records spans with span(): eISCP transactions and connects, MPD
+# commands, zone lock waits, sleeps, subprocesses, announcement phases. The
+# active trace follows the request through a contextvar, into fan_out
+# threads (copied context) and onto the shared receiver loop
+# (iscp_async.call/run). Finished traces land in a bounded ring buffer,
+# served by GET /debug/traces. With no active trace span() is a no-op.
+#
+# Optional sampled profiler: with HOUSEAUDIO_TRACE_PROFILE_MS set, requests
+# still running after that long (a HOUSEAUDIO_TRACE_PROFILE_SAMPLE fraction
+# of them) get their thread's stack sampled PROFILE_HZ times a second; the
+# collapsed stacks are attached to the trace.
+
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, List, Optional
+
+ENABLED = os.environ.get("HOUSEAUDIO_TRACING", "1") != "0"
+BUFFER = int(os.environ.get("HOUSEAUDIO_TRACE_BUFFER", "200"))           # finished traces kept
+MAX_SPANS = 500                                                          # per trace; the rest are counted
+PROFILE_MS = float(os.environ.get("HOUSEAUDIO_TRACE_PROFILE_MS", "0"))   # 0: profiler off
+PROFILE_SAMPLE = float(os.environ.get("HOUSEAUDIO_TRACE_PROFILE_SAMPLE", "1.0"))
+PROFILE_HZ = 100
+PROFILE_DEPTH = 40
+
+class Span:
+    __slots__ = ("name", "start", "end", "attrs", "thread")
+
+    def __init__(self, name: str, attrs: dict, start: Optional[float] = None):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter() if start is None else start
+        self.end: Optional[float] = None
+        self.thread = threading.current_thread().name
+
+    def to_dict(self, t0: float) -> dict:
+        end = self.end if self.end is not None else time.perf_counter()
+        return {"name": self.name, "start_ms": round((self.start - t0) * 1000, 2),
+                "ms": round((end - self.start) * 1000, 2), "thread": self.thread, **self.attrs}
+
+class Trace:
+    def __init__(self, name: str, parent: Optional[str] = None, **attrs):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.parent = parent   # trace id that caused this one (e.g. the request that queued a job)
+        self.attrs = dict(attrs)
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.status = None
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self.thread_id = threading.get_ident()
+        self.profile: Optional[Counter] = None   # collapsed stack -> samples, when sampled
+        self._token = None
+
+    def add(self, span: Span) -> None:
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append(span)   # list.append is atomic; spans come from several threads
+        else:
+            self.dropped += 1
+
+    @property
+    def ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return round((end - self.start) * 1000, 2)
+
+    def summary(self) -> dict:
+        return {"trace_id": self.id, "name": self.name, "parent": self.parent, "started_at": self.started_at,
+                "ms": self.ms, "status": self.status, "spans": len(self.spans) + self.dropped,
+                "running": self.end is None, **self.attrs}
+
+    def to_dict(self) -> dict:
+        out = self.summary()
+        out["timeline"] = [s.to_dict(self.start) for s in sorted(list(self.spans), key=lambda s: s.start)]
+        out["dropped_spans"] = self.dropped
+        if self.profile is not None:
+            out["profile"] = [{"stack": stack, "samples": n} for stack, n in self.profile.most_common(20)]
+        return out
+
+_CURRENT: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("houseaudio_trace", default=None)
+_RECENT: Deque[Trace] = deque(maxlen=BUFFER)
+_ACTIVE: Dict[str, Trace] = {}
+_LOCK = threading.Lock()
+
+def current() -> Optional[Trace]:
+    return _CURRENT.get()
+
+def start(name: str, parent: Optional[str] = None, **attrs) -> Optional[Trace]:
+    """Begin a trace and make it current in this context. None when tracing is off."""
+    if not ENABLED:
+        return None
+    tr = Trace(name, parent, **attrs)
+    tr._token = _CURRENT.set(tr)
+    with _LOCK:
+        _ACTIVE[tr.id] = tr
+    if PROFILE_MS > 0 and random.random() < PROFILE_SAMPLE:
+        tr.profile = Counter()
+        _ensure_profiler()
+    return tr
+
+def finish(tr: Optional[Trace], status=None) -> None:
+    if tr is None or tr.end is not None:
+        return
+    tr.end = time.perf_counter()
+    if status is not None:
+        tr.status = status
+    with _LOCK:
+        _ACTIVE.pop(tr.id, None)
+        _RECENT.append(tr)
+    try:
+        _CURRENT.reset(tr._token)
+    except ValueError:   # finished from another context
+        pass
+
+def annotate(**attrs) -> None:
+    """Add attributes to the current trace (e.g. the job id a request queued)."""
+    tr = _CURRENT.get()
+    if tr is not None:
+        tr.attrs.update(attrs)
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time the block as a span of the current trace. Yields the Span (None if untraced)."""
+    tr = _CURRENT.get()
+    if tr is None:
+        yield None
+        return
+    s = Span(name, attrs)
+    try:
+        yield s
+    finally:
+        s.end = time.perf_counter()
+        tr.add(s)
+
+def record(name: str, start: float, end: Optional[float] = None, **attrs) -> None:
+    """Add a span after the fact; start/end are time.perf_counter() values."""
+    tr = _CURRENT.get()
+    if tr is not None:
+        s = Span(name, attrs, start)
+        s.end = time.perf_counter() if end is None else end
+        tr.add(s)
+
+@contextmanager
+def use(tr: Optional[Trace]):
+    """Make tr current for the block (work handed over to another thread)."""
+    token = _CURRENT.set(tr)
+    try:
+        yield tr
+    finally:
+        _CURRENT.reset(token)
+
+def sleep(seconds: float, reason: str = "") -> None:
+    with span("sleep", reason=reason, planned_ms=round(seconds * 1000, 1)):
+        time.sleep(seconds)
+
+async def within(tr: Optional[Trace], coro):
+    """Run coro (on another loop's task) as part of tr."""
+    _CURRENT.set(tr)   # the task has its own context copy; nothing to reset
+    return await coro
+
+# ---------- lookup ----------
+
+def recent(limit: int = 50, min_ms: float = 0.0, name: Optional[str] = None) -> List[Trace]:
+    """Finished traces, newest first."""
+    with _LOCK:
+        traces = list(_RECENT)
+    out = []
+    for tr in reversed(traces):
+        if tr.ms >= min_ms and (name is None or name in tr.name):
+            out.append(tr)
+            if len(out) >= limit:
+                break
+    return out
+
+def active() -> List[Trace]:
+    with _LOCK:
+        return list(_ACTIVE.values())
+
+def get(trace_id: str) -> Optional[Trace]:
+    with _LOCK:
+        if trace_id in _ACTIVE:
+            return _ACTIVE[trace_id]
+        for tr in _RECENT:
+            if tr.id == trace_id:
+                return tr
+    return None
+
+# ---------- sampled profiler ----------
+
+_PROFILER: Optional[threading.Thread] = None
+
+def _ensure_profiler() -> None:
+    global _PROFILER
+    with _LOCK:
+        if _PROFILER is None:
+            _PROFILER = threading.Thread(target=_profile_loop, name="trace-profiler", daemon=True)
+            _PROFILER.start()
+
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None and len(parts) < PROFILE_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+def _profile_loop() -> None:
+    interval = 1.0 / PROFILE_HZ
+    while True:
+        time.sleep(interval)
+        now = time.perf_counter()
+        with _LOCK:
+            slow = [tr for tr in _ACTIVE.values()
+                    if tr.profile is not None and (now - tr.start) * 1000 >= PROFILE_MS]
+        if not slow:
+            continue
+        frames = sys._current_frames()
+        for tr in slow:
+            frame = frames.get(tr.thread_id)
+            if frame is not None:
+                tr.profile[_collapse(frame)] += 1
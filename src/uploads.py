@@ -0,0 +1,77 @@
+# src/uploads.py
+# Announcement audio posted straight to /announce.
+#
+# The body (raw audio, or the file part of a multipart form) is copied to a
+# temp file under UPLOAD_DIR in CHUNK-sized pieces, so memory stays bounded
+# whatever the clip size. The job is queued once the whole clip is on disk
+# (waitress buffers the request body before the view runs anyway, so
+# there is nothing to overlap with) and the file is deleted once the job is
+# done with it.
+
+import os
+import tempfile
+import threading
+from typing import BinaryIO, Dict
+
+from . import audio_cache
+
+UPLOAD_DIR = os.environ.get("HOUSEAUDIO_UPLOAD_DIR", os.path.join(audio_cache.DEFAULT_DIR, "uploads"))
+MAX_BYTES = int(os.environ.get("HOUSEAUDIO_UPLOAD_MAX_MB", "50")) * 1024 * 1024
+CHUNK = audio_cache.CHUNK
+
+class UploadError(ValueError):
+    pass
+
+class Upload:
+    def __init__(self, suffix: str = ""):
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        self._fd, self.path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix="upload-", suffix=suffix)
+        self.size = 0
+
+    def write_from(self, stream: BinaryIO, max_bytes: int = MAX_BYTES) -> int:
+        """Copy stream into the file chunk by chunk. Returns the size; raises UploadError."""
+        fd, self._fd = self._fd, None
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = stream.read(CHUNK)
+                    if not chunk:
+                        break
+                    self.size += len(chunk)
+                    if self.size > max_bytes:
+                        raise UploadError(f"upload is larger than {max_bytes // (1024 * 1024)} MB")
+                    f.write(chunk)
+        except UploadError:
+            raise
+        except Exception as e:
+            raise UploadError(str(e) or type(e).__name__) from e
+        if self.size == 0:
+            raise UploadError("empty upload")
+        return self.size
+
+    def close(self) -> None:
+        # the fd is still ours if write_from never ran (e.g. the body was refused)
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            os.close(fd)
+
+# Not yet played uploads, by path (the job's "file")
+_UPLOADS: Dict[str, Upload] = {}
+_LOCK = threading.Lock()
+
+def start(suffix: str = "") -> Upload:
+    up = Upload(suffix)
+    with _LOCK:
+        _UPLOADS[up.path] = up
+    return up
+
+def discard(path: str) -> None:
+    """Forget an upload and delete its file (no-op for anything else, e.g. URLs)."""
+    with _LOCK:
+        up = _UPLOADS.pop(path, None)
+    if up is not None:
+        up.close()
+        try:
+            os.unlink(up.path)
+        except OSError:
+            pass
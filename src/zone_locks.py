@@ -0,0 +1,93 @@
+# src/zone_locks.py
+# Zone-scoped ordering for receiver operations.
+#
+# Each (receiver, zone_id) has its own FIFO lock. Work on different zones runs
+# side by side; work on the same zone runs strictly in arrival order. A
+# multi-zone operation (broadcast announcement) takes its zones in sorted
+# order so two overlapping broadcasts can't deadlock. Every hold records how
+# long it waited, so routes can report it.
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from . import tracing
+
+class _FifoLock:
+    """Ticket lock: waiters are served in the order they arrived."""
+
+    def __init__(self):
+        self._cv = threading.Condition()
+        self._next = 0
+        self._serving = 0
+
+    def acquire(self) -> None:
+        with self._cv:
+            ticket = self._next
+            self._next += 1
+            while self._serving != ticket:
+                self._cv.wait()
+
+    def release(self) -> None:
+        with self._cv:
+            self._serving += 1
+            self._cv.notify_all()
+
+    @property
+    def waiting(self) -> int:
+        with self._cv:
+            return max(0, self._next - self._serving - 1)
+
+class Hold:
+    __slots__ = ("keys", "wait_s")
+
+    def __init__(self, keys: List[Tuple[str, str]]):
+        self.keys = keys
+        self.wait_s = 0.0
+
+    @property
+    def wait_ms(self) -> float:
+        return round(self.wait_s * 1000.0, 1)
+
+_LOCKS: Dict[Tuple[str, str], _FifoLock] = {}
+_LOCKS_LOCK = threading.Lock()
+
+def _lock(key: Tuple[str, str]) -> _FifoLock:
+    with _LOCKS_LOCK:
+        lk = _LOCKS.get(key)
+        if lk is None:
+            lk = _LOCKS[key] = _FifoLock()
+        return lk
+
+def hold(receiver: str, zone_ids: Iterable[str]):
+    """
+    Hold the locks for zone_ids on receiver for the duration of the block.
+    Yields a Hold whose wait_s is the time spent queueing for them.
+    """
+    return hold_keys((receiver, z) for z in zone_ids)
+
+@contextmanager
+def hold_keys(pairs: Iterable[Tuple[str, str]]) -> Iterator[Hold]:
+    """hold() across receivers: pairs of (receiver, zone_id)."""
+    keys = sorted({(r, str(z)) for r, z in pairs})
+    h = Hold(keys)
+    taken = []
+    t0 = time.monotonic()
+    try:
+        with tracing.span("zone_lock", zones=",".join(f"{r}/{z}" for r, z in keys)):
+            for key in keys:
+                lk = _lock(key)
+                lk.acquire()
+                taken.append(lk)
+        h.wait_s = time.monotonic() - t0
+        yield h
+    finally:
+        for lk in reversed(taken):
+            lk.release()
+
+def snapshot() -> Dict[str, int]:
+    """{"host/zone": number of waiters} for every zone that has been locked."""
+    with _LOCKS_LOCK:
+        items = list(_LOCKS.items())
+    return {f"{host}/{zid}": lk.waiting for (host, zid), lk in items}
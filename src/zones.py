@@ -0,0 +1,277 @@
+# src/zones.py
+# Compiled zone registry.
+#
+# config/zones.yaml is parsed and validated once into immutable Zone objects
+# (zone id, receiver, normalised SLI code). The
+# registry re-stats the file at most every CHECK_INTERVAL_S and swaps in a
+# freshly compiled config when its mtime changes — no service restart. A
+# broken edit is reported when it is loaded and the previous config stays
+# in use.
+#
+# An optional 'receivers' section names each AVR (host/port) and zones pick
+# one with 'receiver:'; without it every zone is on DEFAULT_RECEIVER_IP.
+# An optional 'scenes' section names target states for several zones at once
+# (applied by scenes.py).
+
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+from . import iscp
+
+CONFIG_PATH = os.environ.get(
+    "HOUSEAUDIO_ZONES_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "zones.yaml"),
+)
+CHECK_INTERVAL_S = 1.0
+DEFAULT_RECEIVER = "default"   # name used when zones.yaml has no 'receivers' section
+_HEX2 = re.compile(r"[0-9A-Fa-f]{2}")
+
+class ZoneConfigError(ValueError):
+    """zones.yaml is unreadable or fails validation."""
+
+@dataclass(frozen=True)
+class Receiver:
+    name: str
+    host: str
+    port: int = iscp.DEFAULT_PORT
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return (self.host, self.port)
+
+@dataclass(frozen=True)
+class Zone:
+    name: str
+    zone_id: str
+    sli: str                          # announcement input, 2-digit upper-case hex
+    receiver: str = DEFAULT_RECEIVER  # key into ZoneConfig.receivers
+
+    def as_dict(self) -> dict:
+        return {"zone_id": self.zone_id, "sli": self.sli, "receiver": self.receiver}
+
+SCENE_FIELDS = ("power", "input", "volume", "mute")   # the order scenes are applied in
+
+@dataclass(frozen=True)
+class Scene:
+    name: str
+    targets: Mapping[str, Mapping[str, str]]   # zone name -> {field: 2-digit hex}
+
+    def as_dict(self) -> dict:
+        return {zone: dict(fields) for zone, fields in self.targets.items()}
+
+def _default_receivers() -> Mapping[str, Receiver]:
+    host = os.environ.get("DEFAULT_RECEIVER_IP", "192.168.50.249")
+    return MappingProxyType({DEFAULT_RECEIVER: Receiver(DEFAULT_RECEIVER, host)})
+
+@dataclass(frozen=True)
+class ZoneConfig:
+    zones: Mapping[str, Zone]
+    warm_clips: Tuple[str, ...] = ()
+    mtime: float = 0.0
+    raw: Mapping = field(default_factory=dict)   # the parsed YAML, for sections compiled elsewhere
+    receivers: Mapping[str, Receiver] = field(default_factory=_default_receivers)
+    scenes: Mapping[str, Scene] = field(default_factory=dict)
+
+    def receiver_for(self, zone: Zone) -> Receiver:
+        return self.receivers[zone.receiver]
+
+    @property
+    def default_receiver(self) -> Receiver:
+        return next(iter(self.receivers.values()))
+
+    def by_receiver(self, names=None) -> Dict[str, Dict[str, Zone]]:
+        """{receiver name: {zone name: Zone}} for names (default: every zone)."""
+        out: Dict[str, Dict[str, Zone]] = {}
+        for name in (self.zones if names is None else names):
+            z = self.zones[name]
+            out.setdefault(z.receiver, {})[name] = z
+        return out
+
+def _compile_receivers(raw, errors) -> Mapping[str, Receiver]:
+    if not raw:
+        return _default_receivers()
+    if not isinstance(raw, dict):
+        errors.append("'receivers' must be a mapping of name -> {host, port}")
+        return _default_receivers()
+    out = {}
+    for name, cfg in raw.items():
+        if not isinstance(cfg, dict) or not cfg.get("host"):
+            errors.append(f"receiver '{name}': needs a 'host'")
+            continue
+        try:
+            port = int(cfg.get("port", iscp.DEFAULT_PORT))
+        except (TypeError, ValueError):
+            errors.append(f"receiver '{name}': port must be an integer, got {cfg.get('port')!r}")
+            continue
+        out[str(name)] = Receiver(str(name), str(cfg["host"]), port)
+    return MappingProxyType(out)
+
+def _compile_zone(name, cfg, errors, receivers) -> Optional[Zone]:
+    if not isinstance(cfg, dict):
+        errors.append(f"zone '{name}': expected a mapping, got {type(cfg).__name__}")
+        return None
+    zid = str(cfg.get("zone_id", "1"))
+    if zid not in iscp.ZONE_IDS:
+        errors.append(f"zone '{name}': zone_id must be one of {', '.join(iscp.ZONE_IDS)}, got {zid!r}")
+        return None
+    sli = str(cfg.get("sli", "2B"))
+    if not _HEX2.fullmatch(sli):
+        errors.append(f"zone '{name}': sli must be a 2-digit hex code like '03', got {sli!r}")
+        return None
+    receiver = str(cfg.get("receiver") or next(iter(receivers), DEFAULT_RECEIVER))
+    if receiver not in receivers:
+        errors.append(f"zone '{name}': unknown receiver {receiver!r} (have {', '.join(receivers) or 'none'})")
+        return None
+    return Zone(str(name), zid, sli.upper(), receiver)
+
+def _scene_value(field: str, value) -> str:
+    """A scene's YAML value for field -> the 2-digit hex the receiver speaks. Raises ValueError."""
+    if field in ("power", "mute"):
+        # YAML 1.1 reads bare on/off as booleans
+        word = ("on" if value else "off") if isinstance(value, bool) else str(value).lower()
+        if word not in ("on", "off"):
+            raise ValueError(f"{field} must be on or off, got {value!r}")
+        return "01" if word == "on" else "00"
+    if field == "volume":
+        if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= 100:
+            raise ValueError(f"volume must be an integer 0..100, got {value!r}")
+        return f"{value:02X}"
+    if not isinstance(value, str) or not _HEX2.fullmatch(value):
+        raise ValueError(f"input must be a quoted 2-digit hex code like '03', got {value!r}")
+    return value.upper()
+
+def _compile_scene(name, cfg, errors, zones) -> Optional[Scene]:
+    if not isinstance(cfg, dict) or not cfg:
+        errors.append(f"scene '{name}': expected a mapping of zone -> {{power, input, volume, mute}}")
+        return None
+    targets = {}
+    for zone, fields in cfg.items():
+        if zone not in zones:
+            errors.append(f"scene '{name}': unknown zone {zone!r}")
+            return None
+        if not isinstance(fields, dict) or not fields:
+            errors.append(f"scene '{name}', zone '{zone}': expected a mapping like {{power: on, volume: 30}}")
+            return None
+        unknown = set(fields) - set(SCENE_FIELDS)
+        if unknown:
+            errors.append(f"scene '{name}', zone '{zone}': unknown field(s) {', '.join(sorted(map(str, unknown)))}")
+            return None
+        try:
+            targets[str(zone)] = MappingProxyType({f: _scene_value(f, fields[f]) for f in SCENE_FIELDS if f in fields})
+        except ValueError as e:
+            errors.append(f"scene '{name}', zone '{zone}': {e}")
+            return None
+    return Scene(str(name), MappingProxyType(targets))
+
+def compile_config(data, mtime: float = 0.0) -> ZoneConfig:
+    """Validate parsed YAML and build a ZoneConfig; raises ZoneConfigError listing every problem."""
+    data = data or {}
+    if not isinstance(data, dict):
+        raise ZoneConfigError("zones.yaml: top level must be a mapping")
+    errors = []
+    receivers = _compile_receivers(data.get("receivers"), errors)
+    raw_zones = data.get("zones") or {}
+    if not isinstance(raw_zones, dict):
+        errors.append("'zones' must be a mapping of name -> {zone_id, sli, receiver}")
+        raw_zones = {}
+    zones = {}
+    for name, cfg in raw_zones.items():
+        z = _compile_zone(name, cfg, errors, receivers)
+        if z is not None:
+            zones[z.name] = z
+    warm = data.get("warm_clips") or []
+    if not isinstance(warm, list) or not all(isinstance(u, str) for u in warm):
+        errors.append("'warm_clips' must be a list of URLs")
+        warm = []
+    raw_scenes = data.get("scenes") or {}
+    if not isinstance(raw_scenes, dict):
+        errors.append("'scenes' must be a mapping of name -> {zone: {power, input, volume, mute}}")
+        raw_scenes = {}
+    scenes = {}
+    for name, cfg in raw_scenes.items():
+        sc = _compile_scene(name, cfg, errors, zones)
+        if sc is not None:
+            scenes[sc.name] = sc
+    if errors:
+        raise ZoneConfigError("; ".join(errors))
+    return ZoneConfig(MappingProxyType(zones), tuple(warm), mtime, MappingProxyType(dict(data)), receivers,
+                      MappingProxyType(scenes))
+
+def load_file(path: str) -> ZoneConfig:
+    import yaml   # only needed when the file actually changes; keeps `import src.app` cheap
+    try:
+        mtime = os.stat(path).st_mtime
+        with open(path, "r") as f:
+            data = yaml.safe_load(f)
+    except (OSError, yaml.YAMLError) as e:
+        raise ZoneConfigError(f"{path}: {e}") from e
+    return compile_config(data, mtime)
+
+class ZoneRegistry:
+    def __init__(self, path: str = CONFIG_PATH, check_interval_s: float = CHECK_INTERVAL_S):
+        self.path = path
+        self.check_interval_s = check_interval_s
+        self.last_error: Optional[str] = None
+        self._config: Optional[ZoneConfig] = None
+        self._checked_at = 0.0
+        self._bad_mtime: Optional[float] = None   # don't re-parse (and re-log) the same broken file
+        self._lock = threading.Lock()
+
+    def load(self) -> ZoneConfig:
+        """(Re)load now. Raises ZoneConfigError; the previous config is kept on failure."""
+        with self._lock:
+            return self._load()
+
+    def _load(self) -> ZoneConfig:
+        # caller holds _lock
+        self._checked_at = time.monotonic()
+        try:
+            cfg = load_file(self.path)
+        except ZoneConfigError as e:
+            self.last_error = str(e)
+            raise
+        self._config = cfg   # single reference swap; readers never see a half-built config
+        self.last_error = None
+        return cfg
+
+    def current(self) -> ZoneConfig:
+        cfg = self._config
+        if cfg is not None and time.monotonic() - self._checked_at < self.check_interval_s:
+            return cfg
+        with self._lock:   # one thread stats (and maybe loads); the rest get its result
+            cfg = self._config
+            now = time.monotonic()
+            if cfg is not None and now - self._checked_at < self.check_interval_s:
+                return cfg
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if cfg is not None and mtime in (cfg.mtime, self._bad_mtime):
+                return cfg
+            try:
+                cfg = self._load()
+                self._bad_mtime = None
+                print(f"[zones] loaded {len(cfg.zones)} zones from {self.path}")
+            except ZoneConfigError as e:
+                self._bad_mtime = mtime
+                print(f"[zones] config error, keeping previous: {e}")
+                if self._config is None:
+                    # nothing to keep: serve (and cache) an empty config until the file changes
+                    self._config = ZoneConfig(MappingProxyType({}))
+                cfg = self._config
+            return cfg
+
+REGISTRY = ZoneRegistry()
+
+def current() -> ZoneConfig:
+    return REGISTRY.current()
+
+def get(name: str) -> Optional[Zone]:
+    return current().zones.get(name)
@@ -8,3 +8,19 @@ REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # ensure repo root is importable so `import src.*` works
 if REPO_ROOT not in sys.path:
     sys.path.insert(0, REPO_ROOT)
+
+import pytest
+
+@pytest.fixture
+def fake_mpd(monkeypatch):
+    from tests.fake_mpd import FakeMPD
+    from src import mpd_client
+
+    srv = FakeMPD()
+    monkeypatch.setenv("MPD_HOST", "127.0.0.1")
+    monkeypatch.setenv("MPD_PORT", str(srv.port))
+    yield srv
+    for cli in list(mpd_client._CLIENTS.values()):
+        cli.close()
+    mpd_client._CLIENTS.clear()
+    srv.close()
@@ -0,0 +1,162 @@
+# tests/fake_mpd.py
+# A tiny in-process MPD speaking just enough of the protocol for our client:
+# status/currentsong, clear/add/play/pause/stop, command lists and
+# idle/noidle. "Songs" play for `song_s` seconds and then stop, firing the
+# player idle event like the real thing.
+import socket
+import threading
+
+class _LineReader:
+    # socket.makefile() gives up for good after one timeout; idle needs to poll
+    def __init__(self, conn):
+        self.conn = conn
+        self.buf = b""
+
+    def readline(self):
+        while b"\n" not in self.buf:
+            chunk = self.conn.recv(4096)
+            if not chunk:
+                return b""
+            self.buf += chunk
+        line, _, self.buf = self.buf.partition(b"\n")
+        return line + b"\n"
+
+class FakeMPD:
+    def __init__(self, song_s: float = 0.2):
+        self.song_s = song_s
+        self.commands = []          # every command line received, in order
+        self.connections = 0
+        self.state = "stop"
+        self.queue = []
+        self._lock = threading.Lock()
+        self._events = 0
+        self._play_timer = None
+        self._srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._srv.bind(("127.0.0.1", 0))
+        self._srv.listen(16)
+        self.port = self._srv.getsockname()[1]
+        self._closed = False
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def close(self):
+        self._closed = True
+        self._srv.close()
+        if self._play_timer:
+            self._play_timer.cancel()
+
+    # -- state changes --
+
+    def _set_state(self, state):
+        # caller holds _lock
+        if state != self.state:
+            self.state = state
+            self._events += 1
+
+    def _finish_song(self):
+        with self._lock:
+            self._set_state("stop")
+
+    def _handle(self, line):
+        name, _, rest = line.partition(" ")
+        args = [a.strip('"') for a in rest.split('" "')] if rest else []
+        with self._lock:
+            self.commands.append(line)
+            if name == "status":
+                out = [f"volume: 80", f"state: {self.state}", f"playlistlength: {len(self.queue)}"]
+                if self.queue:
+                    out += ["song: 0", "songid: 1", "elapsed: 0.100", "duration: 3.000"]
+                return out
+            if name == "currentsong":
+                return [f"file: {self.queue[0]}", "Title: Chime"] if self.queue else []
+            if name == "clear":
+                self.queue = []
+                self._set_state("stop")
+            elif name == "add":
+                self.queue.append(args[0])
+            elif name == "play":
+                if self.queue:
+                    self._set_state("play")
+                    if self._play_timer:
+                        self._play_timer.cancel()
+                    self._play_timer = threading.Timer(self.song_s, self._finish_song)
+                    self._play_timer.daemon = True
+                    self._play_timer.start()
+            elif name == "pause":
+                self._set_state("pause")
+            elif name == "stop":
+                self._set_state("stop")
+            elif name == "ping":
+                pass
+            else:
+                raise KeyError(name)
+        return []
+
+    # -- connection handling --
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn, _ = self._srv.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        f = _LineReader(conn)
+        seen = self._events   # like MPD, events since the last idle are reported on the next one
+        conn.sendall(b"OK MPD 0.23.5\n")
+        try:
+            batch = None
+            while True:
+                raw = f.readline()
+                if not raw:
+                    return
+                line = raw.decode().rstrip("\n")
+                if line in ("command_list_begin", "command_list_ok_begin"):
+                    batch = []
+                    continue
+                if line == "command_list_end":
+                    out = []
+                    for cmd in batch:
+                        out += self._handle(cmd)
+                    batch = None
+                    conn.sendall(("".join(l + "\n" for l in out) + "OK\n").encode())
+                    continue
+                if batch is not None:
+                    batch.append(line)
+                    continue
+                if line.startswith("idle"):
+                    seen = self._idle(conn, f, seen)
+                    continue
+                try:
+                    out = self._handle(line)
+                    conn.sendall(("".join(l + "\n" for l in out) + "OK\n").encode())
+                except KeyError as e:
+                    conn.sendall(f"ACK [5@0] {{{e.args[0]}}} unknown command\n".encode())
+        except OSError:
+            return
+
+    def _idle(self, conn, f, seen):
+        with self._lock:
+            self.commands.append("idle")
+        # wait for either a player event or a noidle from the client
+        conn.settimeout(0.02)
+        try:
+            while True:
+                with self._lock:
+                    if self._events != seen:
+                        conn.sendall(b"changed: player\nOK\n")
+                        return self._events
+                try:
+                    raw = f.readline()
+                except socket.timeout:
+                    continue
+                if raw.startswith(b"noidle"):
+                    conn.sendall(b"OK\n")
+                    return seen
+                if not raw:
+                    raise OSError("client went away")
+        finally:
+            conn.settimeout(None)
@@ -0,0 +1,169 @@
+# tests/fake_receiver.py
+# A local eISCP receiver simulator, for tests and bench/.
+#
+# Speaks real eISCP over TCP and keeps power/volume/input/mute for zones
+# 1-3 (PWR/MVL/SLI/AMT, ZPW/ZVL/SLZ/ZMT, PW3/VL3/SL3/MT3). Like an Onkyo it
+# answers QSTN with the current value, echoes every SET, and pushes the
+# change to every *other* connected client. It can also add per-family
+# latency, drop replies, refuse clients beyond a connection limit and emit
+# unsolicited chatter (NLS frames) or front-panel changes.
+import random
+import socket
+import threading
+import time
+
+FAMILIES = {
+    "PWR": "01", "MVL": "28", "SLI": "2B", "AMT": "00",
+    "ZPW": "00", "ZVL": "14", "SLZ": "03", "ZMT": "00",
+    "PW3": "01", "VL3": "0A", "SL3": "03", "MT3": "00",
+}
+
+def frame(payload: str) -> bytes:
+    data = payload.encode("ascii") + b"\x1a\r\n"   # Integra-style EM + CRLF
+    return b"ISCP" + (16).to_bytes(4, "big") + len(data).to_bytes(4, "big") + b"\x01\x00\x00\x00" + data
+
+class FakeReceiver:
+    """
+    latency_s:  float, or {family: float} (missing families answer at once)
+    drop:       probability (0..1) that a reply is silently not sent
+    drop_families: families that never answer
+    max_connections: clients beyond this are accepted and closed at once
+    chatter_s:  if set, push an NLS frame to everyone this often
+    """
+
+    def __init__(self, latency_s=0.0, drop: float = 0.0, drop_families=(), max_connections: int = 2,
+                 chatter_s: float = None, seed: int = 1):
+        self.latency_s = latency_s
+        self.drop = drop
+        self.drop_families = set(drop_families)
+        self.max_connections = max_connections
+        self.state = dict(FAMILIES)
+        self.commands = []          # every payload received, in order
+        self.connections = 0        # accepted and served
+        self.refused = 0            # over max_connections
+        self.dropped = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._clients = []          # (conn, send_lock)
+        self._closed = False
+        self._srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._srv.bind(("127.0.0.1", 0))
+        self._srv.listen(16)
+        self.host, self.port = self._srv.getsockname()
+        threading.Thread(target=self._accept, daemon=True).start()
+        if chatter_s:
+            threading.Thread(target=self._chatter, args=(chatter_s,), daemon=True).start()
+
+    def close(self):
+        self._closed = True
+        self._srv.close()
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for conn, _ in clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+                conn.close()
+            except OSError:
+                pass
+
+    # -- simulated front panel / remote --
+
+    def change(self, family: str, value: str) -> None:
+        """Someone pressed a button: update state and push it to every client."""
+        with self._lock:
+            self.state[family] = value
+        self.push(f"!1{family}{value}")
+
+    def push(self, payload: str, exclude=None) -> None:
+        with self._lock:
+            clients = [c for c in self._clients if c[0] is not exclude]
+        for conn, send_lock in clients:
+            self._send(conn, send_lock, payload)
+
+    # -- protocol --
+
+    def _latency(self, family: str) -> float:
+        if isinstance(self.latency_s, dict):
+            return self.latency_s.get(family, 0.0)
+        return self.latency_s
+
+    def _reply_for(self, payload: str):
+        """(reply payload or None, is_set) for one received command."""
+        cmd = payload[2:] if payload.startswith("!1") else payload
+        family, arg = cmd[:3], cmd[3:]
+        with self._lock:
+            self.commands.append(payload)
+            if family not in self.state:
+                return f"!1{family}N/A", False
+            if arg == "QSTN":
+                return f"!1{family}{self.state[family]}", False
+            self.state[family] = arg.upper()
+            return f"!1{family}{self.state[family]}", True
+
+    def _send(self, conn, send_lock, payload: str) -> None:
+        try:
+            with send_lock:
+                conn.sendall(frame(payload))
+        except OSError:
+            pass
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn, _ = self._srv.accept()
+            except OSError:
+                return
+            with self._lock:
+                if len(self._clients) >= self.max_connections:
+                    self.refused += 1
+                    conn.close()
+                    continue
+                self.connections += 1
+                client = (conn, threading.Lock())
+                self._clients.append(client)
+            threading.Thread(target=self._serve, args=client, daemon=True).start()
+
+    def _serve(self, conn, send_lock):
+        buf = b""
+        try:
+            while True:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                buf += chunk
+                while len(buf) >= 16:
+                    hdr_len = int.from_bytes(buf[4:8], "big")
+                    data_len = int.from_bytes(buf[8:12], "big")
+                    if len(buf) < hdr_len + data_len:
+                        break
+                    payload = buf[hdr_len:hdr_len + data_len].decode("ascii", "ignore").strip("\r\n\x1a")
+                    buf = buf[hdr_len + data_len:]
+                    self._handle(conn, send_lock, payload)
+        except OSError:
+            return
+        finally:
+            with self._lock:
+                self._clients = [c for c in self._clients if c[0] is not conn]
+            conn.close()
+
+    def _handle(self, conn, send_lock, payload: str) -> None:
+        # commands on one connection are processed in order, like the real thing
+        reply, is_set = self._reply_for(payload)
+        delay = self._latency(payload[2:5])
+        if delay:
+            time.sleep(delay)
+        family = payload[2:5]
+        with self._lock:
+            dropped = family in self.drop_families or (self.drop and self._rng.random() < self.drop)
+            if dropped:
+                self.dropped += 1
+        if not dropped:
+            self._send(conn, send_lock, reply)
+        if is_set:
+            self.push(reply, exclude=conn)   # other clients hear about the change
+
+    def _chatter(self, every_s: float):
+        while not self._closed:
+            time.sleep(every_s)
+            self.push("!1NLSC-P")
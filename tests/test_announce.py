@@ -0,0 +1,172 @@
+# Broadcasts must hit the receiver in a handful of batches (not per zone)
+# and play the clip through MPD exactly once.
+import os
+os.environ.setdefault("HOUSEAUDIO_SKIP_STARTUP", "1")
+
+import threading
+import time
+
+import pytest
+
+import src.helpers.announce as announce
+from src import iscp, iscp_async, scheduler, zones
+from src.app import app
+from tests.fake_receiver import FakeReceiver
+
+ZONES = {
+    "inside":      {"zone_id": "1", "sli": "2B"},
+    "front_patio": {"zone_id": "2", "sli": "03"},
+    "back_patio":  {"zone_id": "3", "sli": "03"},
+}
+
+def _echo(sets, window_s=None):
+    # what the receiver sends back for each SET
+    return [f"!1{iscp._cmds(z)[iscp.STATUS_FIELDS[f]]}{v}" for z, f, v in sets]
+
+def test_broadcast_batches_receiver_steps_and_plays_once(mocker):
+    mocker.patch.object(announce.zones, "current", return_value=zones.compile_config({"zones": ZONES}))
+    mocker.patch.object(announce.audio_cache, "resolve_for_mpd", side_effect=lambda url: url)
+    play = mocker.patch.object(announce.mpd_control, "play_now", return_value=(0, "", ""))
+    mocker.patch.object(announce.mpd_control, "wait_until_stopped", return_value=True)
+    cli = mocker.patch.object(announce.iscp, "EISCPClient").return_value
+    cli.set_fields.side_effect = _echo
+    cli.query_fields.return_value = {
+        "1": {"input": "!1SLI2B", "volume": "!1MVL20"},   # already on the announcement input
+        "2": {"input": "!1SLZ05", "volume": "!1ZVL10"},
+        "3": {"input": "",        "volume": "!1VL30A"},   # no reply for input
+    }
+
+    announce.play_broadcast_announcement(list(ZONES), 40, "http://example.com/chime.mp3")
+
+    play.assert_called_once_with("http://example.com/chime.mp3")
+    cli.query_fields.assert_called_once_with({z: ("input", "volume") for z in ("1", "2", "3")})
+    batches = [c.args[0] for c in cli.set_fields.call_args_list]
+    assert batches == [
+        [("1", "power", "01"), ("2", "power", "01"), ("3", "power", "01")],
+        [("1", "input", "2B"), ("2", "input", "03"), ("3", "input", "03"),
+         ("1", "volume", "28"), ("2", "volume", "28"), ("3", "volume", "28"), ("1", "mute", "01")],
+        [("1", "input", "2B"), ("2", "input", "05"),
+         ("1", "volume", "20"), ("2", "volume", "10"), ("3", "volume", "0A"), ("1", "mute", "00")],
+    ]
+
+def test_broadcast_drives_each_receiver_in_parallel(mocker):
+    cfg = zones.compile_config({
+        "receivers": {"main": {"host": "192.0.2.1"}, "garage": {"host": "192.0.2.2"}},
+        "zones": {"inside": {"zone_id": "1", "sli": "2B", "receiver": "main"},
+                  "shop":   {"zone_id": "1", "sli": "03", "receiver": "garage"}},
+    })
+    mocker.patch.object(announce.zones, "current", return_value=cfg)
+    mocker.patch.object(announce.audio_cache, "resolve_for_mpd", side_effect=lambda url: url)
+    play = mocker.patch.object(announce.mpd_control, "play_now", return_value=(0, "", ""))
+    mocker.patch.object(announce.mpd_control, "wait_until_stopped", return_value=True)
+
+    clients = {}
+    def make_client(host, port):
+        cli = clients[host] = mocker.MagicMock()
+        cli.set_fields.side_effect = lambda sets: time.sleep(0.1) or _echo(sets)   # 0.1 s per receiver step
+        cli.query_fields.return_value = {"1": {"input": "!1SLI05", "volume": "!1MVL10"}}
+        return cli
+    mocker.patch.object(announce.iscp, "EISCPClient", side_effect=make_client)
+
+    t0 = announce.time.monotonic()
+    announce.play_broadcast_announcement(["inside", "shop"], 40, "http://example.com/chime.mp3")
+    elapsed = announce.time.monotonic() - t0
+
+    play.assert_called_once()
+    assert clients["192.0.2.1"].set_fields.call_args_list[1].args[0][0] == ("1", "input", "2B")
+    assert clients["192.0.2.2"].set_fields.call_args_list[1].args[0][0] == ("1", "input", "03")
+    assert elapsed < 0.5   # each receiver's three 0.1 s steps overlap (serial would be 0.6 s)
+
+def test_steps_wait_for_confirmation_not_fixed_sleeps(mocker):
+    cli = mocker.MagicMock(host="192.0.2.1")
+    cli.set_fields.return_value = [None]                        # echo lost
+    cli.query_fields.side_effect = [{"2": {"input": "!1SLZ05"}},  # not switched yet
+                                    {"2": {"input": "!1SLZ03"}}]
+    assert announce._set_confirmed(cli, [("2", "input", "03")], timeout_s=1) == []
+    assert cli.query_fields.call_count == 2
+
+    cli.query_fields.side_effect = None
+    cli.query_fields.return_value = {"2": {"input": "!1SLZ05"}}  # never switches
+    t0 = time.monotonic()
+    assert announce._set_confirmed(cli, [("2", "input", "03")], timeout_s=0.2) == [("2", "input")]
+    assert time.monotonic() - t0 < 0.5
+
+    cli.reset_mock()
+    cli.set_fields.return_value = ["!1SLZ03"]                    # echo confirms: no extra round trip
+    assert announce._set_confirmed(cli, [("2", "input", "03")]) == []
+    cli.query_fields.assert_not_called()
+
+def test_refused_cached_copy_falls_back_to_url_then_fails_the_job(mocker):
+    mocker.patch.object(announce.zones, "current", return_value=zones.compile_config({"zones": ZONES}))
+    mocker.patch.object(announce.audio_cache, "resolve_for_mpd", return_value="file:///cache/ab12.mp3")
+    mocker.patch.object(announce.mpd_control, "wait_until_stopped", return_value=True)
+    cli = mocker.patch.object(announce.iscp, "EISCPClient").return_value
+    cli.set_fields.side_effect = _echo
+    cli.query_fields.return_value = {"1": {"input": "!1SLI05", "volume": "!1MVL10"}}
+    refused = (1, "", "[4@0] {add} Access denied")
+
+    play = mocker.patch.object(announce.mpd_control, "play_now", side_effect=[refused, (0, "", "")])
+    announce.play_broadcast_announcement(["inside"], 40, "http://example.com/chime.mp3")
+    assert [c.args[0] for c in play.call_args_list] == ["file:///cache/ab12.mp3", "http://example.com/chime.mp3"]
+
+    play = mocker.patch.object(announce.mpd_control, "play_now", return_value=refused)
+    with pytest.raises(RuntimeError, match="Access denied"):
+        announce.play_broadcast_announcement(["inside"], 40, "http://example.com/chime.mp3")
+    assert play.call_count == 2
+    assert cli.set_fields.call_args.args[0][0] == ("1", "input", "05")   # zones restored before failing
+
+def test_announcements_on_other_zones_wait_for_the_player(mocker):
+    mocker.patch.object(announce.zones, "current", return_value=zones.compile_config({"zones": ZONES}))
+    mocker.patch.object(announce.audio_cache, "resolve_for_mpd", side_effect=lambda url: url)
+    mocker.patch.object(announce, "ACK_TIMEOUT_S", 0)
+    events = []
+    mocker.patch.object(announce.mpd_control, "play_now",
+                        side_effect=lambda uri: events.append(("play", uri)) or (0, "", ""))
+    mocker.patch.object(announce.mpd_control, "wait_until_stopped",
+                        side_effect=lambda **kw: time.sleep(0.2) or events.append(("stopped", None)))
+    cli = mocker.patch.object(announce.iscp, "EISCPClient").return_value
+    def set_fields(sets):
+        events.append(("set", tuple((z, f) for z, f, _ in sets)))
+        return _echo(sets)
+    cli.set_fields.side_effect = set_fields
+    cli.query_fields.side_effect = lambda wanted, **kw: {z: {"input": "!1SLI05", "volume": "!1MVL10"} for z in wanted}
+
+    a = threading.Thread(target=announce.play_broadcast_announcement, args=(["inside"], 40, "http://a/a.mp3"))
+    a.start()
+    time.sleep(0.05)   # A is playing
+    announce.play_broadcast_announcement(["back_patio"], 40, "http://b/b.mp3")
+    a.join()
+
+    a_stopped = events.index(("stopped", None))
+    b_switch = next(i for i, (kind, arg) in enumerate(events) if kind == "set" and ("3", "input") in arg)
+    assert b_switch > a_stopped   # B's zone joins only after A's clip has ended
+    assert [arg for kind, arg in events if kind == "play"] == ["http://a/a.mp3", "http://b/b.mp3"]
+
+def test_announcement_snapshot_sees_a_queued_zones_set(mocker):
+    sim = FakeReceiver()
+    cfg = zones.compile_config({"receivers": {"sim": {"host": sim.host, "port": sim.port}},
+                                "zones": {"back_patio": {"zone_id": "3", "sli": "03"}}})
+    mocker.patch.object(zones, "current", return_value=cfg)
+    mocker.patch.object(announce.audio_cache, "resolve_for_mpd", side_effect=lambda url: url)
+    mocker.patch.object(announce.mpd_control, "play_now", return_value=(0, "", ""))
+    mocker.patch.object(announce.mpd_control, "wait_until_stopped", return_value=True)
+    shared = iscp_async.shared_client(sim.host, sim.port)
+
+    async def slow_spacing():
+        scheduler.scheduler_for(shared).min_spacing_s = 0.15
+    iscp_async.run(slow_spacing(), timeout=5)
+    client = app.test_client()
+    try:
+        assert client.post("/zones/set", json={"zone": "back_patio", "volume": 10}).status_code == 200
+        # the next SET now sits in the scheduler for ~0.15 s after its request released the zone lock
+        pending = threading.Thread(target=client.post, args=("/zones/set",),
+                                   kwargs={"json": {"zone": "back_patio", "volume": 30}})
+        pending.start()
+        time.sleep(0.05)
+        announce.play_broadcast_announcement(["back_patio"], 50, "http://example.com/chime.mp3")
+        pending.join()
+        assert sim.state["VL3"] == "1E"   # restored to the /zones/set value queued before the announcement
+    finally:
+        iscp_async.run(shared.close(), timeout=5)
+        iscp.close_all()
+        sim.close()
@@ -2,8 +2,9 @@ import json
 import os
 os.environ.setdefault("HOUSEAUDIO_SKIP_STARTUP", "1")
 from src.app import app
+from src.jobs import Job
 
-def test_announce_rejects_non_http_urls():
+def test_announce_rejects_non_http_urls(mocker):
     client = app.test_client()
 
     # missing URL (any missing required field should 400)
@@ -23,7 +24,8 @@ def test_announce_rejects_non_http_urls():
     assert r.status_code == 400
     assert b"http(s)" in r.data  # now it should be the URL guard message
 
-    # good scheme (not asserting success of playback here)
+    # good scheme (not asserting success of playback here) -> queued as a job
+    mocker.patch("src.app.ANNOUNCE_JOBS.submit", return_value=Job(["inside"], {}, 50, 0))
     r = client.post(
         "/announce",
         data=json.dumps({
@@ -33,4 +35,13 @@ def test_announce_rejects_non_http_urls():
         }),
         content_type="application/json",
     )
-    assert r.status_code in (200, 500)
+    assert r.status_code == 202
+    assert "job_id" in json.loads(r.data)
+
+def test_health_endpoints_do_no_receiver_io(mocker):
+    send = mocker.patch("src.app.iscp.ReceiverConnection._send")
+    client = app.test_client()
+    assert client.get("/healthz").get_json() == {"ok": True}
+    body = client.get("/readyz").get_json()
+    assert body["zones"] > 0 and "sessions_open" in body["receivers"]["default"]
+    send.assert_not_called()
@@ -0,0 +1,87 @@
+# The audio cache sits between /announce and the network: a hit must not
+# re-download, a changed ETag must, and the size budget must hold.
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from src import audio_cache
+
+CLIPS = {"/doorbell.mp3": b"D" * 1000, "/laundry.mp3": b"L" * 1000, "/dinner.mp3": b"X" * 1000}
+
+class _Handler(BaseHTTPRequestHandler):
+    hits = []
+    send_length = True
+
+    def do_GET(self):
+        body = CLIPS[self.path]
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        _Handler.hits.append((self.path, self.headers.get("If-None-Match")))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        if _Handler.send_length:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def origin():
+    _Handler.hits = []
+    _Handler.send_length = True
+    srv = HTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+
+def test_hit_skips_network_and_revalidation_uses_etag(tmp_path, origin):
+    cache = audio_cache.AudioCache(str(tmp_path), max_bytes=10_000, revalidate_s=3600)
+    url = origin + "/doorbell.mp3"
+
+    path = cache.fetch(url)
+    assert open(path, "rb").read() == CLIPS["/doorbell.mp3"]
+    assert path.endswith(".mp3")
+    assert cache.fetch(url) == path
+    assert len(_Handler.hits) == 1          # second call served from disk
+
+    cache.revalidate_s = 0
+    assert cache.fetch(url) == path
+    assert _Handler.hits[-1][1] is not None  # conditional GET, answered 304
+
+    # a fresh process picks the index back up
+    assert audio_cache.AudioCache(str(tmp_path)).lookup(url) == path
+    assert cache._url_locks == {}            # per-URL locks go once the fetch is done
+
+def test_lru_eviction_keeps_size_budget(tmp_path, origin):
+    cache = audio_cache.AudioCache(str(tmp_path), max_bytes=2_500)
+    a = cache.fetch(origin + "/doorbell.mp3")
+    cache.fetch(origin + "/laundry.mp3")
+    cache.lookup(origin + "/doorbell.mp3")  # doorbell is now the most recent
+    cache.fetch(origin + "/dinner.mp3")
+
+    assert cache.stats()["bytes"] <= 2_500
+    assert cache.lookup(origin + "/laundry.mp3") is None
+    assert cache.lookup(origin + "/doorbell.mp3") == a
+
+@pytest.mark.parametrize("send_length", [True, False])
+def test_clip_larger_than_the_cache_is_not_kept(tmp_path, origin, send_length):
+    _Handler.send_length = send_length   # without it the download is cut off mid-stream
+    cache = audio_cache.AudioCache(str(tmp_path), max_bytes=500)
+    with pytest.raises(ValueError):
+        cache.fetch(origin + "/doorbell.mp3")
+    assert not list((tmp_path / "objects").iterdir())
+    assert cache.lookup(origin + "/doorbell.mp3") is None
+    assert cache.stats()["bytes"] == 0
+
+def test_mpd_uri_prefers_music_dir_relative_paths(monkeypatch, tmp_path):
+    monkeypatch.setenv("MPD_MUSIC_DIR", str(tmp_path))
+    assert audio_cache.mpd_uri(str(tmp_path / "cache" / "x.mp3")) == "cache/x.mp3"
+    monkeypatch.delenv("MPD_MUSIC_DIR")
+    assert audio_cache.mpd_uri("/srv/x.mp3") == "file:///srv/x.mp3"
@@ -0,0 +1,82 @@
+import json
+import os
+os.environ.setdefault("HOUSEAUDIO_SKIP_STARTUP", "1")
+
+import pytest
+
+from src import events
+from src.app import app
+
+def test_resume_replays_only_what_was_missed():
+    hub = events.EventHub(replay=3)
+    first = hub.publish({"zones": {"inside": {"volume": 30}}})
+    hub.publish({"zones": {"inside": {"volume": 31}}})
+    hub.publish({"zones": {"inside": {"power": "on"}}})
+
+    sub, backlog = hub.subscribe(first)
+    assert [ev.id for ev in backlog] == [first + 1, first + 2]
+    assert events.merge(backlog) == {"zones": {"inside": {"volume": 31, "power": "on"}}}
+    sub.close()
+
+    sub, backlog = hub.subscribe(hub.last_id)
+    assert backlog == []
+    sub.close()
+
+    hub.publish({"mpd": {"state": "play"}})
+    hub.publish({"mpd": {"state": "stop"}})   # event first + 1 has left the ring
+    for stale in (first, None, 999):
+        sub, backlog = hub.subscribe(stale)
+        assert backlog is None               # too old, new client, or a previous run: snapshot
+        sub.close()
+
+def test_slow_subscriber_is_resynced_not_waited_for():
+    hub = events.EventHub(buffer=2)
+    slow, _ = hub.subscribe()
+    fast, _ = hub.subscribe()
+    for v in range(5):
+        hub.publish({"zones": {"inside": {"volume": v}}})
+        evs, lagged = fast.get(0)
+        assert len(evs) == 1 and not lagged
+
+    evs, lagged = slow.get(0)
+    assert lagged                            # caller resyncs with a snapshot
+    assert slow.dropped == 3 and len(evs) == 2
+
+def test_subscriber_limit():
+    hub = events.EventHub(max_subscribers=1)
+    sub, _ = hub.subscribe()
+    with pytest.raises(events.HubFull):
+        hub.subscribe()
+    sub.close()
+    hub.subscribe()[0].close()
+
+def _read_event(it):
+    chunk = next(it)
+    chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+    fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+    return fields["event"], int(fields["id"]), json.loads(fields["data"])
+
+def test_zone_stream_sends_snapshot_then_diffs(mocker):
+    mocker.patch("src.app.zone_states", return_value={"inside": {"zone_id": "1", "power": "on", "age_s": {}}})
+    mocker.patch("src.app.mpd_control.get_status", return_value={"state": "stop", "song": {}})
+    mocker.patch("src.app.mpd_control.watch_player")
+
+    r = app.test_client().get("/zones/stream", buffered=False)
+    assert r.mimetype == "text/event-stream"
+    it = iter(r.response)
+    name, snap_id, data = _read_event(it)
+    assert name == "snapshot"
+    assert data["zones"]["inside"] == {"zone_id": "1", "power": "on"}
+    assert data["mpd"]["state"] == "stop"
+
+    events.HUB.publish({"zones": {"inside": {"volume": 40}}})
+    name, change_id, data = _read_event(it)
+    assert (name, change_id, data) == ("change", snap_id + 1, {"zones": {"inside": {"volume": 40}}})
+    r.close()
+    assert events.HUB.subscribers == 0
+
+    # reconnecting from the snapshot replays the diff instead of a new snapshot
+    r = app.test_client().get("/zones/stream", headers={"Last-Event-ID": str(snap_id)}, buffered=False)
+    name, event_id, data = _read_event(iter(r.response))
+    assert (name, event_id) == ("change", change_id)
+    r.close()
@@ -2,24 +2,159 @@
 # Why this matters:
 # You really don’t want to accidentally send the wrong zone volume command to all amps at 6AM.
 # We catch these mistakes in CI, not in your yard speakers.
+import threading
+
+import pytest
+
 import src.iscp as iscp
 
+def _frame(payload: bytes) -> bytes:
+    header = b"ISCP" + (16).to_bytes(4, "big") + len(payload).to_bytes(4, "big") + bytes([1]) + b"\x00\x00\x00"
+    return header + payload
+
+def _serve_chunks(fake_sock, chunks):
+    # recv_into side effect: copy the next chunk into the caller's buffer, then EOF
+    chunks = list(chunks)
+    def recv_into(view):
+        if not chunks:
+            return 0
+        data = chunks.pop(0)
+        view[:len(data)] = data
+        return len(data)
+    fake_sock.recv_into.side_effect = recv_into
+
 def test_transact_packs_and_handles_response(mocker):
+    iscp.close_all()
     # Patch socket.create_connection so we don't really open a socket
     fake_sock = mocker.MagicMock()
     # Craft a fake eISCP response for !1PWRQ like: "!1PWR01"
-    payload = b"!1PWR01\r"
-    data_size = len(payload).to_bytes(4, "big")
-    header = b"ISCP" + (16).to_bytes(4, "big") + data_size + bytes([1]) + b"\x00\x00\x00"
-    frame = header + payload
+    frame = _frame(b"!1PWR01\r")
 
-    # recv returns one frame once, then empty
-    fake_sock.recv.side_effect = [frame]
-    fake_conn_ctx = mocker.MagicMock()
-    fake_conn_ctx.__enter__.return_value = fake_sock
-
-    mocker.patch("socket.create_connection", return_value=fake_conn_ctx)
+    # the whole frame arrives in one read
+    _serve_chunks(fake_sock, [frame])
+    mocker.patch("socket.create_connection", return_value=fake_sock)
 
     cli = iscp.EISCPClient("192.0.2.10", 60128, timeout=0.1)
     out = cli.transact("!1PWRQ")
     assert out == "!1PWR01"
+    iscp.close_all()
+
+def test_clients_share_one_connection_per_receiver():
+    iscp.close_all()
+    a = iscp.EISCPClient("192.0.2.11")
+    b = iscp.EISCPClient("192.0.2.11")
+    c = iscp.EISCPClient("192.0.2.12")
+    assert a._conn is b._conn
+    assert a._conn is not c._conn
+    iscp.close_all()
+
+def test_frames_are_routed_to_the_matching_waiter():
+    conn = iscp.ReceiverConnection("192.0.2.13")
+    zvl = conn._register("!1ZVL")
+    pwr = conn._register("!1PWR")
+
+    conn._dispatch("!1PWR01")   # arrives first but belongs to the PWR caller
+    conn._dispatch("!1NLSC-P")  # unsolicited, nobody waiting
+    conn._dispatch("!1ZVL28")
+
+    assert pwr.frame == "!1PWR01"
+    assert zvl.frame == "!1ZVL28"
+
+def test_query_zone_status_pipelines_one_write(mocker):
+    iscp.close_all()
+    fake_sock = mocker.MagicMock()
+    # replies arrive out of order and split across reads; each must land on its own query
+    burst = b"".join(_frame(p) for p in (b"!1SLZ03\r", b"!1ZPW01\r", b"!1ZVL28\r"))
+    _serve_chunks(fake_sock, [burst[:20], burst[20:50], burst[50:]])
+    mocker.patch("socket.create_connection", return_value=fake_sock)
+
+    cli = iscp.EISCPClient("192.0.2.14", 60128, timeout=0.1)
+    st = cli.query_zone_status("2")
+
+    assert st == {"power": "!1ZPW01", "volume": "!1ZVL28", "input": "!1SLZ03"}
+    fake_sock.sendall.assert_called_once_with(
+        iscp._build_eiscp("ZPWQSTN") + iscp._build_eiscp("ZVLQSTN") + iscp._build_eiscp("SLZQSTN")
+    )
+    iscp.close_all()
+
+def test_decoder_handles_split_frames_and_resyncs_after_garbage():
+    dec = iscp.FrameDecoder()
+    a = _frame(b"!1PWR01\x1a\r\n")
+    b = _frame(b"!1MVL28\x1a\r\n")
+    bogus = b"ISCP" + (4).to_bytes(4, "big") + b"junkjunk"   # magic with a nonsense header size
+
+    assert dec.feed(b"\x00\xffnoise" + a[:5]) == []
+    assert dec.feed(a[5:] + bogus + b[:10]) == ["!1PWR01"]
+    assert dec.feed(b[10:]) == ["!1MVL28"]
+    assert len(dec) == 0
+
+    # line noise that happens to spell ISCP, with a huge header size or a wrong version
+    huge = b"ISCP" + (1 << 30).to_bytes(4, "big") + (8).to_bytes(4, "big") + b"\x01\x00\x00\x00"
+    wrong_ver = b"ISCP" + (16).to_bytes(4, "big") + (8).to_bytes(4, "big") + b"\x07\x00\x00\x00"
+    assert dec.feed(huge + wrong_ver + a) == ["!1PWR01"]
+    assert len(dec) == 0
+
+def test_session_gate_caps_connections_per_receiver(mocker):
+    iscp.close_all()
+    mocker.patch.dict(iscp._GATES, {("192.0.2.15", 60128): iscp.SessionGate(limit=1)})
+    hangup = threading.Event()
+    socks = [mocker.MagicMock(), mocker.MagicMock()]
+    for s in socks:
+        s.recv_into.side_effect = lambda view: hangup.wait(1.0) and 0   # idle until the test ends
+    mocker.patch("socket.create_connection", side_effect=socks)
+
+    first = iscp.ReceiverConnection("192.0.2.15", timeout=0.05)
+    second = iscp.ReceiverConnection("192.0.2.15", timeout=0.05)
+    first.ensure_connected()
+    with pytest.raises(ConnectionError):
+        second.ensure_connected()   # the gate is full; no second socket is opened
+
+    first.close()
+    second.ensure_connected()       # released on close, so the slot is free again
+    assert iscp.session_gate("192.0.2.15").open == 1
+    second.close()
+    hangup.set()
+
+def test_breaker_opens_fails_fast_and_recovers_through_a_probe(mocker):
+    iscp.close_all()
+    mocker.patch.dict(iscp._BREAKERS, clear=True)
+    connect = mocker.patch("socket.create_connection", side_effect=OSError("host is down"))
+    conn = iscp.ReceiverConnection("192.0.2.16", timeout=0.05)
+
+    for _ in range(iscp.BREAKER_THRESHOLD):
+        with pytest.raises(OSError):
+            conn.ensure_connected()
+    assert conn.breaker.state == "open"
+
+    calls = connect.call_count
+    with pytest.raises(iscp.ReceiverUnavailable, match="host is down"):
+        conn.transact("PWRQSTN", "!1PWR")       # no connect attempt, no read window
+    assert connect.call_count == calls
+
+    # cooldown over: one half-open probe goes through and closes the circuit
+    conn.breaker._open_until = 0.0
+    fake_sock = mocker.MagicMock()
+    fake_sock.recv_into.side_effect = lambda view: 0
+    connect.side_effect = None
+    connect.return_value = fake_sock
+    conn.ensure_connected()
+    assert conn.breaker.snapshot()["state"] == "closed"
+    conn.close()
+
+def test_window_adapts_to_measured_latency(mocker):
+    mocker.patch.multiple(iscp, WINDOW_MIN_S=0.15, WINDOW_MAX_S=1.0, WINDOW_FACTOR=3.0)
+    tr = iscp.LatencyTracker()
+    assert tr.window(["ZVL"]) == 1.0                 # no data yet: full window
+
+    for i in range(100):
+        tr.record("ZVL", 0.02 + (i % 10) * 0.001)    # 20-29 ms replies
+    assert tr.window(["ZVL"]) == 0.15                # 3 x p99 is under the floor
+    for _ in range(100):
+        tr.record("PWR", 0.2)                        # slow family (power-on)
+    assert abs(tr.window(["ZVL", "PWR"]) - 0.6) < 1e-9
+
+    tr.record("ZVL", None)                           # a miss: back off until a reply lands
+    assert tr.window(["ZVL"]) == 1.0
+    tr.record("ZVL", 0.025)
+    snap = tr.snapshot()["ZVL"]
+    assert snap["timeouts"] == 1 and snap["p50_ms"] >= 20 and snap["window_ms"] == 150.0
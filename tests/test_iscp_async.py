@@ -0,0 +1,58 @@
+# Talk to a tiny local eISCP responder over real asyncio streams and check
+# that queries for different zones overlap instead of queueing.
+import asyncio
+import time
+
+from src.iscp_async import AsyncEISCPClient
+
+REPLY_DELAY_S = 0.2
+STATE = {"PWR": "01", "ZPW": "00", "PW3": "01", "MVL": "28", "ZVL": "14", "VL3": "0A",
+         "SLI": "2B", "SLZ": "03", "SL3": "03", "AMT": "00", "ZMT": "00", "MT3": "00"}
+
+async def _serve(reader, writer):
+    async def reply(cmd):
+        await asyncio.sleep(REPLY_DELAY_S)
+        family = cmd[:3]
+        payload = f"!1{family}{STATE[family]}".encode() + b"\x1a\r\n"   # Integra-style EM + CRLF
+        writer.write(b"ISCP" + (16).to_bytes(4, "big") + len(payload).to_bytes(4, "big") + b"\x01\x00\x00\x00" + payload)
+        await writer.drain()
+    try:
+        while True:
+            hdr = await reader.readexactly(16)
+            data = await reader.readexactly(int.from_bytes(hdr[8:12], "big"))
+            cmd = data.decode().strip()[2:]
+            asyncio.ensure_future(reply(cmd))
+    except asyncio.IncompleteReadError:
+        pass
+
+def test_concurrent_zone_queries_overlap():
+    async def main():
+        server = await asyncio.start_server(_serve, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with AsyncEISCPClient("127.0.0.1", port, timeout=1.0) as cli:
+            t0 = time.monotonic()
+            z2, z3 = await asyncio.gather(cli.query_zone_status("2"), cli.query_zone_status("3"))
+            elapsed = time.monotonic() - t0
+        server.close()
+        await server.wait_closed()
+        return z2, z3, elapsed
+
+    z2, z3, elapsed = asyncio.run(main())
+    assert z2 == {"power": "!1ZPW00", "volume": "!1ZVL14", "input": "!1SLZ03"}
+    assert z3 == {"power": "!1PW301", "volume": "!1VL30A", "input": "!1SL303"}
+    # six replies at 200 ms each would be 1.2 s sequentially
+    assert elapsed < 2 * REPLY_DELAY_S
+
+def test_missing_reply_returns_none_after_window():
+    async def main():
+        async def silent(reader, writer):
+            await reader.read()
+        server = await asyncio.start_server(silent, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with AsyncEISCPClient("127.0.0.1", port, timeout=1.0) as cli:
+            out = await cli._transact("PWRQSTN", "!1PWR", window_s=0.1)
+        server.close()
+        await server.wait_closed()
+        return out
+
+    assert asyncio.run(main()) is None
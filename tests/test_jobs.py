@@ -0,0 +1,66 @@
+# The announcement queue decides what plays when; make sure same-zone jobs
+# never overlap, priorities and duplicate merging work, and a doorbell can
+# cut a reminder short.
+import threading
+import time
+
+from src import jobs
+
+def _wait_for(pred, timeout=2.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if pred():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_same_zone_serializes_other_zones_run_concurrently():
+    release = threading.Event()
+    running = []
+
+    def runner(job):
+        running.append(job.zones[0])
+        release.wait(2)
+
+    q = jobs.JobQueue(runner)
+    a = q.submit(["inside"], {"file": "a"})
+    b = q.submit(["inside"], {"file": "b"})
+    c = q.submit(["back_patio"], {"file": "c"})
+
+    assert _wait_for(lambda: a.status == "running" and c.status == "running")
+    assert b.status == "queued"
+    release.set()
+    assert _wait_for(lambda: b.status == "done")
+
+def test_duplicates_merge_and_priority_orders_the_queue():
+    gate = threading.Event()
+    order = []
+
+    def runner(job):
+        if job.params["file"] == "blocker":
+            gate.wait(2)
+        order.append(job.params["file"])
+
+    q = jobs.JobQueue(runner)
+    q.submit(["inside"], {"file": "blocker"})
+    assert _wait_for(lambda: order == [] and q._running)
+    low = q.submit(["inside"], {"file": "reminder"}, priority=jobs.PRIORITIES["low"])
+    dup = q.submit(["inside"], {"file": "reminder"}, priority=jobs.PRIORITIES["low"])
+    high = q.submit(["inside"], {"file": "doorbell"}, priority=jobs.PRIORITIES["normal"])
+
+    assert dup is low and low.merged == 1
+    gate.set()
+    assert _wait_for(lambda: low.status == "done" and high.status == "done")
+    assert order == ["blocker", "doorbell", "reminder"]
+
+def test_high_priority_preempts_running_low_priority_job():
+    def runner(job):
+        job.cancel.wait(2)   # a long clip that stops early when cancelled
+
+    q = jobs.JobQueue(runner)
+    reminder = q.submit(["back_patio"], {"file": "reminder"}, priority=jobs.PRIORITIES["low"])
+    assert _wait_for(lambda: reminder.status == "running")
+    doorbell = q.submit(["inside"], {"file": "doorbell"}, priority=jobs.PRIORITIES["high"])
+
+    assert _wait_for(lambda: reminder.status == "preempted")
+    assert not doorbell.cancel.is_set()
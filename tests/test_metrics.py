@@ -0,0 +1,50 @@
+import os
+os.environ.setdefault("HOUSEAUDIO_SKIP_STARTUP", "1")
+
+from src import iscp, metrics, mpd_client
+from src.app import app
+from tests.fake_receiver import FakeReceiver
+
+def test_counter_and_histogram_render():
+    c = metrics.Counter("t_total", "test", ("a",))
+    c.inc("x")
+    c.inc("x", amount=2)
+    assert c.render()[-1] == 't_total{a="x"} 3'
+
+    h = metrics.Histogram("t_seconds", "test", ("a",), buckets=(0.1, 1.0))
+    h.observe(0.05, "x")
+    h.observe(0.5, "x")
+    h.observe(5.0, "x")
+    lines = h.render()
+    assert 't_seconds_bucket{a="x",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{a="x",le="1"} 2' in lines
+    assert 't_seconds_bucket{a="x",le="+Inf"} 3' in lines
+    assert 't_seconds_count{a="x"} 3' in lines
+
+def test_eiscp_replies_and_timeouts_are_labelled():
+    sim = FakeReceiver(drop_families={"SLZ"})
+    try:
+        cli = iscp.EISCPClient(sim.host, sim.port)
+        cli.query_zone_status("2", window_s=0.1)
+        name = f"{sim.host}:{sim.port}"
+        assert metrics.EISCP_SECONDS.count(name, "ZPW", "2") == 1
+        assert metrics.EISCP_TIMEOUTS.value(name, "SLZ", "2") == 1
+        assert metrics.EISCP_CONNECTS.value(name, "ok") == 1
+    finally:
+        iscp.close_all()
+        sim.close()
+
+def test_mpd_commands_are_timed(fake_mpd):
+    before = metrics.MPD_SECONDS.count("status")
+    mpd_client.get_client().status()
+    assert metrics.MPD_SECONDS.count("status") == before + 1
+
+def test_metrics_endpoint_reports_http_requests():
+    client = app.test_client()
+    client.get("/healthz")
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.mimetype == "text/plain"
+    body = r.get_data(as_text=True)
+    assert 'houseaudio_http_requests_total{route="/healthz",method="GET",status="200"}' in body
+    assert "# TYPE houseaudio_eiscp_reply_seconds histogram" in body
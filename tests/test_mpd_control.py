@@ -1,31 +1,65 @@
-# we mock subprocess.Popen so we never actually mess with MPD.
+# We run these against a fake MPD server (tests/fake_mpd.py) so we never actually mess with MPD.
 
 # We assert that:
-# pause_mpd() calls mpc pause
-# resume_mpd() calls mpc play
-# get_status() returns a nice dict even if mpc status output changes a little
+# pause_mpd() sends pause, resume_mpd() sends play
+# get_status() returns structured fields parsed from the protocol
+# announcements batch clear/add/play and wait on `idle player` instead of polling
 
 # Why this matters:
-# If we ever change the shell commands or parsing logic, tests will scream before we ship it to the Pi.
+# If we ever change the protocol handling, tests will scream before we ship it to the Pi.
+
+import threading
+import time
 
 import src.mpd_control as mpd
 
-def test_pause_calls_mpc_pause(mocker):
-    fake = mocker.patch("src.mpd_control.run_cmd", return_value=(0, "", ""))
+def test_pause_and_resume_send_protocol_commands(fake_mpd):
     rc, out, err = mpd.pause_mpd()
-    fake.assert_called_once_with(["mpc", "pause"])
     assert rc == 0
+    rc, out, err = mpd.resume_mpd()
+    assert rc == 0
+    assert fake_mpd.commands == ['pause "1"', "play"]
+    assert fake_mpd.connections == 1   # one persistent connection
 
-def test_get_status_parses_playing(mocker):
-    fake_output = (
-        "http://stream.example\n"
-        "[playing] #1/1   0:12/3:45 (5%)\n"
-        "volume: 80%   repeat: off\n"
-    )
-    mocker.patch("src.mpd_control.run_cmd", return_value=(0, fake_output, ""))
+def test_get_status_parses_playing(fake_mpd):
+    mpd.play_now("http://stream.example/chime.mp3")
 
     status = mpd.get_status()
     assert status["rc"] == 0
     assert status["is_playing"] is True
     assert status["is_paused"] is False
+    assert status["state"] == "play"
+    assert status["volume"] == 80
+    assert status["duration"] == 3.0
+    assert status["song"]["file"] == "http://stream.example/chime.mp3"
     assert "volume" in status["raw"]
+
+def test_get_status_reports_unreachable_mpd(monkeypatch):
+    monkeypatch.setenv("MPD_HOST", "127.0.0.1")
+    monkeypatch.setenv("MPD_PORT", "1")
+    status = mpd.get_status()
+    assert status["rc"] == 1
+    assert status["is_playing"] is False
+    assert status["err"]
+
+def test_play_now_batches_and_wait_uses_idle(fake_mpd):
+    rc, _, _ = mpd.play_now("http://example.com/a.wav")
+    assert rc == 0
+    assert fake_mpd.commands == ["clear", 'add "http://example.com/a.wav"', "play"]
+
+    assert mpd.wait_until_stopped(max_s=5) is True
+    # woken by idle, not by hammering status every 200 ms
+    assert fake_mpd.commands.count("status") <= 2
+    assert "idle" in fake_mpd.commands
+
+def test_cancel_stops_playback_without_polling_mpd(fake_mpd):
+    fake_mpd.song_s = 5.0
+    mpd.play_now("http://example.com/long.wav")
+    cancel = threading.Event()
+    threading.Timer(0.6, cancel.set).start()
+
+    t0 = time.monotonic()
+    assert mpd.wait_until_stopped(max_s=10, cancel=cancel) is False
+    assert time.monotonic() - t0 < 1.5
+    assert fake_mpd.state == "stop" and "stop" in fake_mpd.commands
+    assert fake_mpd.commands.count("status") <= 2   # one idle, no 250 ms status loop
@@ -1,2 +1,100 @@
 # we mock subprocess and assert the command line looks right (no window, exits after play, etc).
-# We also test temp file cleanup logic so you don't slowly fill the SD card.
\ No newline at end of file
+# The warm engine is driven with a stand-in sink process and decoder (no audio device, no ffmpeg).
+import sys
+import time
+
+from src import playback
+
+def test_ffplay_fallback_command_line(mocker, monkeypatch):
+    monkeypatch.setenv("HOUSEAUDIO_PLAYBACK_ENGINE", "0")
+    popen = mocker.patch.object(playback.subprocess, "Popen")
+    popen.return_value.communicate.return_value = ("", "")
+    popen.return_value.returncode = 0
+
+    assert playback.play_audio_file("/tmp/chime.wav") == (0, "", "")
+    assert popen.call_args.args[0] == ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet", "/tmp/chime.wav"]
+
+def _engine(tmp_path, decodes):
+    def decode(src, dst):
+        decodes.append(src)
+        with open(dst, "wb") as f:
+            f.write(b"\x00" * int(playback.BYTES_PER_S * 0.15))   # 150 ms of silence
+    sink = [sys.executable, "-c", "import sys\nwhile sys.stdin.buffer.read(4096): pass"]
+    return playback.PlaybackEngine(sink, playback.PcmCache(str(tmp_path / "pcm"), decoder=decode))
+
+def test_engine_decodes_once_keeps_the_sink_open_and_signals_completion(tmp_path):
+    clip_file = tmp_path / "chime.mp3"
+    clip_file.write_bytes(b"not really mp3")
+    decodes = []
+    engine = _engine(tmp_path, decodes)
+    try:
+        finished = []
+        first = engine.play(str(clip_file))
+        first.add_done_callback(lambda c: finished.append(c.id))
+        assert first.wait(5) and first.returncode == 0
+        assert finished == [first.id]
+        assert first.finished_at - first.started_at >= 0.14   # completion follows the clip, not the write
+        sink_pid = engine._sink.pid
+
+        second = engine.play(str(clip_file))
+        assert second.wait(5) and second.returncode == 0
+        assert decodes == [str(clip_file)]    # PCM cache hit
+        assert engine._sink.pid == sink_pid   # same output process
+    finally:
+        engine.close()
+
+def test_cancel_ends_a_clip_early(tmp_path):
+    clip_file = tmp_path / "long.mp3"
+    clip_file.write_bytes(b"x")
+    engine = _engine(tmp_path, [])
+
+    def ten_seconds(src, dst):
+        with open(dst, "wb") as f:
+            f.write(b"\x00" * playback.BYTES_PER_S * 10)
+    engine.cache.decoder = ten_seconds
+    try:
+        clip = engine.play(str(clip_file))
+        time.sleep(0.1)
+        clip.cancel()
+        assert clip.wait(1)
+        assert clip.returncode == 1 and clip.error == "cancelled"
+    finally:
+        engine.close()
+
+def test_pruned_clips_release_their_mapping(tmp_path):
+    def decode(src, dst):
+        with open(dst, "wb") as f:
+            f.write(b"\x00" * 1000)
+    cache = playback.PcmCache(str(tmp_path / "pcm"), max_bytes=1500, decoder=decode)
+    a, b = tmp_path / "a.mp3", tmp_path / "b.mp3"
+    a.write_bytes(b"a")
+    b.write_bytes(b"b")
+
+    old = cache.get(str(a))
+    time.sleep(0.01)   # distinct mtimes: a is the oldest
+    cache.get(str(b))
+    assert old.closed                          # evicted with its file, not kept mapped
+    assert list(cache._maps) == [cache._key(str(b))]
+    assert cache._key_locks == {}
+
+def test_crashed_sink_is_reaped_and_replaced(tmp_path):
+    clip_file = tmp_path / "chime.mp3"
+    clip_file.write_bytes(b"x")
+    engine = _engine(tmp_path, [])
+    good_sink = engine.sink_cmd
+    engine.sink_cmd = [sys.executable, "-c", "import sys; sys.stdin.buffer.read(4096)"]   # dies mid-clip
+    try:
+        clip = engine.play(str(clip_file))
+        assert clip.wait(5) and clip.returncode == 1 and "audio sink exited" in clip.error
+        assert engine._sink is None
+
+        engine.sink_cmd = good_sink
+        assert engine.play(str(clip_file)).wait(5)
+        crashed = engine._sink
+        crashed.kill()                           # dies between clips
+        crashed.wait()
+        clip = engine.play(str(clip_file))
+        assert clip.wait(5) and clip.returncode == 0
+        assert engine._sink.pid != crashed.pid
+    finally:
+        engine.close()
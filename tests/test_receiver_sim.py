@@ -0,0 +1,94 @@
+# iscp against the local receiver simulator: real sockets, real framing.
+import asyncio
+import os
+os.environ.setdefault("HOUSEAUDIO_SKIP_STARTUP", "1")
+
+import socket
+import time
+
+import pytest
+
+from src import app as app_module, iscp, receiver_state, zones
+from src.iscp_async import AsyncEISCPClient
+from tests.fake_receiver import FakeReceiver
+
+@pytest.fixture
+def sim():
+    rx = FakeReceiver(latency_s=0.01)
+    yield rx
+    iscp.close_all()
+    rx.close()
+
+def test_pipelined_status_for_all_zones(sim):
+    cli = iscp.EISCPClient(sim.host, sim.port)
+    st = cli.query_zones(["1", "2", "3"], fields=iscp.STATUS_FIELDS)
+    assert st["2"] == {"power": "!1ZPW00", "volume": "!1ZVL14", "input": "!1SLZ03", "mute": "!1ZMT00"}
+    assert cli.set_fields([("3", "volume", "1e")]) == ["!1VL31E"]
+    assert sim.state["VL3"] == "1E"
+
+def test_dropped_reply_costs_only_the_window(sim):
+    sim.drop_families = {"SL3"}
+    cli = iscp.EISCPClient(sim.host, sim.port)
+    t0 = time.monotonic()
+    st = cli.query_zone_status("3", window_s=0.2)
+    assert st["input"] == "" and st["power"] == "!1PW301"
+    assert time.monotonic() - t0 < 0.4
+    assert iscp.latency_for(sim.host, sim.port).snapshot()["SL3"]["timeouts"] >= 1
+
+def test_front_panel_changes_reach_the_state_cache(sim):
+    cli = iscp.EISCPClient(sim.host, sim.port)
+    state = receiver_state.state_for(cli)
+    cli.connection.ensure_connected()
+    deadline = time.monotonic() + 1
+    while sim.connections < 1 and time.monotonic() < deadline:   # the sim registers clients on its accept thread
+        time.sleep(0.01)
+    sim.change("ZVL", "30")
+    while (state.get("2", "volume") or ("",))[0] != "!1ZVL30" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert state.get("2", "volume")[0] == "!1ZVL30"
+
+def test_clients_over_the_limit_are_turned_away():
+    rx = FakeReceiver(max_connections=1)
+    try:
+        first = iscp.ReceiverConnection(rx.host, rx.port)
+        second = iscp.ReceiverConnection(rx.host, rx.port)
+        assert first.transact("PWRQSTN", "!1PWR", window_s=0.5) == "!1PWR01"
+        assert second.transact("PWRQSTN", "!1PWR", window_s=0.2) is None
+        assert rx.refused >= 1
+    finally:
+        first.close()
+        second.close()
+        rx.close()
+
+def test_query_all_zones_one_write_per_receiver(sim, mocker):
+    dead = socket.socket()
+    dead.bind(("127.0.0.1", 0))   # bound, never listening: connects are refused
+    cfg = zones.compile_config({
+        "receivers": {"sim": {"host": sim.host, "port": sim.port},
+                      "attic": {"host": "127.0.0.1", "port": dead.getsockname()[1]}},
+        "zones": {"inside": {"zone_id": "1", "receiver": "sim"}, "back_patio": {"zone_id": "3", "receiver": "sim"},
+                  "attic": {"zone_id": "1", "receiver": "attic"}},
+    })
+    mocker.patch.object(zones, "current", return_value=cfg)
+    send = mocker.spy(iscp.ReceiverConnection, "_send")
+    try:
+        out = app_module.query_all_zones()
+    finally:
+        dead.close()
+    assert out["inside"]["power"] == "!1PWR01" and out["back_patio"]["volume"] == "!1VL30A"
+    assert out["attic"]["receiver"] == "attic" and out["attic"]["error"]      # reported, not raised
+    sim_sends = [c for c in send.call_args_list if c.args[0].port == sim.port]
+    assert len(sim_sends) == 1    # both zones' queries pipelined in one write
+
+def test_late_echo_is_not_taken_as_the_next_sets_ack(sim):
+    sim.latency_s = {"ZVL": 0.3}
+
+    conn = iscp.EISCPClient(sim.host, sim.port).connection
+    assert conn.transact("ZVL20", "!1ZVL", window_s=0.1) is None       # gave up before the echo
+    assert conn.transact("ZVL25", "!1ZVL", window_s=1.0) == "!1ZVL25"  # not the late !1ZVL20
+
+    async def on_async_client():
+        async with AsyncEISCPClient(sim.host, sim.port) as cli:
+            assert await cli._transact("ZVL30", "!1ZVL", window_s=0.1) is None
+            return await cli._transact("ZVL35", "!1ZVL", window_s=1.0)
+    assert asyncio.run(on_async_client()) == "!1ZVL35"
@@ -0,0 +1,79 @@
+# The state cache is what wall tablets and Home Assistant actually read, so
+# make sure unsolicited frames land on the right zone/field and that only
+# stale fields send us back to the receiver.
+import json, os, socket, time
+os.environ.setdefault("HOUSEAUDIO_SKIP_STARTUP", "1")
+
+import src.receiver_state as rs
+from src import iscp, zones
+from src.app import app
+
+def test_unsolicited_frames_update_the_right_zone():
+    st = rs.ReceiverState(max_age_s=30)
+    assert st.apply_frame("!1ZVL1E")       # someone turned zone 2 up from the remote
+    assert st.apply_frame("!1MT301")
+    assert not st.apply_frame("!1NLSC-P")  # not a tracked family
+    assert not st.apply_frame("!1PW3N/A")
+
+    assert st.get("2", "volume")[0] == "!1ZVL1E"
+    assert st.get("3", "mute")[0] == "!1MT301"
+    assert st.get("3", "power") is None
+
+def test_freshness_follows_live_subscription_and_max_age():
+    st = rs.ReceiverState(max_age_s=0)
+    st.apply_frame("!1PWR01")
+    ts = st.get("1", "power")[1]
+
+    # no live subscription and max_age 0 -> stale
+    assert st.stale("1", live_since=None, fields=["power"]) == ["power"]
+    # recorded on the current connection -> pushed updates keep it current
+    assert st.stale("1", live_since=ts, fields=["power"]) == []
+
+def test_zones_debug_only_queries_stale_fields(mocker):
+    cli = mocker.MagicMock()
+    cli.connection.connected_since = 0.0
+    mocker.patch("src.app.get_client", return_value=cli)
+    mocker.patch("src.app.zones.current", return_value=zones.compile_config({"zones": {"inside": {"zone_id": "1"}}}))
+
+    st = rs.ReceiverState(max_age_s=30)
+    for frame in ("!1PWR01", "!1MVL28", "!1SLI2B"):
+        st.apply_frame(frame)
+    mocker.patch("src.app.receiver_state.state_for", return_value=st)
+
+    r = app.test_client().get("/zones/debug")
+    body = json.loads(r.data)
+    assert body["inside"]["power"] == "on"
+    assert body["inside"]["volume"] == 0x28
+    assert body["inside"]["input"] == "NET"
+    cli.query_fields.assert_called_once_with({"1": ["mute"]})
+
+def test_watchers_hear_changes_not_refreshes():
+    st = rs.ReceiverState()
+    seen = []
+    st.watch(lambda zone, field, frame: seen.append((zone, field, frame)))
+    st.apply_frame("!1ZVL1E")
+    st.apply_frame("!1ZVL1E")   # same value re-read: no event
+    st.apply_frame("!1ZVL20")
+    assert seen == [("2", "volume", "!1ZVL1E"), ("2", "volume", "!1ZVL20")]
+
+def test_listener_logs_transitions_and_waits_out_an_open_circuit(mocker, monkeypatch, capsys):
+    monkeypatch.setattr(iscp, "BREAKER_COOLDOWN_MIN", 0.2)
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))   # not listening yet: the receiver is "asleep"
+    port = srv.getsockname()[1]
+    connect = mocker.spy(iscp.socket, "create_connection")
+    listener = rs.ReceiverListener(iscp.EISCPClient("127.0.0.1", port), lambda: [], interval_s=0.01)
+    try:
+        listener.start()
+        time.sleep(0.15)
+        assert capsys.readouterr().out.count("subscription down") == 1
+        assert connect.call_count == iscp.BREAKER_THRESHOLD   # then it sits out the cooldown
+
+        srv.listen(1)                 # wakes up
+        time.sleep(0.4)
+        out = capsys.readouterr().out
+        assert out.count("subscription back up") == 1 and "subscription down" not in out
+    finally:
+        listener.stop()
+        iscp.close_all()
+        srv.close()
@@ -0,0 +1,71 @@
+import os
+os.environ.setdefault("HOUSEAUDIO_SKIP_STARTUP", "1")
+
+import pytest
+
+from src import iscp_async, scenes, zones
+from src.app import app
+from tests.fake_receiver import FakeReceiver
+
+def _config(sim, scene):
+    return zones.compile_config({
+        "receivers": {"sim": {"host": sim.host, "port": sim.port}},
+        "zones": {
+            "inside": {"zone_id": "1"},
+            "front_patio": {"zone_id": "2", "sli": "03"},
+            "back_patio": {"zone_id": "3", "sli": "03"},
+        },
+        "scenes": {"evening": scene},
+    })
+
+def test_scene_values_are_validated_at_load():
+    cfg = zones.compile_config({
+        "zones": {"inside": {"zone_id": "1"}},
+        "scenes": {"movie": {"inside": {"power": True, "input": "2b", "volume": 30, "mute": "off"}}},
+    })
+    assert cfg.scenes["movie"].as_dict() == {"inside": {"power": "01", "input": "2B", "volume": "1E", "mute": "00"}}
+    for bad in ({"garage": {"power": "on"}}, {"inside": {"volume": 150}},
+                {"inside": {"input": 3}}, {"inside": {"bass": 2}}):
+        with pytest.raises(zones.ZoneConfigError):
+            zones.compile_config({"zones": {"inside": {"zone_id": "1"}}, "scenes": {"x": bad}})
+
+def test_diff_sends_only_changes_and_nothing_to_a_zone_going_off():
+    current = {"1": {"power": "!1PWR01", "volume": "!1MVL1E", "input": ""},
+               "2": {"power": "!1ZPW01", "volume": "!1ZVL14"}}
+    targets = {"1": {"power": "01", "input": "2B", "volume": "1E"},
+               "2": {"power": "00", "volume": "30"}}
+    assert scenes.diff(targets, current) == [("1", "input", "2B"), ("2", "power", "00")]
+
+def test_apply_scene_batches_in_safe_order_and_is_idempotent():
+    sim = FakeReceiver()
+    try:
+        cfg = _config(sim, {
+            "inside": {"power": "on", "input": "2B", "volume": 40},   # already on, NET, 0x28: nothing to send
+            "front_patio": {"power": "on", "input": "05", "volume": 25},
+            "back_patio": {"power": "off", "volume": 60},
+        })
+        scene = cfg.scenes["evening"]
+        out = iscp_async.run(scenes.apply(scene, cfg), timeout=5)
+
+        assert out["errors"] == {}
+        assert out["zones"]["inside"] == {"set": {}, "unchanged": ["power", "input", "volume"], "mismatch": []}
+        assert out["zones"]["front_patio"]["set"] == {"power": "01", "input": "05", "volume": "19"}
+        assert out["zones"]["back_patio"]["set"] == {"power": "00"}
+        assert out["sent"] == 4 and not any(z["mismatch"] for z in out["zones"].values())
+        assert sim.state["ZPW"] == "01" and sim.state["SLZ"] == "05" and sim.state["ZVL"] == "19"
+        assert sim.state["PW3"] == "00" and sim.state["VL3"] == "0A"
+
+        sets = [c[2:] for c in sim.commands if not c.endswith("QSTN")]
+        assert sets == ["ZPW01", "PW300", "SLZ05", "ZVL19"]   # power for every zone before input, then volume
+
+        before = len(sim.commands)
+        again = iscp_async.run(scenes.apply(scene, cfg), timeout=5)
+        assert again["sent"] == 0
+        assert sim.commands[before:] == []   # answered from the state cache
+    finally:
+        iscp_async.run(iscp_async.shared_client(sim.host, sim.port).close(), timeout=5)
+        sim.close()
+
+def test_unknown_scene_is_404():
+    r = app.test_client().post("/scenes/nope")
+    assert r.status_code == 404
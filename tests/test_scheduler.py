@@ -0,0 +1,104 @@
+# A burst of volume SETs for one zone (a slider drag) should reach the
+# receiver as a handful of writes, and every caller should see the value the
+# receiver finally acknowledged.
+import asyncio
+import os
+os.environ.setdefault("HOUSEAUDIO_SKIP_STARTUP", "1")
+from concurrent.futures import ThreadPoolExecutor
+
+from src import iscp, iscp_async, zones
+from src.app import app
+from src.iscp_async import AsyncEISCPClient
+from src.scheduler import CommandScheduler
+from tests.fake_receiver import FakeReceiver
+
+def _frame(payload: bytes) -> bytes:
+    return b"ISCP" + (16).to_bytes(4, "big") + len(payload).to_bytes(4, "big") + b"\x01\x00\x00\x00" + payload
+
+async def _echo_server(seen):
+    async def serve(reader, writer):
+        try:
+            while True:
+                hdr = await reader.readexactly(16)
+                cmd = (await reader.readexactly(int.from_bytes(hdr[8:12], "big"))).decode().strip()
+                seen.append(cmd)
+                await asyncio.sleep(0.02)
+                writer.write(_frame(cmd.encode() + b"\x1a\r\n"))   # echo the SET back
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+    return await asyncio.start_server(serve, "127.0.0.1", 0)
+
+def test_superseded_sets_collapse_to_latest_value():
+    async def main():
+        seen = []
+        server = await _echo_server(seen)
+        port = server.sockets[0].getsockname()[1]
+        async with AsyncEISCPClient("127.0.0.1", port, timeout=1.0) as cli:
+            sched = CommandScheduler(cli, min_spacing_s=0.05)
+            calls = []
+            for v in range(20):
+                calls.append(asyncio.ensure_future(sched.submit("2", "volume", f"{v:02X}")))
+                await asyncio.sleep(0.005)
+            acks = await asyncio.gather(*calls)
+        server.close()
+        await server.wait_closed()
+        return seen, acks, sched
+
+    seen, acks, sched = asyncio.run(main())
+    assert seen[-1] == "!1ZVL13"          # the last value always goes out
+    assert len(seen) < 8                  # not one write per request
+    assert acks[-1] == "!1ZVL13"
+    assert sched.sent == len(seen) and sched.coalesced >= 20 - len(seen)
+
+def test_power_is_sent_before_volume():
+    async def main():
+        seen = []
+        server = await _echo_server(seen)
+        port = server.sockets[0].getsockname()[1]
+        async with AsyncEISCPClient("127.0.0.1", port, timeout=1.0) as cli:
+            sched = CommandScheduler(cli, min_spacing_s=0.0)
+            acked = await sched.apply([("3", "volume", "1e"), ("3", "power", "01")])
+        server.close()
+        await server.wait_closed()
+        return seen, acked
+
+    seen, acked = asyncio.run(main())
+    assert seen == ["!1PW301", "!1VL31E"]
+    assert acked == {"volume": "!1VL31E", "power": "!1PW301"}
+
+def test_concurrent_same_zone_requests_coalesce(mocker):
+    sim = FakeReceiver(latency_s=0.02)
+    cfg = zones.compile_config({"receivers": {"sim": {"host": sim.host, "port": sim.port}},
+                                "zones": {"back_patio": {"zone_id": "3"}}})
+    mocker.patch.object(zones, "current", return_value=cfg)
+    client = app.test_client()
+
+    def set_volume(v):
+        return client.post("/zones/set", json={"zone": "back_patio", "volume": v})
+
+    try:
+        with ThreadPoolExecutor(20) as pool:
+            replies = list(pool.map(set_volume, range(20)))
+        assert all(r.status_code == 200 for r in replies)
+        vl3_sets = [c for c in sim.commands if c.startswith("!1VL3") and not c.endswith("QSTN")]
+        assert 0 < len(vl3_sets) < 20
+        assert all(r.get_json()["lock_wait_ms"] < 500 for r in replies)
+    finally:
+        iscp_async.run(iscp_async.shared_client(sim.host, sim.port).close(), timeout=5)
+        sim.close()
+
+def test_sync_client_sets_share_the_receiver_scheduler():
+    sim = FakeReceiver(latency_s=0.02)
+    cli = iscp.EISCPClient(sim.host, sim.port)
+    try:
+        with ThreadPoolExecutor(10) as pool:
+            echoes = list(pool.map(lambda v: cli.volume_hex(f"{v:02X}", zone="3"), range(10)))
+        vl3_sets = [c for c in sim.commands if c.startswith("!1VL3") and not c.endswith("QSTN")]
+        assert 0 < len(vl3_sets) < 10           # coalesced like /zones/set
+        assert all(e and e.startswith("!1VL3") for e in echoes)
+        assert sim.state["VL3"] == vl3_sets[-1][5:]
+    finally:
+        iscp_async.run(iscp_async.shared_client(sim.host, sim.port).close(), timeout=5)
+        iscp.close_all()
+        sim.close()
@@ -0,0 +1,52 @@
+import subprocess
+import sys
+import time
+
+from src import iscp, startup
+from tests.conftest import REPO_ROOT
+from tests.fake_receiver import FakeReceiver
+
+def test_checks_run_in_parallel_and_report():
+    def slow():
+        time.sleep(0.3)
+        return "fine"
+
+    def broken():
+        time.sleep(0.3)
+        raise ConnectionError("receiver asleep")
+
+    t0 = time.monotonic()
+    startup.run_checks({"a": slow, "b": broken})
+    assert time.monotonic() - t0 < 0.1          # returns immediately
+    assert startup.report()["done"] is False
+
+    deadline = time.monotonic() + 2
+    while not startup.report()["done"] and time.monotonic() < deadline:
+        time.sleep(0.02)
+    rep = startup.report()
+    assert time.monotonic() - t0 < 0.55         # both ran at once, not 0.6 s back to back
+    assert rep["ok"] is False
+    assert rep["checks"]["a"]["ok"] is True and rep["checks"]["b"]["detail"] == "receiver asleep"
+
+def test_importing_the_app_does_no_io_and_skips_yaml():
+    code = (
+        "import socket, sys\n"
+        "def boom(*a, **k): raise AssertionError('network I/O at import')\n"
+        "socket.create_connection = boom\n"
+        "import src.app\n"
+        "assert 'yaml' not in sys.modules, 'yaml imported eagerly'\n"
+    )
+    r = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, timeout=30)
+    assert r.returncode == 0, r.stderr
+
+def test_receiver_probe_uses_the_pooled_session():
+    sim = FakeReceiver(max_connections=1)
+    try:
+        assert startup.probe_receiver(sim.host, sim.port).endswith("reachable")
+        gate = iscp.session_gate(sim.host, sim.port)
+        assert gate.open == 1
+        iscp.get_connection(sim.host, sim.port).transact("PWRQSTN", "!1PWR")
+        assert gate.open == 1 and sim.refused == 0   # the probe's socket is the one requests use
+    finally:
+        iscp.close_all()
+        sim.close()
@@ -0,0 +1,63 @@
+import os
+os.environ.setdefault("HOUSEAUDIO_SKIP_STARTUP", "1")
+
+import time
+
+from src import iscp, iscp_async, tracing, zones
+from src.app import app
+from tests.fake_receiver import FakeReceiver
+
+def test_spans_follow_the_trace_into_threads_and_the_receiver_loop():
+    with tracing.span("untraced") as sp:
+        assert sp is None
+
+    tr = tracing.start("test")
+    try:
+        iscp.fan_out(lambda i: tracing.sleep(0.01, reason=f"fan {i}"), [1, 2])
+
+        async def on_loop():
+            with tracing.span("loop work"):
+                return tracing.current()
+        assert iscp_async.run(on_loop(), timeout=5) is tr
+    finally:
+        tracing.finish(tr, "ok")
+    assert tracing.current() is None
+
+    timeline = tracing.get(tr.id).to_dict()["timeline"]
+    assert sorted(s.get("reason", s["name"]) for s in timeline) == ["fan 1", "fan 2", "loop work"]
+    assert all(s["ms"] >= 0 for s in timeline)
+
+def test_request_trace_shows_receiver_round_trips(mocker):
+    sim = FakeReceiver(latency_s=0.01)
+    cfg = zones.compile_config({
+        "receivers": {"sim": {"host": sim.host, "port": sim.port}},
+        "zones": {"inside": {"zone_id": "1"}, "back_patio": {"zone_id": "3"}},
+    })
+    mocker.patch.object(zones, "current", return_value=cfg)
+    try:
+        client = app.test_client()
+        r = client.get("/zones/debug")
+        assert r.status_code == 200
+        trace_id = r.headers["X-Trace-Id"]
+
+        trace = client.get(f"/debug/traces/{trace_id}").get_json()
+        assert trace["name"] == "GET /zones/debug" and trace["status"] == 200
+        names = [s["name"] for s in trace["timeline"]]
+        assert "eiscp.connect" in names and "eiscp" in names
+        eiscp_span = next(s for s in trace["timeline"] if s["name"] == "eiscp")
+        assert eiscp_span["receiver"] == f"{sim.host}:{sim.port}" and eiscp_span["timeouts"] == 0
+
+        listing = client.get("/debug/traces?name=/zones/debug").get_json()
+        assert listing["recent"][0]["trace_id"] == trace_id
+        assert client.get("/debug/traces/nope").status_code == 404
+    finally:
+        iscp.close_all()
+        sim.close()
+
+def test_slow_requests_get_a_sampled_profile(monkeypatch):
+    monkeypatch.setattr(tracing, "PROFILE_MS", 10.0)
+    tr = tracing.start("slow")
+    time.sleep(0.15)
+    tracing.finish(tr)
+    profile = tr.to_dict()["profile"]
+    assert profile and any("test_slow_requests_get_a_sampled_profile" in p["stack"] for p in profile)
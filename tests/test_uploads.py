@@ -0,0 +1,78 @@
+import io
+import os
+os.environ.setdefault("HOUSEAUDIO_SKIP_STARTUP", "1")
+
+import pytest
+
+from src import uploads
+from src.app import app
+from src.jobs import Job
+
+class _Body(io.BytesIO):
+    """Request body that records how much each read asked for."""
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, n=-1):
+        self.reads.append(n)
+        return super().read(n)
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+def test_body_is_copied_in_bounded_chunks():
+    body = _Body(b"\x01" * (uploads.CHUNK * 3 + 10))
+    up = uploads.start(".wav")
+    assert up.write_from(body) == uploads.CHUNK * 3 + 10
+    assert set(body.reads) == {uploads.CHUNK}
+    assert os.path.getsize(up.path) == up.size
+    uploads.discard(up.path)
+    assert not os.path.exists(up.path)
+    uploads.discard(up.path)   # already gone: no-op
+
+    too_big = uploads.start()
+    with pytest.raises(uploads.UploadError):
+        too_big.write_from(io.BytesIO(b"x" * 100), max_bytes=10)
+    uploads.discard(too_big.path)
+
+def test_raw_body_upload_is_on_disk_before_the_job_is_queued(mocker):
+    seen = {}
+    def submit(targets, params, priority):
+        with open(params["file"], "rb") as f:
+            seen["body"] = f.read()
+        seen["file"] = params["file"]
+        return Job(targets, params, priority, 0)
+    mocker.patch("src.app.ANNOUNCE_JOBS.submit", side_effect=submit)
+
+    r = app.test_client().post("/announce?zone=inside&zone=back_patio&volume=30", data=b"RIFF....WAVE",
+                               content_type="audio/wav")
+    assert r.status_code == 202 and r.get_json()["bytes"] == 12
+    assert seen["body"] == b"RIFF....WAVE" and seen["file"].endswith(".wav")
+    uploads.discard(seen["file"])
+
+def test_refused_body_queues_nothing_and_leaves_nothing_behind(mocker, upload_dir):
+    submit = mocker.patch("src.app.ANNOUNCE_JOBS.submit")
+    mocker.patch.dict(app.config, {"MAX_CONTENT_LENGTH": 8})
+    fds = len(os.listdir("/proc/self/fd"))
+
+    r = app.test_client().post("/announce?zone=inside&volume=30", data=b"x" * 100, content_type="audio/wav")
+    assert r.status_code == 413 and r.get_json()["ok"] is False
+    r = app.test_client().post("/announce?zone=inside&volume=30", data=b"", content_type="audio/wav")
+    assert r.status_code == 400
+    submit.assert_not_called()
+    assert os.listdir(upload_dir) == [] and len(os.listdir("/proc/self/fd")) == fds
+
+def test_multipart_upload(mocker):
+    submit = mocker.patch("src.app.ANNOUNCE_JOBS.submit", return_value=Job(["inside"], {}, 50, 0))
+    r = app.test_client().post("/announce", content_type="multipart/form-data",
+                               data={"zone": "inside", "volume": "40", "audio": (io.BytesIO(b"ID3data"), "tts.mp3")})
+    assert r.status_code == 202
+    targets, params = submit.call_args.args[:2]
+    assert targets == ["inside"] and params["volume"] == 40 and params["file"].endswith(".mp3")
+    uploads.discard(params["file"])
+
+    r = app.test_client().post("/announce", content_type="multipart/form-data", data={"zone": "inside", "volume": "40"})
+    assert r.status_code == 400
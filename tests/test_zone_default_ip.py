@@ -6,6 +6,8 @@ os.environ.setdefault("DEFAULT_RECEIVER_IP", "192.168.50.249")
 from src.app import app
 
 def test_zone_uses_default_receiver_ip(mocker):
+    # get_client() caches per receiver; start from an empty cache
+    mocker.patch.dict("src.app._CLIENTS", clear=True)
     # Patch EISCPClient and its instance.power()
     mock_client_cls = mocker.patch("src.app.iscp.EISCPClient")
     mock_client = mock_client_cls.return_value
@@ -15,7 +17,7 @@ def test_zone_uses_default_receiver_ip(mocker):
     r = client.post("/zone", data=json.dumps({"power": "on"}), content_type="application/json")
     assert r.status_code == 200
 
-    # Ensure client constructed with DEFAULT_RECEIVER_IP
-    mock_client_cls.assert_called_once_with("192.168.50.249")
+    # Ensure client constructed with DEFAULT_RECEIVER_IP (no receivers: section in zones.yaml)
+    mock_client_cls.assert_called_once_with("192.168.50.249", 60128)
     # Ensure we powered main zone on
     mock_client.power.assert_called_once_with(True, zone="1")
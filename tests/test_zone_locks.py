@@ -0,0 +1,43 @@
+import threading
+import time
+
+from src import zone_locks
+
+def _hold_for(zone, seconds, started, out):
+    with zone_locks.hold("192.0.2.30", [zone]) as held:
+        started.set()
+        time.sleep(seconds)
+    out[zone] = held.wait_s
+
+def test_other_zones_do_not_wait():
+    started, out = threading.Event(), {}
+    t = threading.Thread(target=_hold_for, args=("1", 0.3, started, out))
+    t.start()
+    started.wait(1)
+    with zone_locks.hold("192.0.2.30", ["3"]) as held:
+        pass
+    t.join()
+    assert held.wait_s < 0.1
+
+def test_same_zone_runs_in_arrival_order():
+    order = []
+    started, out = threading.Event(), {}
+    first = threading.Thread(target=_hold_for, args=("2", 0.2, started, out))
+    first.start()
+    started.wait(1)
+
+    def later(tag):
+        with zone_locks.hold("192.0.2.30", ["2"]):
+            order.append(tag)
+    threads = []
+    for tag in "abc":
+        th = threading.Thread(target=later, args=(tag,))
+        th.start()
+        threads.append(th)
+        time.sleep(0.02)
+    with zone_locks.hold("192.0.2.30", ["2", "1"]) as held:   # multi-zone hold queues too
+        order.append("multi")
+    for th in [first, *threads]:
+        th.join()
+    assert order == ["a", "b", "c", "multi"]
+    assert held.wait_ms >= 100
@@ -0,0 +1,75 @@
+# zones.yaml is compiled once and hot-reloaded; a bad edit must be caught
+# at load time and must not knock out the config that is already working.
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import zones
+
+GOOD = 'zones:\n  inside: { zone_id: "1", sli: "2b" }\n  back_patio: { zone_id: "3", sli: "03" }\n'
+
+def _write(path, text, mtime):
+    path.write_text(text)
+    os.utime(path, (mtime, mtime))
+
+def test_compiles_zones(tmp_path):
+    f = tmp_path / "zones.yaml"
+    _write(f, GOOD, 1000)
+    cfg = zones.ZoneRegistry(str(f)).load()
+
+    back = cfg.zones["back_patio"]
+    assert back.zone_id == "3" and back.receiver == zones.DEFAULT_RECEIVER
+    assert cfg.zones["inside"].sli == "2B"
+    with pytest.raises(TypeError):
+        cfg.zones["front_patio"] = back   # read-only
+
+def test_invalid_config_is_reported_at_load():
+    with pytest.raises(zones.ZoneConfigError) as e:
+        zones.compile_config({"zones": {"a": {"zone_id": "7"}, "b": {"zone_id": "2", "sli": "xyz"}}})
+    assert "zone 'a'" in str(e.value) and "zone 'b'" in str(e.value)
+
+def test_reloads_on_mtime_change_and_keeps_previous_on_error(tmp_path):
+    f = tmp_path / "zones.yaml"
+    _write(f, GOOD, 1000)
+    reg = zones.ZoneRegistry(str(f), check_interval_s=0)
+    first = reg.current()
+    assert set(first.zones) == {"inside", "back_patio"}
+    assert reg.current() is first                      # unchanged file -> same object
+
+    _write(f, GOOD + '  front_patio: { zone_id: "2", sli: "05" }\n', 2000)
+    assert "front_patio" in reg.current().zones
+
+    _write(f, 'zones:\n  broken: { zone_id: "9" }\n', 3000)
+    assert "front_patio" in reg.current().zones        # previous config still served
+    assert "broken" in reg.last_error
+
+def test_zones_route_to_their_receiver():
+    cfg = zones.compile_config({
+        "receivers": {"main": {"host": "192.0.2.1"}, "garage": {"host": "192.0.2.2", "port": 60129}},
+        "zones": {
+            "inside": {"zone_id": "1", "receiver": "main"},
+            "shop":   {"zone_id": "1", "receiver": "garage"},   # same id, other AVR
+            "patio":  {"zone_id": "2"},                         # defaults to the first receiver
+        },
+    })
+    assert cfg.receiver_for(cfg.zones["shop"]).key == ("192.0.2.2", 60129)
+    assert cfg.zones["patio"].receiver == "main"
+    assert {r: set(zs) for r, zs in cfg.by_receiver().items()} == {"main": {"inside", "patio"}, "garage": {"shop"}}
+
+    with pytest.raises(zones.ZoneConfigError, match="unknown receiver"):
+        zones.compile_config({"receivers": {"main": {"host": "192.0.2.1"}}, "zones": {"x": {"receiver": "attic"}}})
+
+def test_broken_first_load_is_parsed_and_logged_once(tmp_path, capsys, mocker):
+    f = tmp_path / "zones.yaml"
+    _write(f, 'zones:\n  broken: { zone_id: "9" }\n', 1000)
+    reg = zones.ZoneRegistry(str(f), check_interval_s=0)
+    spy = mocker.spy(zones, "load_file")
+    with ThreadPoolExecutor(4) as pool:
+        cfgs = list(pool.map(lambda _: reg.current(), range(8)))
+    assert all(c.zones == {} for c in cfgs)
+    assert spy.call_count == 1
+    assert capsys.readouterr().out.count("config error") == 1
+
+    _write(f, GOOD, 2000)
+    assert set(reg.current().zones) == {"inside", "back_patio"}